@@ -0,0 +1,166 @@
+"""
+TTL + LRU cache for parsed AI responses (and prediction results), optionally
+persisted to a JSON file so cached analyses survive a server restart.
+
+Several processes (gunicorn workers, the ingestion process) may persist to
+the same file: each save takes an exclusive lock on <file>.lock and merges
+the entries already on disk with its own, so no process drops another's.
+"""
+import contextlib, json, os, tempfile, threading, time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process servers only
+    fcntl = None
+
+# Sensor resolution used to bucket readings for cache keys
+SENSOR_BUCKETS = {
+    "N": 10,
+    "P": 10,
+    "K": 10,
+    "ph": 0.5,
+    "temperature": 2,
+    "soil_moisture": 5,
+}
+
+
+def sensor_bucket(sensor):
+    """Quantize a sensor reading so nearby readings share a cache key"""
+    if not sensor or not sensor.get("N"):
+        return "offline"
+
+    parts = []
+    for field, step in SENSOR_BUCKETS.items():
+        try:
+            parts.append(f"{field}={int(float(sensor.get(field)) // step)}")
+        except (TypeError, ValueError):
+            parts.append(f"{field}=?")
+    return ",".join(parts)
+
+
+def quantize_reading(reading, resolution):
+    """Round each field to its step; returns a hashable tuple in `resolution` order"""
+    return tuple(round(round(float(reading[f]) / step) * step, 6) for f, step in resolution.items())
+
+
+def crop_cache_key(crop_name, sensor):
+    """Normalized crop name + quantized sensor bucket"""
+    name = " ".join(str(crop_name).lower().split())
+    return f"{name}|{sensor_bucket(sensor)}"
+
+
+class TTLCache:
+    def __init__(self, max_size=256, ttl=86400, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value), oldest first
+        if path:
+            self._load()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        """Store value for ttl seconds (default: the cache's ttl)"""
+        with self._lock:
+            self._data[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+            if self.path:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self.path:
+                self._save(merge=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    # ---------- persistence ----------
+    def _read_file(self):
+        """Unexpired [key, expires_at, value] entries on disk, oldest first"""
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Cache file unreadable, ignoring it: {e}")
+            return []
+        now = time.time()
+        return [e for e in entries if e[1] > now]
+
+    def _load(self):
+        for key, expires_at, value in self._read_file()[-self.max_size:]:
+            self._data[key] = (expires_at, value)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process saving to this file"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self, merge=True):
+        """Merge with the entries on disk and write the file atomically (caller holds the lock)"""
+        with self._file_lock():
+            if merge:
+                # Other processes' entries are adopted as the least recently used
+                # ones; for a key both have, the later expiry wins
+                merged = OrderedDict()
+                for key, expires_at, value in self._read_file():
+                    entry = self._data.get(key)
+                    if entry is None:
+                        merged[key] = (expires_at, value)
+                    elif entry[0] < expires_at:
+                        self._data[key] = (expires_at, value)
+                merged.update(self._data)
+                self._data = merged
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+            self._write()
+
+    def _write(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".cache-", suffix=".json", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump([[k, exp, v] for k, (exp, v) in self._data.items()], f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Cache save failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,199 @@
+"""
+Streaming threshold and anomaly engine for sensor readings.
+
+Every reading updates a few numbers per (device, field) - O(1), no history
+scans - and only state changes come out as events:
+
+  EWMA        readings are smoothed with time constant `tau` seconds, so
+              one noisy sample can't cross a threshold
+  hysteresis  a field enters "low" below `low` but only returns to "ok"
+              above `low + band` (mirrored for "high")
+  dwell       a new level state must hold for `dwell` seconds first
+  rate        the smoothed value's slope over `rate_window` seconds; above
+              `rate_limit` per minute fires "rising"/"falling" once, re-armed
+              when the slope drops below half the limit
+
+Events: {"device", "field", "kind", "value", "threshold", "ts", "crop"} with
+kind one of low / high / ok / rising / falling.
+"""
+import math, threading, time
+from collections import deque
+
+from rule_engine import RULE_FIELDS
+
+ALERT_FIELDS = ["N", "P", "K", "temperature", "soil_moisture", "ph"]  # RULE_FIELDS order
+RECENT_EVENTS = 20  # per device, for /api/alerts
+
+# Used when the device's crop doesn't define a range for the field
+DEFAULT_LEVELS = {"soil_moisture": (20, 90)}
+# Units per minute that count as an abnormal change of the smoothed value
+DEFAULT_RATE_LIMITS = {"N": 30, "P": 30, "K": 30, "temperature": 3, "soil_moisture": 10, "ph": 0.5}
+
+
+class FieldRule:
+    def __init__(self, low=None, high=None, band=0.0, rate_limit=None,
+                 tau=30.0, dwell=60.0, rate_window=60.0):
+        self.low = low
+        self.high = high
+        self.band = band
+        self.rate_limit = rate_limit
+        self.tau = tau
+        self.dwell = dwell
+        self.rate_window = rate_window
+
+
+class FieldState:
+    __slots__ = ("ewma", "ts", "level", "pending", "pending_since", "anchor", "anchor_ts", "rate", "rate_state")
+
+    def __init__(self, value, ts):
+        self.ewma = value
+        self.ts = ts
+        self.level = "ok"
+        self.pending = None
+        self.pending_since = None
+        self.anchor = value  # smoothed value at the start of the rate window
+        self.anchor_ts = ts
+        self.rate = 0.0
+        self.rate_state = None
+
+
+def crop_rules(crop, band_fraction=0.05, **kwargs):
+    """{field: FieldRule} from a crops.json entry (None = defaults only)"""
+    rules = {}
+    for field, (k_min, _, k_max, _) in zip(ALERT_FIELDS, RULE_FIELDS):
+        low, high = DEFAULT_LEVELS.get(field, (None, None))
+        try:
+            c_low, c_high = float(crop[k_min]), float(crop[k_max])
+            if c_high > c_low:
+                low, high = c_low, c_high
+        except (KeyError, TypeError, ValueError):
+            pass
+        band = (high - low) * band_fraction if low is not None else 0.0
+        rules[field] = FieldRule(low, high, band, DEFAULT_RATE_LIMITS.get(field), **kwargs)
+    return rules
+
+
+class AlertEngine:
+    def __init__(self, rules_for, rules_version=lambda: None, on_event=None):
+        """
+        rules_for(device_id) -> (crop name or None, {field: FieldRule}); rebuilt
+        whenever rules_version() changes (e.g. the crop catalog version).
+        """
+        self.rules_for = rules_for
+        self.rules_version = rules_version
+        self.on_event = on_event
+        self._lock = threading.Lock()
+        self._rules = {}   # device id -> (version, crop, rules)
+        self._states = {}  # (device id, field) -> FieldState
+        self._recent = {}  # device id -> deque of events
+        self.readings = 0
+        self.evaluations = 0
+        self.events = {}   # kind -> count
+
+    def _device_rules(self, device_id):
+        version = self.rules_version()
+        cached = self._rules.get(device_id)
+        if cached is None or cached[0] != version:
+            crop, rules = self.rules_for(device_id)
+            cached = self._rules[device_id] = (version, crop, rules)
+        return cached[1], cached[2]
+
+    def update(self, device_id, reading, ts=None):
+        """Feed one reading; returns the events it caused (usually none)"""
+        ts = time.time() if ts is None else ts
+        events = []
+        with self._lock:
+            crop, rules = self._device_rules(device_id)
+            self.readings += 1
+            npk_missing = all(not reading.get(f) for f in ("N", "P", "K"))  # NPK probe unplugged
+
+            for field, rule in rules.items():
+                try:
+                    value = float(reading[field])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if math.isnan(value) or (field == "soil_moisture" and value <= 0) or (field in ("N", "P", "K") and npk_missing):
+                    continue
+                self.evaluations += 1
+
+                key = (device_id, field)
+                state = self._states.get(key)
+                if state is None:
+                    self._states[key] = FieldState(value, ts)
+                    continue
+                for kind, threshold in self._step(state, rule, value, ts):
+                    events.append({
+                        "device": device_id, "field": field, "kind": kind,
+                        "value": round(state.ewma, 3), "threshold": threshold, "ts": ts, "crop": crop,
+                    })
+
+            recent = self._recent.setdefault(device_id, deque(maxlen=RECENT_EVENTS))
+            for event in events:
+                recent.append(event)
+                self.events[event["kind"]] = self.events.get(event["kind"], 0) + 1
+
+        if self.on_event:
+            for event in events:
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    print(f"Alert handler error: {e}")
+        return events
+
+    @staticmethod
+    def _step(state, rule, value, ts):
+        """Advance one field's state; yields (kind, threshold) transitions"""
+        dt = ts - state.ts
+        if dt <= 0:
+            return
+        state.ts = ts
+        state.ewma += (1 - math.exp(-dt / rule.tau)) * (value - state.ewma)
+        x = state.ewma
+
+        # Level with hysteresis
+        if rule.low is not None and (x < rule.low or (state.level == "low" and x < rule.low + rule.band)):
+            target = "low"
+        elif rule.high is not None and (x > rule.high or (state.level == "high" and x > rule.high - rule.band)):
+            target = "high"
+        else:
+            target = "ok"
+
+        if target == state.level:
+            state.pending = None
+        else:
+            if state.pending != target:
+                state.pending, state.pending_since = target, ts
+            if ts - state.pending_since >= rule.dwell:
+                state.level, state.pending = target, None
+                yield target, {"low": rule.low, "high": rule.high}.get(target)
+
+        # Rate of change over the window
+        if rule.rate_limit and ts - state.anchor_ts >= rule.rate_window:
+            state.rate = (x - state.anchor) / (ts - state.anchor_ts) * 60
+            state.anchor, state.anchor_ts = x, ts
+            direction = "rising" if state.rate > 0 else "falling"
+            if abs(state.rate) > rule.rate_limit and state.rate_state != direction:
+                state.rate_state = direction
+                yield direction, rule.rate_limit
+            elif abs(state.rate) < rule.rate_limit / 2:
+                state.rate_state = None
+
+    def summary(self, device_id):
+        """Current level/rate state per field and recent events for a device"""
+        with self._lock:
+            crop = self._rules.get(device_id, (None, None))[1]
+            fields = {}
+            for (dev, field), state in self._states.items():
+                if dev != device_id:
+                    continue
+                fields[field] = {
+                    "value": round(state.ewma, 3),
+                    "level": state.level,
+                    "rate_per_min": round(state.rate, 3),
+                    "trend": state.rate_state,
+                }
+            return {"crop": crop, "fields": fields, "recent": list(self._recent.get(device_id, ()))}
+
+    def stats(self):
+        with self._lock:
+            return {"readings": self.readings, "evaluations": self.evaluations, "events": dict(self.events)}
@@ -1,21 +1,62 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-import json, os, threading, time
-import serial
-import pickle
+import json, math, os, threading, time
+import numpy as np
+import requests
 from dotenv import load_dotenv
+try:
+    import fcntl
+except ImportError:  # Windows: a second port owner isn't detected
+    fcntl = None
+from alert_engine import AlertEngine, crop_rules
+from ai_cache import TTLCache, crop_cache_key, quantize_reading
+from background_jobs import JobStore
+from crop_store import CropStore
+from devices import Device, DeviceRegistry, parse_mapping, parse_ports
+from frames import RateLimitedLog, encode_pump_command
+from email_queue import EmailDispatcher
+from events import Broadcaster
+from firebase_sync import FirebaseSync, cloud_reading
+from forest_engine import PackedForest
+from http_clients import OutboundClient
+from irrigation import PumpController
+from metrics import registry as metrics_registry
+from model_loader import ModelLoader
+from sensor_history import SensorHistory
+from sensor_log import LOG_FIELDS, SensorLogReader, SensorLogWriter
+from shared_state import LogFolder, SharedDevice, SharedState, device_snapshot
+from rule_engine import score_readings
+from weather import FixtureProvider, OpenMeteoProvider, WeatherCache, plan_fields
 
 load_dotenv()
 
-model = pickle.load(open("ml_model.pkl", "rb"))
-
 # ================= PATHS =================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 FRONTEND_DIR = os.path.join(BASE_DIR, "frontend")
 CROPS_FILE = os.path.join(os.path.dirname(__file__), "crops.json")
+MODEL_FILE = os.path.join(os.path.dirname(__file__), "ml_model.pkl")
+FOREST_FILE = os.path.join(os.path.dirname(__file__), "ml_model.npz")
 
-# ================= FLASK =================
-import requests
+# ================= PROCESS ROLE =================
+# standalone  reads the serial ports and serves HTTP (python app.py)
+# ingest      owns the serial ports, publishes state to SHARED_STATE_DIR (ingest.py)
+# web         HTTP worker reading that state (gunicorn -c gunicorn.conf.py wsgi:app)
+PROCESS_ROLE = os.getenv("PROCESS_ROLE", "standalone")
+if PROCESS_ROLE not in ("standalone", "ingest", "web"):
+    raise ValueError(f"Unknown PROCESS_ROLE '{PROCESS_ROLE}' (expected standalone, ingest or web)")
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", os.path.join(os.path.dirname(__file__), "shared_state"))
+
+# ================= METRICS =================
+# Counters and latency histograms for GET /metrics (Prometheus text format)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"  # 0 = timers and counters become no-ops
+metrics_registry.enabled = METRICS_ENABLED
+
+# ================= ML MODEL =================
+# Loaded on first prediction (or by the warm-up thread create_app() starts),
+# then reloaded in the background whenever the model file is replaced
+ml_model = ModelLoader(FOREST_FILE, MODEL_FILE)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+MODEL_RELOAD_SECONDS = float(os.getenv("MODEL_RELOAD_SECONDS", "5"))  # 0 = never
 
 # ================= FLASK =================
 app = Flask(__name__)
@@ -25,36 +66,64 @@ CORS(app)
 AI_API_KEY = os.getenv("AI_API_KEY")
 AI_MODEL = "google/gemma-3n-e2b-it:free"       # For crop analysis (fastest: 0.40s latency)
 AI_MODEL_FAST = "openai/gpt-oss-120b:free"     # For crop suggestions (reasoning-enabled)
-AI_URL = "https://openrouter.ai/api/v1/chat/completions"
+AI_URL = os.getenv("AI_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# Parsed AI crop analyses, keyed by crop name + quantized sensor reading
+AI_CACHE_FILE = os.path.join(os.path.dirname(__file__), "ai_cache.json")
+ai_crop_cache = TTLCache(
+    max_size=int(os.getenv("AI_CACHE_SIZE", "256")),
+    ttl=int(os.getenv("AI_CACHE_TTL", "86400")),
+    path=AI_CACHE_FILE
+)
 
 # ================= RESEND EMAIL CONFIG =================
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
-RESEND_URL = "https://api.resend.com/emails"
+RESEND_URL = os.getenv("RESEND_URL", "https://api.resend.com/emails")
 ALERT_EMAILS = [email.strip() for email in os.getenv("ALERT_EMAILS", "").split(",")]
-EMAIL_COOLDOWN = 300  # 5 minutes in seconds
-last_email_time = 0  # Track last email sent time
-last_alert_type = None  # Track what type of alert was sent
+EMAIL_COOLDOWN = 300  # 5 minutes in seconds, per alert type
+EMAIL_SPOOL_FILE = os.path.join(os.path.dirname(__file__), "email_spool.json")
 
-# ================= MOTOR STATUS =================
-motor_status = "offline"  # "online" or "offline"
+# ================= OUTBOUND HTTP CLIENTS =================
+# Pooled keep-alive sessions with bounded retries (see http_clients.py)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+ai_client = OutboundClient(
+    "openrouter",
+    headers={
+        "Authorization": f"Bearer {AI_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost:5000",
+        "X-Title": "Smart Agriculture MVP"
+    },
+    pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, timeout=45
+)
+resend_client = OutboundClient(
+    "resend",
+    headers={
+        "Authorization": f"Bearer {RESEND_API_KEY}",
+        "Content-Type": "application/json"
+    },
+    pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, timeout=15
+)
+
+def build_moisture_alert(alert_type, moisture_values):
+    """Build a moisture alert email; several values make a cooldown digest"""
+    moisture_value = moisture_values[-1]
+    if len(moisture_values) > 1:
+        digest_note = f"""
+            <p style="font-size: 14px;">{len(moisture_values)} readings in this range since the last alert
+            (min {min(moisture_values)}%, max {max(moisture_values)}%).</p>"""
+    else:
+        digest_note = ""
 
-def send_moisture_alert(alert_type, moisture_value):
-    """Send email alert via Resend API"""
-    global last_email_time, last_alert_type
-    
-    current_time = time.time()
-    
-    # Check cooldown (5 minutes)
-    if current_time - last_email_time < EMAIL_COOLDOWN and last_alert_type == alert_type:
-        print(f"Email cooldown active. Skipping {alert_type} alert.")
-        return False
-    
     if alert_type == "dry":
         subject = "ALERT: Soil Too Dry - Immediate Action Required"
         html_content = f"""
         <div style="font-family: Arial, sans-serif; padding: 20px; background: #fff3cd; border-radius: 10px;">
             <h2 style="color: #856404;">Soil Moisture Critical Alert</h2>
-            <p style="font-size: 18px;">Your soil moisture has dropped to <strong>{moisture_value}%</strong></p>
+            <p style="font-size: 18px;">Your soil moisture has dropped to <strong>{moisture_value}%</strong></p>{digest_note}
             <p style="color: #721c24; font-size: 16px;">
                 The soil is too dry to support healthy plant growth. 
                 Your crops may be at risk of wilting or dying.
@@ -73,7 +142,7 @@ def send_moisture_alert(alert_type, moisture_value):
         html_content = f"""
         <div style="font-family: Arial, sans-serif; padding: 20px; background: #cce5ff; border-radius: 10px;">
             <h2 style="color: #004085;">Soil Moisture Critical Alert</h2>
-            <p style="font-size: 18px;">Your soil moisture has reached <strong>{moisture_value}%</strong></p>
+            <p style="font-size: 18px;">Your soil moisture has reached <strong>{moisture_value}%</strong></p>{digest_note}
             <p style="color: #721c24; font-size: 16px;">
                 The soil is over-saturated with water. 
                 This can lead to root rot and kill your crops.
@@ -87,107 +156,135 @@ def send_moisture_alert(alert_type, moisture_value):
             <p style="color: #6c757d; font-size: 12px;">Alert from Smart Agriculture System</p>
         </div>
         """
-    
-    try:
-        response = requests.post(
-            RESEND_URL,
-            headers={
-                "Authorization": f"Bearer {RESEND_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "from": "Smart Agriculture <onboarding@resend.dev>",
-                "to": ALERT_EMAILS,
-                "subject": subject,
-                "html": html_content
-            }
-        )
-        
-        if response.status_code == 200:
-            print(f"Alert email sent successfully: {alert_type}")
-            last_email_time = current_time
-            last_alert_type = alert_type
-            return True
-        else:
-            print(f"Email send failed: {response.status_code} - {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"Email error: {e}")
-        return False
 
-def check_moisture_and_alert(moisture):
-    """Check moisture levels and trigger alerts if needed"""
-    # Only proceed if moisture is a valid number greater than 0
-    if moisture is None or not isinstance(moisture, (int, float)) or moisture <= 0:
-        return
-    
-    if moisture <= 20:
-        send_moisture_alert("dry", moisture)
-    elif moisture >= 90:
-        send_moisture_alert("wet", moisture)
+    return {"subject": subject, "html": html_content, "kind": alert_type}
+
+def deliver_email(email):
+    """Send one queued email via Resend API (runs on a dispatcher worker)"""
+    response = resend_client.post(
+        RESEND_URL,
+        json={
+            "from": "Smart Agriculture <onboarding@resend.dev>",
+            "to": ALERT_EMAILS,
+            "subject": email["subject"],
+            "html": email["html"]
+        }
+    )
+
+    if response.status_code == 200:
+        print(f"Email sent successfully: {email.get('kind', email['subject'])}")
+        return True
+    print(f"Email send failed: {response.status_code} - {response.text}")
+    return False
+
+FIELD_LABELS = {
+    "N": ("Nitrogen (N)", " mg/kg"), "P": ("Phosphorus (P)", " mg/kg"), "K": ("Potassium (K)", " mg/kg"),
+    "temperature": ("Temperature", " °C"), "soil_moisture": ("Soil moisture", "%"), "ph": ("pH", ""),
+}
+
+def build_alert(alert_type, values):
+    """Build the email for an alert engine type "<device>:<field>:<kind>" (or legacy "dry"/"wet")"""
+    if ":" not in alert_type:
+        return build_moisture_alert(alert_type, values)
+    device_id, field, kind = alert_type.split(":", 2)
+    where = "" if len(device_registry.devices) == 1 else f" [{device_id}]"
+    if field == "soil_moisture" and kind in ("low", "high"):
+        email = build_moisture_alert("dry" if kind == "low" else "wet", values)
+        email["subject"] += where
+        email["kind"] = alert_type
+        return email
+
+    label, unit = FIELD_LABELS.get(field, (field, ""))
+    value = values[-1]
+    if kind in ("low", "high"):
+        subject = f"ALERT: {label} Too {kind.title()}{where}"
+        detail = f"{label} has stayed {'below' if kind == 'low' else 'above'} the crop's range"
+    else:
+        subject = f"ALERT: {label} {kind.title()} Rapidly{where}"
+        detail = f"{label} is {kind} faster than expected for this field"
+    digest_note = f" ({len(values)} alerts since the last email, min {min(values)}{unit}, max {max(values)}{unit})" if len(values) > 1 else ""
+    html_content = f"""
+    <div style="font-family: Arial, sans-serif; padding: 20px; background: #fff3cd; border-radius: 10px;">
+        <h2 style="color: #856404;">Sensor Alert</h2>
+        <p style="font-size: 18px;">{detail}: now <strong>{value}{unit}</strong>{digest_note}</p>
+        <p style="font-size: 14px;">Please check the field and the sensor readings on the dashboard.</p>
+        <p style="color: #6c757d; font-size: 12px;">Alert from Smart Agriculture System</p>
+    </div>
+    """
+    return {"subject": subject, "html": html_content, "kind": alert_type}
 
 def send_ai_search_email(crop_name, analysis, crop_data):
-    """Send email with AI search results"""
-    try:
-        subject = f"Crop Analysis Search: {crop_name}"
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
-            <h2 style="color: #2E7D32;">🌱 New AI Crop Search</h2>
-            <p><strong>User searched for:</strong> {crop_name}</p>
-            
-            <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                <h3 style="margin-top:0;">AI Advice & Analysis:</h3>
-                <p style="line-height: 1.5; color: #444;">{analysis}</p>
-            </div>
-            
-            <h3>Ideal Conditions Generated:</h3>
-            <ul>
-                <li><strong>Nitrogen (N):</strong> {crop_data.get('N_min')} - {crop_data.get('N_max')} mg/kg</li>
-                <li><strong>Phosphorus (P):</strong> {crop_data.get('P_min')} - {crop_data.get('P_max')} mg/kg</li>
-                <li><strong>Potassium (K):</strong> {crop_data.get('K_min')} - {crop_data.get('K_max')} mg/kg</li>
-                <li><strong>pH:</strong> {crop_data.get('ph_min')} - {crop_data.get('ph_max')}</li>
-                <li><strong>Temperature:</strong> {crop_data.get('temp_min')} - {crop_data.get('temp_max')} °C</li>
-            </ul>
+    """Queue an email with AI search results"""
+    subject = f"Crop Analysis Search: {crop_name}"
+    html_content = f"""
+    <div style="font-family: Arial, sans-serif; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
+        <h2 style="color: #2E7D32;">🌱 New AI Crop Search</h2>
+        <p><strong>User searched for:</strong> {crop_name}</p>
+        
+        <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 15px 0;">
+            <h3 style="margin-top:0;">AI Advice & Analysis:</h3>
+            <p style="line-height: 1.5; color: #444;">{analysis}</p>
         </div>
-        """
         
-        response = requests.post(
-            RESEND_URL,
-            headers={"Authorization": f"Bearer {RESEND_API_KEY}", "Content-Type": "application/json"},
-            json={
-                "from": "Smart Agriculture <onboarding@resend.dev>",
-                "to": ALERT_EMAILS,
-                "subject": subject,
-                "html": html_content
-            }
-        )
-        if response.status_code == 200:
-            print(f"✅ AI Search email sent for {crop_name}")
-        else:
-            print(f"❌ Email Failed: {response.status_code}")
-            print(f"Reason: {response.text}")
-    except Exception as e:
-        print(f"❌ Failed to send AI email: {e}")
+        <h3>Ideal Conditions Generated:</h3>
+        <ul>
+            <li><strong>Nitrogen (N):</strong> {crop_data.get('N_min')} - {crop_data.get('N_max')} mg/kg</li>
+            <li><strong>Phosphorus (P):</strong> {crop_data.get('P_min')} - {crop_data.get('P_max')} mg/kg</li>
+            <li><strong>Potassium (K):</strong> {crop_data.get('K_min')} - {crop_data.get('K_max')} mg/kg</li>
+            <li><strong>pH:</strong> {crop_data.get('ph_min')} - {crop_data.get('ph_max')}</li>
+            <li><strong>Temperature:</strong> {crop_data.get('temp_min')} - {crop_data.get('temp_max')} °C</li>
+        </ul>
+    </div>
+    """
+
+    email_dispatcher.send({"subject": subject, "html": html_content, "kind": f"AI search: {crop_name}"})
+
+# ================= EMAIL DISPATCH =================
+# Emails are delivered off-thread so serial ingestion and requests never wait
+# (the workers start in create_app())
+email_dispatcher = EmailDispatcher(
+    deliver_email,
+    build_alert,
+    # Web workers don't spool: they would overwrite each other's file. Alerts
+    # (most of the mail) come from the single ingestion process.
+    spool_path=None if PROCESS_ROLE == "web" else EMAIL_SPOOL_FILE,
+    max_queue=int(os.getenv("EMAIL_QUEUE_SIZE", "100")),
+    workers=int(os.getenv("EMAIL_WORKERS", "1")),
+    cooldown=EMAIL_COOLDOWN
+)
 
-def get_ai_crop_data(crop_name):
+@app.route("/api/email-queue", methods=["GET"])
+def email_queue_stats():
+    """Queued/sent/failed counters and per-alert-type digest state"""
+    return jsonify(email_dispatcher.stats())
+
+def get_ai_crop_data(crop_name, sensor=None):
     """
     Asks AI for crop data and compatibility analysis.
+    sensor defaults to the default device's latest reading.
     """
-    global latest_sensor
-    
+    if sensor is None:
+        device = device_registry.get()
+        sensor = device.latest if device else {}
+
+    cache_key = crop_cache_key(crop_name, sensor)
+    cached = ai_crop_cache.get(cache_key)
+    if cached is not None:
+        print(f"AI cache hit: {cache_key}")
+        return cached
+
     # Construct the prompt - sensor data is optional
-    has_sensor_data = bool(latest_sensor and latest_sensor.get("N"))
+    has_sensor_data = bool(sensor and sensor.get("N"))
     
     if has_sensor_data:
         sensor_info = f"""
 Current Sensor Readings:
-- Nitrogen (N): {latest_sensor.get('N', 'N/A')} mg/kg
-- Phosphorus (P): {latest_sensor.get('P', 'N/A')} mg/kg  
-- Potassium (K): {latest_sensor.get('K', 'N/A')} mg/kg
-- pH: {latest_sensor.get('ph', 'N/A')}
-- Temperature: {latest_sensor.get('temperature', 'N/A')} °C
-- Soil Moisture: {latest_sensor.get('soil_moisture', 'N/A')} %
+- Nitrogen (N): {sensor.get('N', 'N/A')} mg/kg
+- Phosphorus (P): {sensor.get('P', 'N/A')} mg/kg  
+- Potassium (K): {sensor.get('K', 'N/A')} mg/kg
+- pH: {sensor.get('ph', 'N/A')}
+- Temperature: {sensor.get('temperature', 'N/A')} °C
+- Soil Moisture: {sensor.get('soil_moisture', 'N/A')} %
 """
         analysis_instruction = "Compare these readings with the ideal ranges and provide specific advice on what needs adjustment."
     else:
@@ -218,14 +315,8 @@ Return ONLY a valid JSON object (no markdown, no code blocks). Structure:
 Use realistic agricultural data for {crop_name}."""
 
     try:
-        response = requests.post(
+        response = ai_client.post(
             AI_URL,
-            headers={
-                "Authorization": f"Bearer {AI_API_KEY}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:5000", 
-                "X-Title": "Smart Agriculture MVP"
-            },
             json={
                 "model": AI_MODEL,
                 "messages": [
@@ -262,6 +353,7 @@ Use realistic agricultural data for {crop_name}."""
         try:
             data = json.loads(content)
             print("AI Parsed Data:", data)
+            ai_crop_cache.put(cache_key, data)
             return data
         except json.JSONDecodeError as je:
             print(f"JSON Parse Error: {je}")
@@ -287,8 +379,12 @@ def ai_add_crop():
     if not crop_name:
         return jsonify({"error": "Crop name required"}), 400
         
+    device = device_registry.get(req.get("device"))
+    if device is None:
+        return jsonify({"error": f"Unknown device '{req.get('device')}'"}), 404
+
     print(f"AI analyzing crop: {crop_name}...")
-    ai_data = get_ai_crop_data(crop_name)
+    ai_data = get_ai_crop_data(crop_name, device.latest)
     
     if not ai_data:
         return jsonify({"error": "AI could not retrieve data. Try again."}), 500
@@ -298,7 +394,10 @@ def ai_add_crop():
         
     # Prepare the crop object for storage (Normalizing Min/Max)
     def norm(v1, v2):
-        return min(v1, v2), max(v1, v2)
+        try:
+            return (v2, v1) if float(v1) > float(v2) else (v1, v2)
+        except (TypeError, ValueError):
+            return v1, v2  # rejected by crop_store.upsert below
 
     n_min, n_max = norm(ai_data.get("N_min", 0), ai_data.get("N_max", 0))
     p_min, p_max = norm(ai_data.get("P_min", 0), ai_data.get("P_max", 0))
@@ -318,12 +417,11 @@ def ai_add_crop():
         "analysis": ai_data.get("analysis", "No AI analysis available.")
     }
     
-    # Save to database
-    crops = load_crops()
-    # Remove existing if overwriting
-    crops = [c for c in crops if c["name"].lower() != crop_name.lower()]
-    crops.append(new_crop)
-    save_crops(crops)
+    # Save to database (replaces existing crop with the same name)
+    try:
+        crop_store.upsert(new_crop)
+    except ValueError as e:
+        return jsonify({"error": f"AI returned invalid crop data: {e}"}), 500
     
     return jsonify({
         "message": "Crop added via AI",
@@ -331,59 +429,356 @@ def ai_add_crop():
         "analysis": ai_data.get("analysis", "No analysis provided.")
     })
 
+@app.route("/api/http-stats", methods=["GET"])
+def http_stats():
+    """Per-service call counts, errors and latency for outbound HTTP"""
+    return jsonify({c.name: c.stats() for c in (ai_client, resend_client, weather_client, firebase_client)})
+
+@app.route("/api/ai-cache", methods=["GET"])
+def ai_cache_stats():
+    """Hit/miss counters for the AI crop analysis cache"""
+    return jsonify(ai_crop_cache.stats())
+
+
+# ================= CROP STORE =================
+# Parsed once, indexed by name, written through atomically on change
+crop_store = CropStore(CROPS_FILE)
+
+# ================= SENSOR ALERTS =================
+# Thresholds come from the crop growing on each device: DEVICE_CROPS="field1=Rice,field2=Wheat".
+# Devices without one only get the moisture defaults (20% / 90%) and rate-of-change alerts.
+DEVICE_CROPS = parse_mapping(os.getenv("DEVICE_CROPS"))
+ALERT_SMOOTHING_SECONDS = float(os.getenv("ALERT_SMOOTHING_SECONDS", "30"))  # EWMA time constant
+ALERT_DWELL_SECONDS = float(os.getenv("ALERT_DWELL_SECONDS", "60"))  # condition must hold this long
+ALERT_HYSTERESIS = float(os.getenv("ALERT_HYSTERESIS", "0.05"))  # fraction of the crop's range
+ALERT_RATE_WINDOW = float(os.getenv("ALERT_RATE_WINDOW", "60"))  # seconds per rate-of-change sample
+
+def alert_rules(device_id):
+    name = DEVICE_CROPS.get(device_id)
+    crop = crop_store.get(name) if name else None
+    if name and crop is None:
+        print(f"DEVICE_CROPS: crop '{name}' for {device_id} not found, using default alert thresholds")
+    rules = crop_rules(
+        crop, band_fraction=ALERT_HYSTERESIS,
+        tau=ALERT_SMOOTHING_SECONDS, dwell=ALERT_DWELL_SECONDS, rate_window=ALERT_RATE_WINDOW
+    )
+    return (crop["name"] if crop else None), rules
+
+def alert_event(event):
+    """Engine event -> SSE push, and an email unless it's a recovery"""
+    print(f"Alert [{event['device']}]: {event['field']} {event['kind']} ({event['value']})")
+    live_events.publish("alert", event, topic=event["device"])
+    if event["kind"] != "ok":
+        email_dispatcher.alert(f"{event['device']}:{event['field']}:{event['kind']}", event["value"])
+
+alert_engine = AlertEngine(alert_rules, rules_version=crop_store.current_version, on_event=alert_event)
+
+# ================= WEATHER =================
+# Fetched once per interval by the server instead of by every browser. The
+# ingestion process fetches; web workers follow the file it writes.
+WEATHER_LAT = float(os.getenv("WEATHER_LAT", "17.7343"))  # Visakhapatnam
+WEATHER_LON = float(os.getenv("WEATHER_LON", "83.3130"))
+WEATHER_REFRESH_SECONDS = float(os.getenv("WEATHER_REFRESH_SECONDS", "900"))  # 0 = no forecast
+WEATHER_FIXTURE = os.getenv("WEATHER_FIXTURE")  # Open-Meteo style JSON file instead of the API
+RAIN_EXPECTED_THRESHOLD = float(os.getenv("RAIN_EXPECTED_THRESHOLD", "40"))  # precipitation probability %
+RAIN_LOOKAHEAD_HOURS = int(os.getenv("RAIN_LOOKAHEAD_HOURS", "6"))
+RAIN_SKIP_MM = float(os.getenv("RAIN_SKIP_MM", "2"))  # forecast rain that makes watering wait
+WEATHER_FILE = os.path.join(SHARED_STATE_DIR, "weather.json")
+
+weather_client = OutboundClient(
+    "open-meteo", pool_size=2, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, timeout=15
+)
+if PROCESS_ROLE == "web":
+    weather_provider = None
+elif WEATHER_FIXTURE:
+    weather_provider = FixtureProvider(WEATHER_FIXTURE)
+else:
+    weather_provider = OpenMeteoProvider(weather_client, WEATHER_LAT, WEATHER_LON)
+weather = WeatherCache(
+    weather_provider, WEATHER_REFRESH_SECONDS or 900,
+    path=None if PROCESS_ROLE == "standalone" else WEATHER_FILE,
+    on_refresh=lambda state: write_cloud_rain_status(state["summary"]["rain_status"]),
+    expected_threshold=RAIN_EXPECTED_THRESHOLD, lookahead_hours=RAIN_LOOKAHEAD_HOURS
+)
+
+def field_moisture_range(device_id):
+    """{"crop", "moist_min", "moist_max"} for the device's crop (DEVICE_CROPS), or None"""
+    name = DEVICE_CROPS.get(device_id)
+    crop = crop_store.get(name) if name else None
+    try:
+        low, high = float(crop["moist_min"]), float(crop["moist_max"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return {"crop": crop["name"], "moist_min": low, "moist_max": high} if high > low else None
+
+irrigation_plan_cache = (None, {})  # ((forecast time, stale, crop version), plan)
+
+def irrigation_plan():
+    """Per-device plan, recomputed only when the forecast or the crops change"""
+    global irrigation_plan_cache
+    state = weather.current()
+    key = (state["fetched_at"], state["stale"], crop_store.current_version())
+    if irrigation_plan_cache[0] != key:
+        fields = {device_id: field_moisture_range(device_id) for device_id in device_registry.devices}
+        summary = None if state["stale"] else state["summary"]  # don't hold pumps on an old forecast
+        irrigation_plan_cache = (key, plan_fields(summary, fields, RAIN_SKIP_MM))
+    return irrigation_plan_cache[1]
+
+# ================= IRRIGATION =================
+# IRRIGATION_MODE=auto: the server drives each field's pump from its crop's
+# moist_min / moist_max (DEVICE_CROPS) and writes the commands to the serial
+# port. "off" leaves the pump to the Arduino / dashboard and only reports it.
+IRRIGATION_MODE = os.getenv("IRRIGATION_MODE", "off")
+if IRRIGATION_MODE not in ("off", "auto"):
+    raise ValueError(f"IRRIGATION_MODE must be off or auto, not '{IRRIGATION_MODE}'")
+PUMP_MIN_ON_SECONDS = float(os.getenv("PUMP_MIN_ON_SECONDS", "30"))
+PUMP_MIN_OFF_SECONDS = float(os.getenv("PUMP_MIN_OFF_SECONDS", "300"))
+PUMP_MAX_ON_SECONDS = float(os.getenv("PUMP_MAX_ON_SECONDS", "3600"))
+PUMP_RESEND_SECONDS = 30  # repeat the command while the Arduino reports the other state
 
-# ================= GLOBAL DATA =================
-latest_sensor = {}
+pump_controllers = {}  # device id -> (crop catalog version, PumpController or None)
+pump_sent = {}  # device id -> when the last command was written
 
-# ================= SERIAL CONFIG =================
+def pump_controller(device_id):
+    """Controller for the device's crop, None if it has no crop with a moisture range"""
+    version = crop_store.current_version()
+    entry = pump_controllers.get(device_id)
+    if entry and entry[0] == version:
+        return entry[1]
+
+    field = field_moisture_range(device_id)
+    controller = entry[1] if entry else None
+    if field is None:
+        controller = None
+    elif controller:
+        controller.set_bounds(field["moist_min"], field["moist_max"])  # crop edited: keep what it learned
+    else:
+        controller = PumpController(
+            field["moist_min"], field["moist_max"],
+            min_on=PUMP_MIN_ON_SECONDS, min_off=PUMP_MIN_OFF_SECONDS, max_on=PUMP_MAX_ON_SECONDS
+        )
+    pump_controllers[device_id] = (version, controller)
+    return controller
+
+def cloud_pump_owner():
+    """Who writes the cloud pump (motorControl): "server" when its controller drives it, else "dashboard" """
+    if IRRIGATION_MODE == "auto" and CLOUD_ENABLED and field_moisture_range(CLOUD_DEVICE):
+        return "server"
+    return "dashboard"
+
+def irrigation_step(device, data):
+    """Feed the reading to the device's pump controller and send any command"""
+    controller = pump_controller(device.id)
+    moisture = data.get("soil_moisture")
+    if controller is None or not isinstance(moisture, (int, float)) or moisture <= 0:
+        return
+
+    # Weather plan: stop in rain, start no new cycle just before it, less when rain is likely
+    plan = irrigation_plan().get(device.id) or {}
+    controller.release()
+    if plan.get("action") == "hold":
+        controller.hold(plan["reason"])
+    elif plan.get("action") == "skip":
+        controller.defer(plan["reason"])
+    controller.cap_target(plan.get("target_cap"))
+
+    now = time.time()
+    command = controller.update(now, float(moisture))
+    reported = data.get("motor")
+    if (command is None and reported is not None and bool(reported) != controller.on
+            and now - pump_sent.get(device.id, 0) >= PUMP_RESEND_SECONDS):
+        command = "ON" if controller.on else "OFF"  # missed command or Arduino restarted
+
+    if command:
+        pump_sent[device.id] = now
+        sent = device_registry.send(device.id, encode_pump_command(device.decoder.name, controller.on))
+        print(f"Pump {command} [{device.id}] at {controller.moisture:.1f}% (target {controller.target:.1f}%)"
+              + ("" if sent else " - not sent, device disconnected"))
+        live_events.publish("irrigation", dict(controller.status(), device=device.id), topic=device.id)
+    device.irrigation = controller.status()
+
+# ================= SERIAL DEVICES =================
+# One Arduino per port: SERIAL_PORTS="field1=COM3,field2=COM4"
+# (falls back to a single "default" device on SERIAL_PORT)
 SERIAL_PORT = os.getenv("SERIAL_PORT", "COM3")
+SERIAL_PORTS = parse_ports(os.getenv("SERIAL_PORTS"), SERIAL_PORT)
 BAUD_RATE = 9600
 
-# ================= UTIL =================
-def load_crops():
-    if not os.path.exists(CROPS_FILE):
-        with open(CROPS_FILE, "w") as f:
-            json.dump([], f)
-    with open(CROPS_FILE, "r") as f:
-        return json.load(f)
-
-def save_crops(crops):
-    with open(CROPS_FILE, "w") as f:
-        json.dump(crops, f, indent=4)
-
-# ================= SERIAL READER =================
-def serial_reader():
-    global latest_sensor, motor_status
-    try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        time.sleep(2)
-        print("Arduino Serial Connected")
-
-        while True:
-            line = ser.readline().decode("utf-8").strip()
-            if line:
-                try:
-                    data = json.loads(line)
-                    latest_sensor = data
-                    print("Sensor:", latest_sensor)
-                    
-                    # Update motor status from Arduino data
-                    if "motor" in data:
-                        motor_status = "online" if data["motor"] == 1 else "offline"
-                    
-                    # Check moisture and send alerts if needed
-                    if "soil_moisture" in data:
-                        check_moisture_and_alert(data["soil_moisture"])
-                        
-                except json.JSONDecodeError:
-                    print("Invalid JSON:", line)
+# Frame format per device: json (default), csv or binary - see frames.py
+SERIAL_FORMAT = os.getenv("SERIAL_FORMAT", "json")
+SERIAL_FORMATS = parse_mapping(os.getenv("SERIAL_FORMATS"))
 
-    except Exception as e:
-        print("Serial Error:", e)
-        motor_status = "offline"
+# Last N hours of readings per device in a fixed-size ring buffer
+SENSOR_HISTORY_HOURS = float(os.getenv("SENSOR_HISTORY_HOURS", "24"))
+SENSOR_SAMPLE_SECONDS = float(os.getenv("SENSOR_SAMPLE_SECONDS", "1"))
+
+# Cloud Mode: the server follows the Firebase RTDB paths the dashboard used
+# (one stream per path, or polling) and serves them as a virtual device
+# (?device=cloud) with the same history, alerts and live push as serial ones.
+FIREBASE_AUTH = os.getenv("FIREBASE_AUTH")
+FIREBASE_URL = os.getenv("FIREBASE_URL", "https://smartsoilhealth-bdc49-default-rtdb.asia-southeast1.firebasedatabase.app" if FIREBASE_AUTH else "")
+FIREBASE_SYNC = os.getenv("FIREBASE_SYNC", "stream")  # stream, poll or off
+FIREBASE_POLL_SECONDS = float(os.getenv("FIREBASE_POLL_SECONDS", "5"))
+CLOUD_DEVICE = os.getenv("CLOUD_DEVICE", "cloud")
+CLOUD_ENABLED = bool(FIREBASE_URL) and FIREBASE_SYNC != "off"
+if CLOUD_ENABLED and CLOUD_DEVICE in SERIAL_PORTS:
+    raise ValueError(f"CLOUD_DEVICE '{CLOUD_DEVICE}' is also a serial device in SERIAL_PORTS")
+DEVICE_PORTS = dict(SERIAL_PORTS, **({CLOUD_DEVICE: "firebase"} if CLOUD_ENABLED else {}))
+
+# Durable history: fixed-width binary records, <dir>/<device>/<UTC day>.bin
+SENSOR_LOG_DIR = os.getenv("SENSOR_LOG_DIR", os.path.join(os.path.dirname(__file__), "sensor_log"))
+
+# Live push to dashboards (/api/stream); slow clients are dropped
+# Each open stream holds a server thread; gunicorn.conf.py caps them below WEB_THREADS
+MAX_STREAMS = int(os.getenv("MAX_STREAMS", "0"))  # per process, 0 = unlimited
+live_events = Broadcaster(max_queue=int(os.getenv("STREAM_QUEUE_SIZE", "32")), max_subscribers=MAX_STREAMS or None)
+last_pushed = {}  # device id -> {"sensor": reading, "motor": status}
+
+def device_changed(device):
+    """Connect/disconnect: publish to other processes and to SSE clients"""
+    publish_shared(device)
+    push_changes(device)
+
+def push_changes(device):
+    """Broadcast the device's reading / motor status if they changed"""
+    pushed = last_pushed.setdefault(device.id, {"sensor": None, "motor": None})
+    if device.latest and device.latest != pushed["sensor"]:
+        pushed["sensor"] = device.latest
+        live_events.publish("sensor", dict(device.latest, device=device.id), topic=device.id)
+    if device.motor_status != pushed["motor"]:
+        pushed["motor"] = device.motor_status
+        live_events.publish("motor", {"device": device.id, "status": device.motor_status}, topic=device.id)
+
+READING_SECONDS = metrics_registry.histogram(
+    "sensor_reading_handle_seconds", "Per-reading work: history, log, irrigation, alerts, publish", ["device"]
+)
+
+def handle_reading(device, data):
+    """Called on the device's reader thread for every parsed reading"""
+    with READING_SECONDS.time(device=device.id):
+        sensor_log_print.log(device.id, f"Sensor [{device.id}]:", data)
+        device.history.append(data)
+        device.log.append(data, motor=data.get("motor"))
+        # A failing pump or alert step must not keep the reading from dashboards
+        if IRRIGATION_MODE == "auto":
+            try:
+                irrigation_step(device, data)
+            except Exception as e:
+                print(f"Irrigation error [{device.id}]: {e}")
+        # Smoothed threshold / rate-of-change alerts; the summary (smoothed values,
+        # trends) is refreshed on every reading so /api/alerts is never stale
+        try:
+            alert_engine.update(device.id, data)
+            device.alerts = alert_engine.summary(device.id)
+        except Exception as e:
+            print(f"Alert error [{device.id}]: {e}")
+        publish_shared(device)
+        push_changes(device)
+
+sensor_log_print = RateLimitedLog(interval=float(os.getenv("SENSOR_PRINT_SECONDS", "10")))
+
+HISTORY_CAPACITY = SENSOR_HISTORY_HOURS * 3600 / SENSOR_SAMPLE_SECONDS
+
+def history_file(device_id):
+    return os.path.join(SHARED_STATE_DIR, f"history-{device_id}.bin")
+
+def make_device(device_id, port, fmt=None):
+    return Device(
+        device_id, port, BAUD_RATE,
+        fmt=fmt or SERIAL_FORMATS.get(device_id, SERIAL_FORMAT),
+        # Ingestion keeps the ring in a shared file the web workers map read-only;
+        # create_app() creates it, importing this module writes nothing
+        history=None if PROCESS_ROLE == "ingest" else SensorHistory(capacity=HISTORY_CAPACITY),
+        log=SensorLogWriter(
+            os.path.join(SENSOR_LOG_DIR, device_id),
+            commit_records=int(os.getenv("SENSOR_LOG_COMMIT_RECORDS", "64")),
+            commit_interval=float(os.getenv("SENSOR_LOG_COMMIT_SECONDS", "5")),
+            fsync=os.getenv("SENSOR_LOG_FSYNC", "0") == "1"
+        )
+    )
+
+def make_shared_device(slot, device_id, port):
+    """Web worker view of a device the ingestion process owns"""
+    return SharedDevice(
+        device_id, port, shared_state, slot,
+        history_path=history_file(device_id),
+        history_factory=lambda path: SensorHistory(capacity=HISTORY_CAPACITY, path=path, readonly=True),
+        log=LogFolder(os.path.join(SENSOR_LOG_DIR, device_id))
+    )
+
+# Latest state of every device, shared between the ingestion and web processes
+STATE_FILE = os.path.join(SHARED_STATE_DIR, "devices.state")
+shared_state = None
+if PROCESS_ROLE == "web":
+    if not os.path.exists(STATE_FILE):
+        raise RuntimeError(f"{STATE_FILE} not found - start the ingestion process first (python ingest.py)")
+    shared_state = SharedState(STATE_FILE, len(DEVICE_PORTS))
+
+firebase_client = OutboundClient(
+    "firebase", pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, timeout=15
+)
 
-# Start Serial Thread
-threading.Thread(target=serial_reader, daemon=True).start()
+cloud_rain_written = {}  # "status" -> rainStatus last written to Firebase
+
+def write_cloud_rain_status(status):
+    """Cloud Mode hardware reads the forecast from rainStatus; write it when it changes"""
+    if firebase_sync is None or cloud_rain_written.get("status") == status:
+        return
+    if firebase_sync.put("rainStatus", status):
+        cloud_rain_written["status"] = status
+        print(f"Rain status '{status}' written to Firebase")
+
+cloud_soil = {}  # "soilData" -> the value last fed to the cloud device as a reading
+
+def cloud_changed(tree):
+    """A new reading only when soilData changed; other paths just update the device state"""
+    changed = tree.get("soilData") != cloud_soil.get("soilData", object())
+    cloud_soil["soilData"] = tree.get("soilData")
+    cloud_reader.feed(cloud_reading(tree), reading=changed)
+
+    # motorControl has one writer. When it is the server's controller, a write
+    # from anywhere else (an old dashboard, the console) is put back at once
+    if cloud_pump_owner() == "server":
+        controller = pump_controller(CLOUD_DEVICE)
+        wanted = "ON" if controller.on else "OFF"
+        if controller.moisture is not None and tree.get("motorControl") != wanted:
+            print(f"motorControl set to {tree.get('motorControl')!r} outside the server, restoring {wanted}")
+            firebase_sync.put("motorControl", wanted)
+
+def write_cloud_command(data):
+    """Pump command for the cloud device (json frames) -> motorControl in Firebase"""
+    command = json.loads(data)
+    return firebase_sync.put("motorControl", "ON" if command.get("pump") else "OFF")
+
+device_registry = DeviceRegistry(on_reading=handle_reading, on_status=device_changed)
+firebase_sync = None
+for slot, (device_id, port) in enumerate(DEVICE_PORTS.items()):
+    if PROCESS_ROLE == "web":
+        device_registry.add(make_shared_device(slot, device_id, port))
+    elif device_id == CLOUD_DEVICE and CLOUD_ENABLED:
+        # Always json: write_cloud_command() decodes the pump commands the server encodes
+        cloud_reader = device_registry.add_virtual(make_device(device_id, port, fmt="json"), writer=write_cloud_command)
+        firebase_sync = FirebaseSync(
+            firebase_client, FIREBASE_URL, FIREBASE_AUTH,
+            on_change=cloud_changed,
+            on_status=cloud_reader.set_connected,
+            mode=FIREBASE_SYNC, interval=FIREBASE_POLL_SECONDS
+        )
+    else:
+        device_registry.add(make_device(device_id, port))
+device_slots = {device_id: slot for slot, device_id in enumerate(device_registry.devices)}
+
+def publish_shared(device):
+    """Ingestion role: copy the device's latest state into its shared slot"""
+    if PROCESS_ROLE == "ingest":
+        shared_state.publish(device_slots[device.id], device_snapshot(device))
+
+def request_device():
+    """Device named by ?device= (default device if omitted), or None if unknown"""
+    return device_registry.get(request.args.get("device"))
+
+def unknown_device():
+    return jsonify({"error": f"Unknown device '{request.args.get('device')}'"}), 404
 
 # ================= FRONTEND =================
 @app.route("/")
@@ -402,35 +797,265 @@ def test():
 @app.route("/api/config", methods=["GET"])
 def get_config():
     return jsonify({
-        "FIREBASE_AUTH": os.getenv("FIREBASE_AUTH")
+        "FIREBASE_AUTH": FIREBASE_AUTH,
+        "CLOUD_DEVICE": CLOUD_DEVICE if CLOUD_ENABLED else None,
+        "USB_DEVICE": next(iter(SERIAL_PORTS)),  # the default device USB Mode shows
+        "PUMP_CONTROL": cloud_pump_owner()  # dashboards leave motorControl alone unless "dashboard"
     })
 
+@app.route("/api/devices", methods=["GET"])
+def list_devices():
+    """Registered serial devices and their connection state"""
+    return jsonify(device_registry.status())
+
+@app.route("/api/cloud-sync", methods=["GET"])
+def cloud_sync_stats():
+    """Firebase sync state (paths connected, events and changes received)"""
+    if firebase_sync is None:
+        cloud = device_registry.get(CLOUD_DEVICE) if CLOUD_ENABLED else None
+        return jsonify({"mode": FIREBASE_SYNC if CLOUD_ENABLED else "off", "online": bool(cloud and cloud.connected)})
+    return jsonify(firebase_sync.stats())
+
+@app.route("/api/stream", methods=["GET"])
+def live_stream():
+    """
+    Server-Sent Events: "sensor" on changed readings, "motor" on transitions.
+    ?device=<id> limits the stream to one device.
+    """
+    device_id = request.args.get("device")
+    if device_id and device_registry.get(device_id) is None:
+        return unknown_device()
+
+    devices = [device_registry.get(device_id)] if device_id else list(device_registry.devices.values())
+    initial = []
+    for device in devices:
+        if device.latest:
+            initial.append(Broadcaster.format("sensor", dict(device.latest, device=device.id)))
+        initial.append(Broadcaster.format("motor", {"device": device.id, "status": device.motor_status}))
+
+    sub = live_events.subscribe(topic=device_id)
+    if sub is None:
+        # Dashboards fall back to polling and try the stream again later
+        return jsonify({"error": "Too many live streams open, poll instead"}), 503, {"Retry-After": "60"}
+    return Response(
+        stream_with_context(live_events.stream(sub, initial)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/api/stream/stats", methods=["GET"])
+def live_stream_stats():
+    """Open, refused and lagging live streams in this process"""
+    return jsonify(live_events.stats())
+
 @app.route("/api/sensor-data", methods=["GET"])
 def sensor_get():
-    return jsonify(latest_sensor)
+    device = request_device()
+    if device is None:
+        return unknown_device()
+    return conditional_json(
+        f"sensor-{device.id}-{device.version}",
+        device.updated_at,
+        lambda: device.latest
+    )
+
+@app.route("/api/sensor-history", methods=["GET"])
+def sensor_history_get():
+    """
+    Recent readings from the ring buffer.
+    ?device=<id>&window=<seconds, default 3600>&points=<buckets, default 120>&fields=N,P,...
+    """
+    device = request_device()
+    if device is None:
+        return unknown_device()
+    sensor_history = device.history
+
+    try:
+        window = float(request.args.get("window", 3600))
+        points = int(request.args.get("points", 120))
+    except ValueError:
+        return jsonify({"error": "window and points must be numbers"}), 400
+    if window <= 0 or not 1 <= points <= 5000:
+        return jsonify({"error": "window must be > 0 and points between 1 and 5000"}), 400
+
+    fields = [f for f in request.args.get("fields", "").split(",") if f] or sensor_history.fields
+    unknown = [f for f in fields if f not in sensor_history.fields]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    times, series = sensor_history.downsample(window, points, fields)
+
+    def clean(values):
+        return [None if v != v else round(float(v), 3) for v in values]  # NaN -> null
+
+    return jsonify({
+        "window": window,
+        "points": points,
+        "stats": sensor_history.stats(window, fields),
+        "series": {"t": [round(float(t), 3) for t in times], **{f: clean(v) for f, v in series.items()}}
+    })
+
+@app.route("/api/sensor-log", methods=["GET"])
+def sensor_log_get():
+    """
+    Durable history from the on-disk log.
+    ?device=<id>&start=<unix ts, default end-24h>&end=<unix ts, default now>&fields=N,P,...&max_points=<default 2000>
+    """
+    device = request_device()
+    if device is None:
+        return unknown_device()
+
+    try:
+        end = float(request.args.get("end", time.time()))
+        start = float(request.args.get("start", end - 86400))
+        max_points = int(request.args.get("max_points", 2000))
+    except ValueError:
+        return jsonify({"error": "start, end and max_points must be numbers"}), 400
+    if not (math.isfinite(start) and math.isfinite(end)):
+        return jsonify({"error": "start and end must be finite"}), 400
+    if start > end or max_points < 1:
+        return jsonify({"error": "start must be <= end and max_points >= 1"}), 400
+
+    fields = [f for f in request.args.get("fields", "").split(",") if f] or LOG_FIELDS
+    unknown = [f for f in fields if f not in LOG_FIELDS and f != "motor"]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    device.log.flush()
+    reader = SensorLogReader(device.log.folder)
+    total = reader.count(start, end)
+    step = max(1, -(-total // max_points))  # ceil: keep at most max_points records
+    result = reader.query(start, end, fields, step=step)
+
+    def clean(values):
+        return [None if v != v else round(float(v), 3) for v in values.tolist()]  # NaN -> null
+
+    return jsonify({
+        "start": start,
+        "end": end,
+        "total": total,
+        "step": step,
+        "series": {name: clean(values) for name, values in result.items()}
+    })
 
 @app.route("/api/connection-status", methods=["GET"])
 def connection_status():
     """Check if we have recent sensor data (Arduino connected)"""
-    is_connected = bool(latest_sensor and latest_sensor.get("N") is not None)
-    return jsonify({"connected": is_connected})
+    device = request_device()
+    if device is None:
+        return unknown_device()
+    return conditional_json(
+        f"conn-{device.id}-{device.version}",
+        device.updated_at,
+        lambda: {"connected": bool(device.latest and device.latest.get("N") is not None)}
+    )
+
+@app.route("/api/alerts", methods=["GET"])
+def get_alerts():
+    """Smoothed value, alert level and trend per field, plus recent alert events"""
+    device = request_device()
+    if device is None:
+        return unknown_device()
+    return jsonify(dict(device.alerts or {"crop": None, "fields": {}, "recent": []}, device=device.id))
+
+@app.route("/api/alerts/stats", methods=["GET"])
+def alert_stats():
+    """Readings evaluated and events emitted by the alert engine (this process)"""
+    return jsonify(alert_engine.stats())
+
+@app.route("/api/irrigation", methods=["GET"])
+def get_irrigation():
+    """Pump controller state for a device (empty unless IRRIGATION_MODE=auto and the device has a crop)"""
+    device = request_device()
+    if device is None:
+        return unknown_device()
+    return jsonify(dict(device.irrigation or {}, device=device.id, mode=IRRIGATION_MODE))
+
+@app.route("/api/weather", methods=["GET"])
+def get_weather():
+    """Cached forecast summary (rain status, probabilities, current conditions)"""
+    state = weather.current()
+    return conditional_json(f"weather-{state['fetched_at']}-{state['stale']}", None, lambda: state)
+
+@app.route("/api/irrigation-plan", methods=["GET"])
+def get_irrigation_plan():
+    """Rain-aware irrigation action per field (?device= for one field)"""
+    plan = irrigation_plan()
+    if request.args.get("device"):
+        device = request_device()
+        if device is None:
+            return unknown_device()
+        plan = {device.id: plan[device.id]}
+    state = weather.current()
+    return jsonify({
+        "rain_status": (state["summary"] or {}).get("rain_status"),
+        "fetched_at": state["fetched_at"],
+        "stale": state["stale"],
+        "fields": list(plan.values()),
+    })
 
 @app.route("/api/motor-status", methods=["GET"])
 def get_motor_status():
     """Get motor online/offline status"""
-    return jsonify({"status": motor_status})
+    device = request_device()
+    if device is None:
+        return unknown_device()
+    return jsonify({"status": device.motor_status})
+
+# ================= CONDITIONAL GET =================
+# Device and crop versions are clock/mtime based, so ETags stay valid across
+# restarts and agree between worker processes
+def conditional_json(etag, last_modified, build):
+    """
+    JSON response tagged with ETag/Last-Modified. If the client already has
+    this ETag, answer 304 without building or encoding the payload.
+    """
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = "no-cache"  # always revalidate
+    return response
 
 # ================= CROPS =================
 @app.route("/api/crops", methods=["POST"])
 def add_crop():
-    crops = load_crops()
-    crops.append(request.json)
-    save_crops(crops)
+    crop = request.get_json(silent=True) or {}
+    try:
+        crop_store.upsert(crop)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"message": "Crop added"})
 
 @app.route("/api/crops", methods=["GET"])
 def get_crops():
-    return jsonify(load_crops())
+    """
+    Full crop list, or ?since=<version> for {"version", "changed", "removed"}.
+    The current version is in the X-Crops-Version header and the ETag.
+    """
+    crops = crop_store.all()  # also picks up hand edits before we read the version
+    version = crop_store.version
+    since = request.args.get("since")
+    if since is None:
+        response = conditional_json(f"crops-{version}", crop_store.updated_at, lambda: crops)
+    else:
+        try:
+            delta = crop_store.changes_since(int(since))
+        except ValueError:
+            return jsonify({"error": "since must be an integer version"}), 400
+        if delta is None:
+            # Too old (or from another server run): send everything
+            delta = {"version": version, "full": True, "changed": crops, "removed": []}
+        else:
+            delta["full"] = False
+        version = delta["version"]
+        response = conditional_json(f"crops-{version}-since-{since}", crop_store.updated_at, lambda: delta)
+
+    response.headers["X-Crops-Version"] = str(version)
+    return response
 
 # ================= TOGGLE FAVORITE =================
 @app.route("/api/toggle-fav", methods=["POST"])
@@ -441,16 +1066,7 @@ def toggle_fav():
     if not crop_name:
         return jsonify({"error": "Crop name required"}), 400
     
-    crops = load_crops()
-    found = False
-    for c in crops:
-        if c["name"].strip().lower() == crop_name.lower():
-            c["favorite"] = not c.get("favorite", False)
-            found = True
-            break
-    
-    if found:
-        save_crops(crops)
+    if crop_store.toggle_favorite(crop_name) is not None:
         return jsonify({"message": "Toggled favorite", "name": crop_name})
     return jsonify({"error": f"Crop '{crop_name}' not found"}), 404
 
@@ -468,12 +1084,8 @@ Return ONLY a JSON array, no markdown, no explanation:
     
     try:
         # Step 1: Request with reasoning
-        response1 = requests.post(
+        response1 = ai_client.post(
             AI_URL,
-            headers={
-                "Authorization": f"Bearer {AI_API_KEY}",
-                "Content-Type": "application/json"
-            },
             json={
                 "model": AI_MODEL_FAST,
                 "messages": [{"role": "user", "content": prompt}],
@@ -501,12 +1113,8 @@ Return ONLY a JSON array, no markdown, no explanation:
             {"role": "user", "content": "Return the final JSON array exactly as requested. No markdown."}
         ]
         
-        response2 = requests.post(
+        response2 = ai_client.post(
             AI_URL,
-            headers={
-                "Authorization": f"Bearer {AI_API_KEY}",
-                "Content-Type": "application/json"
-            },
             json={
                 "model": AI_MODEL_FAST,
                 "messages": messages,
@@ -531,87 +1139,86 @@ Return ONLY a JSON array, no markdown, no explanation:
     return []
 
 # ================= PREDICTION (PRIORITY: FAV -> USER -> ML) =================
-@app.route("/api/predict", methods=["POST"])
-def predict():
-    # Allow frontend to pass data (for Cloud Mode)
-    req_data = request.get_json(silent=True) or {}
-    
-    # Use passed data if valid, else use internal latest_sensor
-    if "N" in req_data:
-        data = req_data
-    else:
-        data = latest_sensor
+FEATURES = ["N", "P", "K", "temperature", "soil_moisture", "ph"]
+MAX_RECOMMENDATIONS = 25
+
+# AI top-ups run off the request thread; clients poll by request id
+# (shared through files in production mode so any worker can answer a poll)
+ai_jobs = JobStore(
+    max_workers=int(os.getenv("AI_WORKERS", "2")),
+    folder=os.path.join(SHARED_STATE_DIR, "jobs") if PROCESS_ROLE == "web" else None
+)
 
+# Finished recommendation lists, keyed by the reading rounded to sensor
+# resolution + crop catalog version + model version. A changed crops.json or
+# model gives new keys, so stale lists are never served (they just age out).
+PREDICT_RESOLUTION = {"N": 1, "P": 1, "K": 1, "temperature": 0.1, "soil_moisture": 0.1, "ph": 0.01}
+prediction_cache = TTLCache(
+    max_size=int(os.getenv("PREDICT_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("PREDICT_CACHE_TTL", "3600"))
+)
+# Lists the AI failed to top up are kept only this long, then recomputed and retried
+PREDICT_FAILURE_TTL = int(os.getenv("PREDICT_FAILURE_TTL", "60"))
+prediction_lock = threading.Lock()  # guards the AI job id stored in cache entries
+
+PREDICT_STAGE_SECONDS = metrics_registry.histogram(
+    "predict_stage_seconds", "Time per prediction stage (ml, rules, merge, ai_fallback; batch_* for /api/predict/batch)",
+    ["stage"]
+)
+
+def validate_reading(data):
+    """Return an error message if a sensor reading can't be scored, else None"""
     if not data or "N" not in data:
-        return jsonify({"error": "No sensor data received"})
+        return "No sensor data received"
+
+    missing = [f for f in FEATURES if f not in data]
+    if missing:
+        return f"Missing sensor fields: {', '.join(missing)}"
+
+    try:
+        values = {f: float(data[f]) for f in FEATURES}
+    except (TypeError, ValueError):
+        return "Sensor readings must be numeric"
+    if not all(math.isfinite(v) for v in values.values()):
+        return "Sensor readings must be finite numbers"
 
     # Zero-data guard: reject if all NPK are 0
-    if float(data.get("N", 0)) == 0 and float(data.get("P", 0)) == 0 and float(data.get("K", 0)) == 0:
-        return jsonify({"error": "Sensor readings are all zero. Connect sensors or switch mode."})
+    if values["N"] == 0 and values["P"] == 0 and values["K"] == 0:
+        return "Sensor readings are all zero. Connect sensors or switch mode."
+    return None
+
+def features_matrix(readings):
+    """Stack readings into an (n_readings x 6) float matrix in model feature order"""
+    return np.array([[float(r[f]) for f in FEATURES] for r in readings], dtype=float)
+
+def ml_probabilities(X, model):
+    """Run the RandomForest once over the whole feature matrix"""
+    if isinstance(model, PackedForest):
+        return model.predict_proba(X), model.classes_
 
-    # 1. ML Prediction (Relaxed Logic to fill list)
     import pandas as pd
-    features = pd.DataFrame([[
-        data["N"],
-        data["P"],
-        data["K"],
-        data["temperature"],
-        data["soil_moisture"],
-        data["ph"]
-    ]], columns=["N", "P", "K", "temperature", "soil_moisture", "ph"])
-
-    probs = model.predict_proba(features)[0]
-    classes = model.classes_
-    
+    features = pd.DataFrame(X, columns=FEATURES)
+    return model.predict_proba(features), model.classes_
+
+def rank_recommendations(probs, classes, scores, crops):
+    """Merge one reading's rule scores and ML probabilities by priority"""
     ml_results = []
     for c, p in zip(classes, probs):
         conf = round(float(p) * 100, 2)
         # Include ALL ML predictions to fill the list later
         ml_results.append({"crop": str(c), "confidence": conf, "type": "ML Model"})
-            
-    # 2. Check User Custom Crops (Rule-based)
-    user_crops = load_crops()
+
     fav_results = []
     other_user_results = []
-    
-    current_N = float(data["N"])
-    current_P = float(data["P"])
-    current_K = float(data["K"])
-    current_Temp = float(data["temperature"])
-    current_Moist = float(data["soil_moisture"])
-    current_pH = float(data["ph"])
-
-    for crop in user_crops:
-        score = 0
-        total_checks = 6
-        
-        # Helper to check range (auto-swap min/max)
-        def check(val, r_min, r_max):
-            if r_min > r_max: r_min, r_max = r_max, r_min  # Swap if inverted
-            
-            if r_min <= val <= r_max: return 1
-            margin = (r_max - r_min) * 0.2
-            if margin == 0: margin = 0.5
-            
-            if (r_min - margin) <= val <= (r_max + margin): return 0.5
-            return 0
-
-        score += check(current_N, crop.get("N_min", 0), crop.get("N_max", 100))
-        score += check(current_P, crop.get("P_min", 0), crop.get("P_max", 100))
-        score += check(current_K, crop.get("K_min", 0), crop.get("K_max", 100))
-        score += check(current_Temp, crop.get("temp_min", 0), crop.get("temp_max", 40))
-        score += check(current_Moist, crop.get("moist_min", 0), crop.get("moist_max", 100))
-        score += check(current_pH, crop.get("ph_min", 0), crop.get("ph_max", 14))
-        
-        final_percentage = round((score / total_checks) * 100, 2)
-        
+    for crop, score in zip(crops, scores):
+        final_percentage = round(float(score), 2)
         is_fav = crop.get("favorite", False)
-        
+
         # User Priority: Include ALL matching user crops (> 0%)
         if is_fav or final_percentage > 0:
             item = {
-                "crop": crop["name"], 
-                "confidence": final_percentage, 
+                "crop": crop["name"],
+                "confidence": final_percentage,
                 "type": "Favorite" if is_fav else "Your Crops"
             }
             if is_fav:
@@ -619,90 +1226,345 @@ def predict():
             else:
                 other_user_results.append(item)
 
-    # 3. Sort Each Group by Confidence
+    # Sort Each Group by Confidence
     fav_results.sort(key=lambda x: x["confidence"], reverse=True)
     other_user_results.sort(key=lambda x: x["confidence"], reverse=True)
     ml_results.sort(key=lambda x: x["confidence"], reverse=True)
 
-    # 4. Merge Priority: Favs -> Other User -> ML (Deduplicated)
+    # Merge Priority: Favs -> Other User -> ML (Deduplicated)
     final_list = fav_results + other_user_results
-    
+
     # Track existing names to avoid duplicates
     existing_names = {x["crop"].lower() for x in final_list}
-    
+
     # Fill remaining slots with ML predictions
     for ml_item in ml_results:
-        # Stop if we reached 25
-        if len(final_list) >= 25:
+        if len(final_list) >= MAX_RECOMMENDATIONS:
             break
-            
+
         if ml_item["crop"].lower() not in existing_names:
             final_list.append(ml_item)
             existing_names.add(ml_item["crop"].lower())
-            
-    # 5. AI FALLBACK: If still < 25, ask AI for more (with retry)
-    if len(final_list) < 25:
-        missing_count = 25 - len(final_list)
-        print(f"List has {len(final_list)} items. Asking AI for {missing_count} more...")
-        
-        max_retries = 2
-        for attempt in range(max_retries):
-            try:
-                ai_suggestions = get_ai_more_crops(data, list(existing_names), missing_count)
-                # Ensure each suggestion has required keys
-                for item in ai_suggestions:
-                    if "confidence" not in item:
-                        item["confidence"] = 50  # Default confidence for AI suggestions
-                    if "type" not in item:
-                        item["type"] = "AI Suggestion"
-                    if "crop" not in item:
-                        continue
-                    if item["crop"].lower() not in existing_names:
-                        final_list.append(item)
-                        existing_names.add(item["crop"].lower())
-                
-                # Check if we have enough now
-                if len(final_list) >= 25:
-                    break
-                else:
-                    missing_count = 25 - len(final_list)
-                    print(f"Retry {attempt+1}: Still need {missing_count} more crops...")
-            except Exception as e:
-                print(f"AI Fallback Failed (attempt {attempt+1}): {e}")
-    
-    # Take top 25 selected items (based on priority inclusion)
-    selected_list = final_list[:25]
-    
-    # Returns 25 items. Now resort them STRICTLY by confidence for display
-    # This satisfies "tile arrangement in descending order of confidence"
-    selected_list.sort(key=lambda x: x.get("confidence", 0), reverse=True)
-    
-    top_list = selected_list
 
+    return final_list, existing_names
 
+def recommendation_response(final_list):
+    """Take the top items and sort them strictly by confidence for display"""
+    # Take top 25 selected items (based on priority inclusion)
+    top_list = final_list[:MAX_RECOMMENDATIONS]
 
-    return jsonify({
+    # This satisfies "tile arrangement in descending order of confidence"
+    top_list.sort(key=lambda x: x.get("confidence", 0), reverse=True)
+
+    return {
         "predicted_crop": top_list[0]["crop"] if top_list else "Unknown",
         "confidence": top_list[0]["confidence"] if top_list else 0,
         "recommendations": top_list
-    })
+    }
+
+@PREDICT_STAGE_SECONDS.time(stage="ai_fallback")
+def fill_with_ai(data, final_list, existing_names):
+    """
+    Top up a local recommendation list with AI suggestions (with retry).
+    Raises if the AI added nothing, so the job ends as "error" and the
+    local-only list is never taken for the final one.
+    """
+    missing_count = MAX_RECOMMENDATIONS - len(final_list)
+    added = 0
+    last_error = None
+
+    max_retries = 2
+    for attempt in range(max_retries):
+        try:
+            ai_suggestions = get_ai_more_crops(data, list(existing_names), missing_count)
+            # Ensure each suggestion has required keys
+            for item in ai_suggestions:
+                if "confidence" not in item:
+                    item["confidence"] = 50  # Default confidence for AI suggestions
+                if "type" not in item:
+                    item["type"] = "AI Suggestion"
+                if "crop" not in item:
+                    continue
+                if item["crop"].lower() not in existing_names:
+                    final_list.append(item)
+                    existing_names.add(item["crop"].lower())
+                    added += 1
+
+            # Check if we have enough now
+            if len(final_list) >= MAX_RECOMMENDATIONS:
+                break
+            else:
+                missing_count = MAX_RECOMMENDATIONS - len(final_list)
+                print(f"Retry {attempt+1}: Still need {missing_count} more crops...")
+        except Exception as e:
+            print(f"AI Fallback Failed (attempt {attempt+1}): {e}")
+            last_error = e
+
+    if not added:
+        raise RuntimeError(f"AI fallback failed: {last_error}" if last_error else "AI returned no suggestions")
+    return recommendation_response(final_list)
+
+def start_ai_fill(data, entry):
+    """Queue an AI top-up for a cached entry; the entry keeps its own list"""
+    missing = MAX_RECOMMENDATIONS - len(entry["final_list"])
+    print(f"List has {len(entry['final_list'])} items. Asking AI for {missing} more in background...")
+    entry["ai_request_id"] = ai_jobs.submit(
+        fill_with_ai, dict(data), list(entry["final_list"]), set(entry["existing_names"])
+    )
+
+def cached_response(key, entry, data):
+    """Response for a cache entry, reusing (or finishing) its AI top-up job"""
+    with prediction_lock:
+        job_id = entry["ai_request_id"]
+        if job_id is None:
+            return dict(entry["response"])
+
+        job = ai_jobs.get(job_id)
+        if job is not None and job["status"] == "done":
+            # AI list is complete: serve it directly from now on
+            entry["response"] = job["result"]
+            entry["ai_request_id"] = None
+            return dict(entry["response"])
+        if job is not None and job["status"] == "error":
+            # Serve the local list, but only for PREDICT_FAILURE_TTL: then the
+            # entry is recomputed and the AI asked again
+            entry["ai_request_id"] = None
+            prediction_cache.put(key, entry, ttl=PREDICT_FAILURE_TTL)
+            return dict(entry["response"], ai_status="error")
+        if job is None:
+            start_ai_fill(data, entry)  # expired before anyone asked
+
+        return dict(entry["response"], ai_request_id=entry["ai_request_id"], ai_status="pending")
+
+@app.route("/api/model", methods=["GET"])
+def model_info():
+    """Active model version, checksum, load time and reload count"""
+    return jsonify(ml_model.stats())
+
+@app.route("/api/predict/cache", methods=["GET"])
+def prediction_cache_stats():
+    """Hit/miss counters for the recommendation cache"""
+    return jsonify(prediction_cache.stats())
+
+@app.route("/api/predict", methods=["POST"])
+def predict():
+    # Allow frontend to pass data (for Cloud Mode)
+    req_data = request.get_json(silent=True) or {}
+
+    # Use passed data if valid, else use the device's latest reading
+    if "N" in req_data:
+        data = req_data
+    else:
+        device = device_registry.get(req_data.get("device") or request.args.get("device"))
+        if device is None:
+            return jsonify({"error": f"Unknown device '{req_data.get('device') or request.args.get('device')}'"}), 404
+        data = device.latest
+
+    error = validate_reading(data)
+    if error:
+        return jsonify({"error": error}), 400
+    reading = quantize_reading(data, PREDICT_RESOLUTION)
+
+    compiled = crop_store.compiled()
+    model, model_version = ml_model.current()  # hold one model for the whole request
+    key = (reading, compiled.version, model_version)
+    entry = prediction_cache.get(key)
+    if entry is not None:
+        return jsonify(cached_response(key, entry, data))
+
+    # 1. ML Prediction + 2. User Custom Crops (Rule-based), on the rounded
+    # reading so a cached list is exactly what a fresh computation would give
+    X = np.array([reading], dtype=float)
+    with PREDICT_STAGE_SECONDS.time(stage="ml"):
+        probs, classes = ml_probabilities(X, model)
+    with PREDICT_STAGE_SECONDS.time(stage="rules"):
+        scores = score_readings(X, compiled)
+
+    # 3-4. Sort each group and merge by priority
+    with PREDICT_STAGE_SECONDS.time(stage="merge"):
+        final_list, existing_names = rank_recommendations(probs[0], classes, scores[0], compiled.crops)
+        entry = {
+            "response": recommendation_response(list(final_list)),
+            "final_list": final_list,
+            "existing_names": existing_names,
+            "ai_request_id": None,
+        }
+
+    # 5. AI FALLBACK: If still < 25, fill in the background (poll /api/predict/ai/<id>)
+    if len(final_list) < MAX_RECOMMENDATIONS:
+        start_ai_fill(data, entry)
+
+    prediction_cache.put(key, entry)
+    return jsonify(cached_response(key, entry, data))
+
+@app.route("/api/predict/ai/<job_id>", methods=["GET"])
+def predict_ai_result(job_id):
+    """Poll for the AI-filled recommendation list started by /api/predict"""
+    job = ai_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired AI request id"}), 404
+
+    if job["status"] == "done":
+        return jsonify({"ai_status": "done", **job["result"]})
+    if job["status"] == "error":
+        return jsonify({"ai_status": "error", "error": job["error"]})
+    return jsonify({"ai_status": "pending"})
+
+# ================= BATCH PREDICTION (MANY FIELDS) =================
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+
+@app.route("/api/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Score many sensor readings in one call.
+    Body: {"readings": [{N, P, K, temperature, soil_moisture, ph}, ...]}
+    The ML model and the rule scoring run once over the whole matrix.
+    No AI fallback here - one LLM call per field would defeat batching.
+    """
+    req_data = request.get_json(silent=True) or {}
+    readings = req_data.get("readings")
+
+    if not isinstance(readings, list) or not readings:
+        return jsonify({"error": "'readings' must be a non-empty list"}), 400
+    if len(readings) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Batch too large (max {MAX_BATCH_SIZE} readings)"}), 400
+
+    results = [None] * len(readings)
+    valid_idx = []
+    for i, r in enumerate(readings):
+        error = validate_reading(r) if isinstance(r, dict) else "Reading must be an object"
+        if error:
+            results[i] = {"error": error}
+        else:
+            valid_idx.append(i)
+
+    if valid_idx:
+        X = features_matrix([readings[i] for i in valid_idx])
+        with PREDICT_STAGE_SECONDS.time(stage="batch_ml"):
+            probs, classes = ml_probabilities(X, ml_model.get())
+        compiled = crop_store.compiled()
+        with PREDICT_STAGE_SECONDS.time(stage="batch_rules"):
+            scores = score_readings(X, compiled)
+
+        with PREDICT_STAGE_SECONDS.time(stage="batch_merge"):
+            for row, i in enumerate(valid_idx):
+                final_list, _ = rank_recommendations(probs[row], classes, scores[row], compiled.crops)
+                results[i] = recommendation_response(final_list)
+
+    return jsonify({"count": len(results), "results": results})
 
 # ================= DELETE CROP =================
 @app.route("/api/crops/<crop_name>", methods=["DELETE"])
 def delete_crop(crop_name):
-    crops = load_crops()
-    crops = [c for c in crops if c["name"] != crop_name]
-    save_crops(crops)
+    crop_store.delete(crop_name)
     return jsonify({"message": "Crop removed"})
 
 
+# ================= METRICS ENDPOINT =================
+# Values other modules already count are read at scrape time
+def device_samples(field):
+    return [((d.id,), d.status().get(field)) for d in device_registry.devices.values()]
+
+def reading_ages():
+    now = time.time()
+    return [(key, round(now - seen, 3) if seen else None) for key, seen in device_samples("last_seen")]
+
+CACHES = {"ai_crop": ai_crop_cache, "prediction": prediction_cache}
+
+def cache_samples(field):
+    return [((name,), cache.stats()[field]) for name, cache in CACHES.items()]
+
+metrics_registry.collector("serial_frames_total", "Frames decoded from the device", "counter", ["device"],
+                           lambda: device_samples("frames"))
+metrics_registry.collector("serial_bad_frames_total", "Malformed frames dropped by the decoder", "counter", ["device"],
+                           lambda: device_samples("bad_frames"))
+metrics_registry.collector("serial_reconnects_total", "Times the device's port was reopened", "counter", ["device"],
+                           lambda: device_samples("reconnects"))
+metrics_registry.collector("device_connected", "1 while the device is connected", "gauge", ["device"],
+                           lambda: [(key, int(bool(v))) for key, v in device_samples("connected")])
+metrics_registry.collector("sensor_last_reading_age_seconds", "Seconds since the device's last reading", "gauge",
+                           ["device"], reading_ages)
+metrics_registry.collector("cache_hits_total", "Cache lookups that found an entry", "counter", ["cache"],
+                           lambda: cache_samples("hits"))
+metrics_registry.collector("cache_misses_total", "Cache lookups that found nothing", "counter", ["cache"],
+                           lambda: cache_samples("misses"))
+metrics_registry.collector("cache_entries", "Entries held by the cache", "gauge", ["cache"],
+                           lambda: cache_samples("size"))
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """This process's counters and latency histograms, Prometheus text format"""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=0)"}), 404
+    return Response(metrics_registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ================= FRONTEND CATCH-ALL =================
 @app.route("/<path:path>")
 def serve_files(path):
     print(f"Serving file: {path}")  # Debug log
     return send_from_directory(FRONTEND_DIR, path)
 
+# ================= APP FACTORY =================
+# Importing this module only builds the app: no threads, no files written.
+# Serial readers (or, in a web worker, the shared-state watcher), the email
+# workers, the sensor log, the shared files and the model warm-up start here,
+# once per process (see wsgi.py for WSGI servers and ingest.py for ingestion).
+_started = False
+_start_lock = threading.Lock()
+_port_owner_lock = None  # open lock file, held while this process owns the serial ports
+
+def claim_serial_ports():
+    """Only one process (standalone or ingest) may open the serial ports"""
+    global _port_owner_lock
+    if fcntl is None:
+        return
+    os.makedirs(SHARED_STATE_DIR, exist_ok=True)
+    lock_file = open(os.path.join(SHARED_STATE_DIR, "serial.lock"), "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise RuntimeError(
+            "Another server process already owns the serial ports. For several workers use "
+            "gunicorn -c gunicorn.conf.py (PROCESS_ROLE=web workers + one ingest.py), not gunicorn -w N wsgi:app"
+        )
+    _port_owner_lock = lock_file
+
+def create_app(start_devices=True, warm_up=None):
+    global _started, shared_state
+    with _start_lock:
+        if not _started:
+            if start_devices and PROCESS_ROLE != "web":
+                claim_serial_ports()
+            _started = True
+            if warm_up if warm_up is not None else MODEL_WARMUP:
+                ml_model.warm_up()
+            if MODEL_RELOAD_SECONDS > 0 and PROCESS_ROLE != "ingest":
+                ml_model.watch(MODEL_RELOAD_SECONDS)
+            if start_devices:
+                email_dispatcher.start()
+            if start_devices and PROCESS_ROLE == "web":
+                devices = list(device_registry.devices.values())
+                shared_state.watch(lambda slot: push_changes(devices[slot]))
+            elif start_devices:
+                if PROCESS_ROLE == "ingest":
+                    for device in device_registry.devices.values():
+                        device.history = SensorHistory(capacity=HISTORY_CAPACITY, path=history_file(device.id))
+                    shared_state = SharedState(STATE_FILE, len(device_registry.devices), create=True)
+                    for device in device_registry.devices.values():
+                        publish_shared(device)
+                for device in device_registry.devices.values():
+                    device.log.start()
+                if WEATHER_REFRESH_SECONDS > 0:
+                    weather.start()
+                if firebase_sync:
+                    firebase_sync.start()
+                device_registry.start()
+    return app
+
 # ================= RUN =================
 if __name__ == "__main__":
     print("🚀 Starting Server with Alert Email:", ALERT_EMAILS)
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # The debug reloader runs this twice; only the serving child opens the ports
+    serving = os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    create_app(start_devices=serving, warm_up=serving).run(host="0.0.0.0", port=5000, debug=True)
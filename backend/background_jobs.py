@@ -0,0 +1,101 @@
+"""
+Small background job runner for slow work (AI calls) that shouldn't block a
+request. Jobs get an id the client can poll; finished jobs expire after a TTL.
+
+With a folder, every job is also written to <folder>/<id>.json so any worker
+process can answer a poll for a job another worker is running.
+"""
+import json, os, tempfile, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobStore:
+    def __init__(self, max_workers=2, ttl=600, folder=None):
+        self.ttl = ttl
+        self.folder = folder
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}  # job_id -> {"status", "result", "error", "created"}
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn in the background. Returns the job id."""
+        job_id = uuid.uuid4().hex
+        job = {"status": "pending", "result": None, "error": None, "created": time.time()}
+        with self._lock:
+            self._expire()
+            self._jobs[job_id] = job
+        self._sweep()
+        self._save(job_id, job)
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        """Job snapshot, or None if unknown/expired"""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self._load(job_id)
+
+    def _run(self, job_id, fn, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+            update = {"status": "done", "result": result}
+        except Exception as e:
+            print(f"Background job {job_id} failed: {e}")
+            update = {"status": "error", "error": str(e)}
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(update)
+            job = dict(job)
+        self._save(job_id, job)
+
+    def _expire(self):
+        """Drop jobs older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, job in self._jobs.items() if job["created"] < cutoff]:
+            del self._jobs[job_id]
+
+    # ---------- shared folder ----------
+    def _path(self, job_id):
+        return os.path.join(self.folder, f"{job_id}.json")
+
+    def _sweep(self):
+        """Remove expired job files, including ones left by other processes"""
+        if not self.folder:
+            return
+        os.makedirs(self.folder, exist_ok=True)  # on the first job, not at import
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.folder):
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _save(self, job_id, job):
+        if not self.folder:
+            return
+        fd, tmp_path = tempfile.mkstemp(prefix=".job-", suffix=".json", dir=self.folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(job, f)
+            os.replace(tmp_path, self._path(job_id))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Job {job_id} not shared: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _load(self, job_id):
+        """A job saved by another process, or None"""
+        if not self.folder or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id), "r") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return job if job["created"] >= time.time() - self.ttl else None
@@ -0,0 +1,82 @@
+"""
+Serial decoder throughput benchmark.
+
+Replays recorded frames through each decoder in serial-sized chunks and
+reports frames/s. Without --file, a synthetic recording is generated for
+every format (with a small share of corrupted frames).
+
+Usage:
+    python bench_frames.py                      # all formats, 200k frames
+    python bench_frames.py --frames 50000 --chunk 64
+    python bench_frames.py --file capture.bin --format binary
+"""
+import argparse, json, random, time
+
+from frames import FIELDS, encode_binary, encode_csv, make_decoder
+
+
+def synthetic_reading(rng):
+    return {
+        "N": rng.randint(0, 300), "P": rng.randint(0, 150), "K": rng.randint(0, 250),
+        "temperature": round(rng.uniform(10, 40), 1),
+        "soil_moisture": round(rng.uniform(0, 100), 1),
+        "ph": round(rng.uniform(4, 9), 2),
+        "motor": rng.randint(0, 1),
+    }
+
+
+def record(fmt, frames, corrupt, seed=42):
+    """Build a recording: bytes as they would arrive on the wire"""
+    rng = random.Random(seed)
+    encode = {
+        "json": lambda r: (json.dumps(r) + "\n").encode(),
+        "csv": encode_csv,
+        "binary": encode_binary,
+    }[fmt]
+
+    out = bytearray()
+    for _ in range(frames):
+        frame = bytearray(encode(synthetic_reading(rng)))
+        if rng.random() < corrupt:
+            frame[rng.randrange(len(frame) - 1)] ^= 0x5A
+        out += frame
+    return bytes(out)
+
+
+def replay(fmt, data, chunk):
+    decoder = make_decoder(fmt)
+    start = time.perf_counter()
+    decoded = 0
+    for i in range(0, len(data), chunk):
+        decoded += len(decoder.feed(data[i:i + chunk]))
+    elapsed = time.perf_counter() - start
+    return decoded, decoder.bad_frames, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200_000)
+    parser.add_argument("--chunk", type=int, default=256, help="bytes per serial read")
+    parser.add_argument("--corrupt", type=float, default=0.01, help="share of corrupted frames")
+    parser.add_argument("--file", help="replay a captured byte stream instead")
+    parser.add_argument("--format", choices=["json", "csv", "binary"])
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            recordings = {args.format or "json": f.read()}
+    else:
+        formats = [args.format] if args.format else ["json", "csv", "binary"]
+        recordings = {fmt: record(fmt, args.frames, args.corrupt) for fmt in formats}
+
+    print(f"{'format':<8} {'bytes':>11} {'frames':>9} {'bad':>7} {'seconds':>8} {'frames/s':>11} {'MB/s':>7}")
+    for fmt, data in recordings.items():
+        decoded, bad, elapsed = replay(fmt, data, args.chunk)
+        print(f"{fmt:<8} {len(data):>11,} {decoded:>9,} {bad:>7,} {elapsed:>8.3f} "
+              f"{decoded / elapsed:>11,.0f} {len(data) / elapsed / 1e6:>7.2f}")
+
+    print(f"\n{len(FIELDS)} fields per frame, {args.chunk}-byte reads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Irrigation controller benchmark on the simulated soil (irrigation.py).
+
+Runs each controller over the same simulated days (same seed, same sensor
+noise) and reports pump cycles, water applied, water drained past field
+capacity and time spent inside the crop's moisture range:
+
+  threshold   pump on whenever the raw reading is below a fixed threshold
+              (backend/Flask.py, PUMP_THRESHOLD = 35)
+  bang-bang   on at moist_min, off at the target, on raw readings
+              (the dashboard's Cloud Mode logic)
+  pi          PumpController
+
+Usage:
+    python bench_irrigation.py                   # 7 days, wheat range from crops.json
+    python bench_irrigation.py --days 30 --moist-min 60 --moist-max 85 --noise 3 --lag 900
+"""
+import argparse, json, os, time
+
+from irrigation import PumpController, SoilSimulator
+
+CROPS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crops.json")
+
+
+class ThresholdController:
+    def __init__(self, threshold=35):
+        self.threshold = threshold
+        self.on = False
+        self.cycles = 0
+
+    def update(self, ts, moisture):
+        on = moisture < self.threshold
+        if on != self.on:
+            self.on = on
+            self.cycles += on
+            return "ON" if on else "OFF"
+        return None
+
+
+class BangBangController(ThresholdController):
+    def __init__(self, moist_min, moist_max):
+        super().__init__()
+        self.moist_min = moist_min
+        self.target = PumpController(moist_min, moist_max).target
+
+    def update(self, ts, moisture):
+        if moisture <= self.moist_min and not self.on:
+            self.on = True
+            self.cycles += 1
+            return "ON"
+        if moisture >= self.target and self.on:
+            self.on = False
+            return "OFF"
+        return None
+
+
+def crop_range(name):
+    with open(CROPS_FILE) as f:
+        for crop in json.load(f):
+            if crop.get("name", "").strip().lower() == name.lower():
+                return float(crop["moist_min"]), float(crop["moist_max"])
+    raise SystemExit(f"Crop '{name}' not found in crops.json")
+
+
+def simulate(controller, days, step, moist_min, moist_max, seed, noise, lag, field_capacity):
+    soil = SoilSimulator(moisture=(moist_min + moist_max) / 2, noise=noise, seed=seed,
+                         infiltration_lag=lag, field_capacity=field_capacity)
+    in_range = below = 0
+    steps = int(days * 86400 / step)
+    switches = 0
+    started = time.perf_counter()
+    for i in range(steps):
+        if controller.update(i * step, soil.read()):
+            switches += 1
+        soil.step(step, controller.on)
+        in_range += moist_min <= soil.moisture <= moist_max
+        below += soil.moisture < moist_min
+    elapsed = time.perf_counter() - started
+    return {
+        "cycles": controller.cycles,
+        "switches": switches,
+        "water": soil.water_used,
+        "drained": soil.drained,
+        "in_range": in_range / steps * 100,
+        "below": below / steps * 100,
+        "us_per_update": elapsed / steps * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--step", type=float, default=5, help="seconds between sensor readings")
+    parser.add_argument("--crop", default="wheat", help="crop in crops.json for the moisture range")
+    parser.add_argument("--moist-min", type=float)
+    parser.add_argument("--moist-max", type=float)
+    parser.add_argument("--noise", type=float, default=1.5, help="sensor noise (std, % moisture)")
+    parser.add_argument("--lag", type=float, default=300, help="infiltration time constant (seconds)")
+    parser.add_argument("--field-capacity", type=float, default=85, help="moisture above this drains away")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.moist_min is not None and args.moist_max is not None:
+        moist_min, moist_max = args.moist_min, args.moist_max
+    else:
+        moist_min, moist_max = crop_range(args.crop)
+
+    controllers = {
+        "threshold": lambda: ThresholdController(),
+        "bang-bang": lambda: BangBangController(moist_min, moist_max),
+        "pi": lambda: PumpController(moist_min, moist_max),
+    }
+    print(f"{args.days:g} days, reading every {args.step:g}s, range {moist_min:g}-{moist_max:g}%, "
+          f"noise {args.noise:g}, lag {args.lag:g}s, field capacity {args.field_capacity:g}%")
+    print(f"{'controller':<10} {'cycles':>7} {'water':>8} {'drained':>8} {'in range':>9} {'below':>7} {'us/update':>10}")
+    for name, make in controllers.items():
+        r = simulate(make(), args.days, args.step, moist_min, moist_max, args.seed, args.noise, args.lag, args.field_capacity)
+        print(f"{name:<10} {r['cycles']:>7} {r['water']:>8.1f} {r['drained']:>8.1f} "
+              f"{r['in_range']:>8.1f}% {r['below']:>6.1f}% {r['us_per_update']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Server startup benchmark.
+
+Starts a fresh interpreter per run and reports how long `import app` takes
+and how long the first prediction request takes after that, with and
+without the background model warm-up. Serial readers are never started.
+
+Usage:
+    python bench_startup.py                    # this checkout, 5 runs
+    python bench_startup.py --runs 10
+    python bench_startup.py --app-dir /path/to/other/checkout/backend   # compare
+"""
+import argparse, json, os, statistics, subprocess, sys
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import app as server
+imported = time.perf_counter()
+
+warm_up = sys.argv[1] == "warm"
+factory = getattr(server, "create_app", None)
+if factory:
+    application = factory(start_devices=False, warm_up=warm_up)
+    if warm_up:
+        server.ml_model.wait()
+else:
+    application = server.app  # older checkouts: everything happens on import
+ready = time.perf_counter()
+
+reading = {"N": 90, "P": 42, "K": 43, "temperature": 21, "soil_moisture": 60, "ph": 6.5}
+client = application.test_client()
+before = time.perf_counter()
+resp = client.post("/api/predict/batch", json={"readings": [reading]})
+first = time.perf_counter()
+client.post("/api/predict/batch", json={"readings": [reading]})
+second = time.perf_counter()
+
+print(json.dumps({
+    "status": resp.status_code,
+    "import_ms": (imported - start) * 1000,
+    "ready_ms": (ready - start) * 1000,
+    "first_ms": (first - before) * 1000,
+    "second_ms": (second - first) * 1000,
+}))
+"""
+
+
+def run_once(app_dir, mode):
+    env = dict(
+        os.environ,
+        SERIAL_PORT=os.environ.get("BENCH_SERIAL_PORT", "/dev/bench-no-serial"),
+        SENSOR_PRINT_SECONDS="3600",
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, mode], cwd=app_dir, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+
+    print(f"{args.app_dir} ({args.runs} runs, median ms)")
+    print(f"{'mode':<8} {'import':>8} {'ready':>8} {'1st req':>8} {'2nd req':>8}")
+    for mode in ("lazy", "warm"):
+        runs = [run_once(args.app_dir, mode) for _ in range(args.runs)]
+        if any(r["status"] != 200 for r in runs):
+            print(f"{mode:<8} request failed (status {runs[0]['status']})")
+            continue
+        med = {k: statistics.median(r[k] for r in runs) for k in ("import_ms", "ready_ms", "first_ms", "second_ms")}
+        print(f"{mode:<8} {med['import_ms']:>8.1f} {med['ready_ms']:>8.1f} {med['first_ms']:>8.1f} {med['second_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,23 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
+"""
+Accuracy of the deployed model (ml_model.npz, else ml_model.pkl) on the
+held-out split train_model.py uses, with per-crop recall.
+"""
+import numpy as np
 
-# Load Data
-try:
-    df = pd.read_csv('Crop_recommendation.csv')
-    
-    # Prepare Features and Target
-    X = df[['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']]
-    y = df['label']
-    
-    # Split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Train
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-    
-    # Predict
-    y_pred = model.predict(X_test)
-    
-    # Accuracy
-    acc = accuracy_score(y_test, y_pred)
-    print(f"Model Accuracy: {acc * 100:.2f}%")
-    
-except Exception as e:
-    print(f"Error: {e}")
+from model_loader import ModelLoader
+from train_model import FEATURES, FOREST_FILE, MODEL_FILE, load_dataset, split
+
+X, y = load_dataset()
+_, X_test, _, y_test = split(X, y)
+
+loader = ModelLoader(FOREST_FILE, MODEL_FILE)
+model = loader.get()
+probs = model.predict_proba(X_test)
+pred = np.asarray(model.classes_)[probs.argmax(axis=1)]
+truth = np.asarray(y_test)
+
+print(f"Model: {loader.version} ({len(FEATURES)} features: {', '.join(FEATURES)})")
+print(f"Model Accuracy: {(pred == truth).mean() * 100:.2f}% on {len(truth)} held-out rows")
+for crop in sorted(set(truth)):
+    mask = truth == crop
+    print(f"  {crop:<12} {(pred[mask] == crop).mean() * 100:6.2f}%  ({mask.sum()} rows)")
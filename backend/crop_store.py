@@ -0,0 +1,231 @@
+"""
+Process-wide crop catalog backed by crops.json.
+
+The file is parsed once and kept in memory, indexed by lowercased crop name.
+Reads never parse the file again unless its mtime changes (checked at most
+once per CHECK_INTERVAL seconds, so hand edits are still picked up).
+Every mutation is written through to disk atomically (temp file + rename),
+under an exclusive lock on crops.json.lock so several server processes can
+edit the catalog without losing each other's changes.
+
+The store keeps a version counter and remembers which version last touched
+each crop (and which crops were removed), so clients can ask for only what
+changed since a version they already have.
+
+Loading and saving crops.json are timed (crops_file_seconds, see metrics.py).
+"""
+import contextlib, json, os, tempfile, threading, time
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process servers only
+    fcntl = None
+
+from metrics import registry
+from rule_engine import RULE_FIELDS, compile_crops, crop_ranges
+
+CHECK_INTERVAL = 2.0  # seconds between crops.json mtime checks
+MAX_TOMBSTONES = 1000  # removed-crop records kept for delta queries
+
+CROPS_FILE_SECONDS = registry.histogram("crops_file_seconds", "crops.json load / save time", ["op"])
+
+
+def crop_key(name):
+    """Index key for a crop name"""
+    return str(name or "").strip().lower()
+
+
+def validate_crop(crop):
+    """Raise ValueError unless the crop has a name and numeric min <= max ranges"""
+    if not str(crop.get("name", "")).strip():
+        raise ValueError("Crop name required")
+    lo, hi = crop_ranges(crop)
+    for (k_min, _, k_max, _), low, high in zip(RULE_FIELDS, lo, hi):
+        if low > high:
+            raise ValueError(f"{k_min} must not be above {k_max}")
+
+
+class CropStore:
+    def __init__(self, path, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        # Moves on every load or mutation: the crops.json mtime (in us, safe
+        # for JS numbers) of the state it reflects, so every process and
+        # every restart agrees on it
+        self.version = 0
+        self.updated_at = time.time()
+        self.delta_floor = None  # oldest version deltas can be computed from
+
+        self._lock = threading.RLock()
+        self._crops = {}  # crop_key(name) -> crop dict, in file order
+        self._mtime = None
+        self._file_id = None  # (mtime, inode, size): every atomic write makes a new inode
+        self._checked_at = 0.0
+        self._compiled = None
+        self._touched = {}  # crop key -> version that last added/changed it
+        self._removed = {}  # crop key -> (version, name) for deleted crops
+
+    # ---------- disk ----------
+    def _refresh(self, force=False):
+        """Reload crops.json if it changed on disk (caller holds the lock)"""
+        now = time.monotonic()
+        if not force and self._mtime is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        if not os.path.exists(self.path):
+            removed = [(k, c.get("name")) for k, c in self._crops.items()]
+            self._crops = {}
+            self._write()
+            self._changed(removed=removed)
+            if self.delta_floor is None:
+                self.delta_floor = self.version
+            return
+
+        st = os.stat(self.path)
+        if (st.st_mtime_ns, st.st_ino, st.st_size) == self._file_id:
+            return
+
+        with CROPS_FILE_SECONDS.time(op="load"), open(self.path, "r") as f:
+            crops = json.load(f)
+
+        old = self._crops
+        self._crops = {crop_key(c.get("name")): c for c in crops}
+        self._mtime = st.st_mtime_ns
+        self._file_id = (st.st_mtime_ns, st.st_ino, st.st_size)
+
+        # Diff against what we had so hand edits show up in deltas too
+        changed = [k for k, c in self._crops.items() if old.get(k) != c]
+        removed = [(k, old[k].get("name")) for k in old if k not in self._crops]
+        self._changed(changed, removed)
+        if self.delta_floor is None:
+            self.delta_floor = self.version
+
+    @CROPS_FILE_SECONDS.time(op="save")
+    def _write(self):
+        """Atomically persist the catalog (caller holds the lock)"""
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".crops-", suffix=".json", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(list(self._crops.values()), f, indent=4)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        st = os.stat(self.path)
+        self._mtime = st.st_mtime_ns
+        self._file_id = (st.st_mtime_ns, st.st_ino, st.st_size)
+        self._checked_at = time.monotonic()
+
+    @contextlib.contextmanager
+    def _mutating(self):
+        """Thread + cross-process lock, with the catalog freshly reloaded"""
+        with self._lock:
+            if fcntl is None:
+                self._refresh(force=True)
+                yield
+                return
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._refresh(force=True)
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _changed(self, keys=(), removed=()):
+        """Bump the version and record what changed (caller holds the lock)"""
+        self.version = max(self.version + 1, (self._mtime or 0) // 1000)
+        self.updated_at = time.time()
+        self._compiled = None
+        for key in keys:
+            self._touched[key] = self.version
+            self._removed.pop(key, None)
+        for key, name in removed:
+            self._touched.pop(key, None)
+            self._removed[key] = (self.version, name)
+
+        # Forget the oldest tombstones; deltas from before them need a full reload
+        while len(self._removed) > MAX_TOMBSTONES:
+            key = min(self._removed, key=lambda k: self._removed[k][0])
+            self.delta_floor = max(self.delta_floor or 0, self._removed.pop(key)[0])
+
+    # ---------- reads ----------
+    def all(self):
+        """All crops as a list (in insertion order)"""
+        with self._lock:
+            self._refresh()
+            return list(self._crops.values())
+
+    def get(self, name):
+        with self._lock:
+            self._refresh()
+            return self._crops.get(crop_key(name))
+
+    def changes_since(self, since):
+        """
+        Crops added/changed and names removed after version `since`.
+        Returns None when a delta can't be computed (too old or unknown).
+        """
+        with self._lock:
+            self._refresh()
+            if self.delta_floor is None or since < self.delta_floor or since > self.version:
+                return None
+            return {
+                "version": self.version,
+                "changed": [self._crops[k] for k, v in self._touched.items() if v > since],
+                "removed": [name for v, name in self._removed.values() if v > since],
+            }
+
+    def current_version(self):
+        """Catalog version, after picking up any change on disk"""
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def compiled(self):
+        """Rule-engine arrays for the current catalog, rebuilt only after changes"""
+        with self._lock:
+            self._refresh()
+            if self._compiled is None:
+                self._compiled = compile_crops(self._crops.values())
+                self._compiled.version = self.version
+            return self._compiled
+
+    # ---------- writes ----------
+    def upsert(self, crop):
+        """
+        Add a crop, replacing any existing crop with the same name.
+        Raises ValueError for invalid ranges (see validate_crop).
+        """
+        validate_crop(crop)
+        with self._mutating():
+            key = crop_key(crop.get("name"))
+            self._crops[key] = crop
+            self._write()
+            self._changed([key])
+
+    def delete(self, name):
+        """Remove a crop. Returns False if it wasn't found."""
+        with self._mutating():
+            key = crop_key(name)
+            crop = self._crops.pop(key, None)
+            if crop is None:
+                return False
+            self._write()
+            self._changed(removed=[(key, crop.get("name"))])
+            return True
+
+    def toggle_favorite(self, name):
+        """Flip a crop's favorite flag. Returns the new value, or None if not found."""
+        with self._mutating():
+            crop = self._crops.get(crop_key(name))
+            if crop is None:
+                return None
+            crop["favorite"] = not crop.get("favorite", False)
+            self._write()
+            self._changed([crop_key(name)])
+            return crop["favorite"]
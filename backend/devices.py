@@ -0,0 +1,272 @@
+"""
+Serial device registry.
+
+One supervised reader thread per port. Each device keeps its own latest
+reading and motor status, and the reader reconnects with exponential backoff
+when the port drops instead of exiting. Bytes are parsed by a pluggable frame
+decoder (see frames.py). Ports are opened with
+serial.serial_for_url, so plain device paths, pseudo-terminals (pty) and
+pyserial URLs (loop://, socket://host:port) all work.
+"""
+import threading, time
+
+import serial
+
+from frames import RateLimitedLog, make_decoder
+
+RECONNECT_MIN = 1.0   # seconds
+RECONNECT_MAX = 30.0
+
+reader_log = RateLimitedLog(interval=10.0)
+
+
+class Device:
+    def __init__(self, device_id, port, baud=9600, history=None, log=None, fmt="json"):
+        self.id = device_id
+        self.port = port
+        self.baud = baud
+        self.decoder = make_decoder(fmt)
+        self.history = history  # SensorHistory for this device (optional)
+        self.log = log          # SensorLogWriter for this device (optional)
+
+        self.latest = {}
+        # Bumped whenever `latest` changes; starts from the clock so ETags
+        # built from it never repeat across restarts
+        self.version = int(time.time() * 1000)
+        self.updated_at = None    # when `latest` last changed
+        self.motor_status = "offline"  # "online" or "offline"
+        self.connected = False
+        self.last_seen = None
+        self.reconnects = 0
+        self.last_error = None
+        self.alerts = {}  # alert_engine summary, updated when an alert changes state
+        self.irrigation = {}  # pump controller status (IRRIGATION_MODE=auto)
+
+    def status(self):
+        return {
+            "id": self.id,
+            "port": self.port,
+            "connected": self.connected,
+            "motor": self.motor_status,
+            "last_seen": self.last_seen,
+            "version": self.version,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            **self.decoder.stats(),
+        }
+
+
+class DeviceReader:
+    """Supervises one serial port: open, read lines, reconnect on failure"""
+
+    def __init__(self, device, on_reading=None, open_port=None, settle_time=2.0, on_status=None):
+        self.device = device
+        self.on_reading = on_reading
+        self.on_status = on_status  # called after connect / disconnect
+        self.open_port = open_port or (lambda port, baud: serial.serial_for_url(port, baud, timeout=1))
+        self.settle_time = settle_time  # Arduino resets when the port opens
+        self._stop = threading.Event()
+        self._thread = None
+        self._ser = None  # open port while connected, for write()
+        self._write_lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"serial-{self.device.id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        delay = RECONNECT_MIN
+        while not self._stop.is_set():
+            try:
+                ser = self.open_port(self.device.port, self.device.baud)
+            except Exception as e:
+                self._disconnected(e)
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+                continue
+
+            try:
+                self._stop.wait(self.settle_time)
+                self._ser = ser  # writable before anyone hears it is connected
+                self.device.connected = True
+                print(f"Arduino Serial Connected: {self.device.id} ({self.device.port})")
+                self._status_changed()
+                delay = RECONNECT_MIN
+                self._read_loop(ser)
+            except Exception as e:
+                self._disconnected(e)
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+            finally:
+                self._ser = None
+                try:
+                    ser.close()
+                except Exception:
+                    pass
+
+    def write(self, data):
+        """Send bytes to the device; False if it isn't connected or the write fails"""
+        ser = self._ser
+        if ser is None:
+            return False
+        try:
+            with self._write_lock:
+                ser.write(data)
+                ser.flush()
+            return True
+        except Exception as e:
+            print(f"Serial write error ({self.device.id}):", e)
+            return False
+
+    def _read_loop(self, ser):
+        decoder = self.device.decoder
+        while not self._stop.is_set():
+            chunk = ser.read(ser.in_waiting or 1)  # blocks up to the 1 s timeout
+            if not chunk:
+                continue
+            bad_before = decoder.bad_frames
+            for data in decoder.feed(chunk):
+                self._handle(data)
+            if decoder.bad_frames != bad_before:
+                reader_log.log(("bad", self.device.id), f"Bad {decoder.name} frames from {self.device.id}: {decoder.bad_frames} total")
+
+    def _handle(self, data):
+        self._apply(data)
+        if self.on_reading:
+            try:
+                self.on_reading(self.device, data)
+            except Exception as e:
+                print(f"Reading handler error ({self.device.id}): {e}")
+
+    def _apply(self, data):
+        """Make `data` the device's latest state"""
+        device = self.device
+        now = time.time()
+        if data != device.latest:
+            device.version += 1
+            device.updated_at = now
+        device.latest = data
+        device.last_seen = now
+
+        # Update motor status from Arduino data
+        if "motor" in data:
+            device.motor_status = "online" if data["motor"] == 1 else "offline"
+
+    def _disconnected(self, error):
+        device = self.device
+        if device.connected or device.last_error != str(error):
+            print(f"Serial Error ({device.id}):", error)
+        device.connected = False
+        device.motor_status = "offline"
+        device.last_error = str(error)
+        device.reconnects += 1
+        self._status_changed()
+
+    def _status_changed(self):
+        if self.on_status:
+            try:
+                self.on_status(self.device)
+            except Exception as e:
+                print(f"Status handler error ({self.device.id}): {e}")
+
+
+class VirtualReader(DeviceReader):
+    """
+    Feeds a Device from something other than a serial port (firebase_sync):
+    the source calls feed() / set_connected() and readings take the same
+    path as serial ones. write() goes to `writer` if one is given.
+    """
+
+    def __init__(self, device, on_reading=None, on_status=None, writer=None):
+        super().__init__(device, on_reading, on_status=on_status)
+        self.writer = writer
+
+    def start(self):
+        pass
+
+    def write(self, data):
+        if self.writer is None or not self.device.connected:
+            return False
+        return self.writer(data)
+
+    def feed(self, data, reading=True):
+        """
+        reading=False updates the latest state (e.g. the motor) without
+        counting as a new sensor reading: no history, log, alert or pump tick.
+        """
+        if reading:
+            self._handle(data)
+        else:
+            self._apply(data)
+            self._status_changed()
+
+    def set_connected(self, connected, error=None):
+        device = self.device
+        if connected and not device.connected:
+            device.connected = True
+            self._status_changed()
+        elif not connected and (device.connected or device.last_error != str(error)):
+            self._disconnected(error)
+
+
+class DeviceRegistry:
+    def __init__(self, on_reading=None, open_port=None, on_status=None):
+        self.on_reading = on_reading
+        self.on_status = on_status
+        self.open_port = open_port
+        self.devices = {}  # device id -> Device, first added is the default
+        self._readers = {}
+
+    def add(self, device):
+        self.devices[device.id] = device
+        self._readers[device.id] = DeviceReader(device, self.on_reading, self.open_port, on_status=self.on_status)
+        return device
+
+    def add_virtual(self, device, writer=None):
+        """Register a device fed by code instead of a port; returns its VirtualReader"""
+        self.devices[device.id] = device
+        reader = self._readers[device.id] = VirtualReader(device, self.on_reading, self.on_status, writer)
+        return reader
+
+    def get(self, device_id=None):
+        """Device by id, the default (first) device if id is empty, None if unknown"""
+        if not device_id:
+            return next(iter(self.devices.values()), None)
+        return self.devices.get(device_id)
+
+    def send(self, device_id, data):
+        """Write bytes to a device's port (False if unknown or not connected)"""
+        reader = self._readers.get(device_id)
+        return reader.write(data) if reader else False
+
+    def start(self):
+        for reader in self._readers.values():
+            reader.start()
+
+    def stop(self):
+        for reader in self._readers.values():
+            reader.stop()
+
+    def status(self):
+        return [d.status() for d in self.devices.values()]
+
+
+def parse_mapping(spec):
+    """'field1=COM3,field2=/dev/ttyUSB0' -> {"field1": "COM3", ...}"""
+    mapping = {}
+    for i, item in enumerate(p.strip() for p in (spec or "").split(",")):
+        if not item:
+            continue
+        key, sep, value = item.partition("=")
+        if not sep:
+            key, value = f"device{i + 1}", item
+        mapping[key.strip()] = value.strip()
+    return mapping
+
+
+def parse_ports(spec, default_port):
+    """Device id -> port from SERIAL_PORTS, or a single "default" device"""
+    return parse_mapping(spec) or {"default": default_port}
@@ -0,0 +1,191 @@
+"""
+Background email dispatch.
+
+Callers enqueue emails and return immediately; worker threads (started by
+start()) deliver them. A failed email waits out its backoff off the queue
+and is put back by the flusher, so it never holds up the others.
+Alerts are tracked per alert type: the first alert is sent right away, alerts
+that arrive during that type's cooldown are coalesced and sent as one digest
+once the cooldown ends. Queued emails and pending digests are spooled to a
+JSON file so a restart doesn't lose them.
+"""
+import json, os, queue, tempfile, threading, time, uuid
+
+MAX_DIGEST_VALUES = 50  # readings kept per pending digest
+
+
+class EmailDispatcher:
+    def __init__(self, deliver, build_alert, spool_path=None, max_queue=100, workers=1,
+                 cooldown=300, flush_interval=5, max_attempts=3):
+        """
+        deliver(email) -> bool sends {"subject", "html"}; build_alert(alert_type,
+        values) -> email builds an alert (or digest when len(values) > 1).
+        """
+        self.deliver = deliver
+        self.build_alert = build_alert
+        self.spool_path = spool_path
+        self.cooldown = cooldown
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._outbox = {}  # email id -> email, until delivered or given up
+        self._retry_at = {}  # email id -> when to queue it again after a failure
+        self._alerts = {}  # alert type -> {"last_sent": ts, "pending": [values]}
+        self._dirty = False
+        self.counters = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0, "coalesced": 0}
+
+        self.workers = workers
+        self._started = False
+        self._load_spool()
+
+    def start(self):
+        """Start the delivery workers and the spool flusher (once)"""
+        if self._started:
+            return
+        self._started = True
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+        threading.Thread(target=self._flusher, daemon=True).start()
+
+    # ---------- producers (never block) ----------
+    def send(self, email):
+        """Queue an email. Returns False if the queue is full."""
+        email = dict(email, id=email.get("id") or uuid.uuid4().hex, attempts=email.get("attempts", 0))
+        # In the outbox before the id is queued, so a worker always finds it
+        with self._lock:
+            self._outbox[email["id"]] = email
+        try:
+            self._queue.put_nowait(email["id"])
+        except queue.Full:
+            with self._lock:
+                self._outbox.pop(email["id"], None)
+                self.counters["dropped"] += 1
+            print(f"Email queue full. Dropping: {email.get('subject')}")
+            return False
+
+        with self._lock:
+            self.counters["queued"] += 1
+            self._dirty = True
+        return True
+
+    def alert(self, alert_type, value):
+        """Raise an alert; coalesced into a digest while its type is cooling down"""
+        now = time.time()
+        with self._lock:
+            state = self._alerts.setdefault(alert_type, {"last_sent": 0, "pending": []})
+            if now - state["last_sent"] < self.cooldown:
+                if len(state["pending"]) < MAX_DIGEST_VALUES:
+                    state["pending"].append(value)
+                self.counters["coalesced"] += 1
+                self._dirty = True
+                return False
+            state["last_sent"] = now
+            self._dirty = True
+
+        return self.send(self.build_alert(alert_type, [value]))
+
+    # ---------- workers ----------
+    def _worker(self):
+        while True:
+            email_id = self._queue.get()
+            with self._lock:
+                email = self._outbox.get(email_id)
+            if email is None:
+                continue
+
+            try:
+                ok = self.deliver(email)
+            except Exception as e:
+                print(f"Email error: {e}")
+                ok = False
+
+            with self._lock:
+                email["attempts"] += 1
+                if ok:
+                    self.counters["sent"] += 1
+                    del self._outbox[email_id]
+                elif email["attempts"] >= self.max_attempts:
+                    self.counters["failed"] += 1
+                    print(f"Giving up on email after {email['attempts']} attempts: {email.get('subject')}")
+                    del self._outbox[email_id]
+                else:
+                    # Back off without holding the worker; the flusher requeues it
+                    self._retry_at[email_id] = time.time() + min(30, 2 ** email["attempts"])
+                self._dirty = True
+
+    def _requeue_due(self, now):
+        """Put failed emails whose backoff has ended back on the queue"""
+        with self._lock:
+            due = [email_id for email_id, at in self._retry_at.items() if at <= now]
+        for email_id in due:
+            try:
+                self._queue.put_nowait(email_id)
+            except queue.Full:
+                break  # still due; tried again on the next flush
+            with self._lock:
+                self._retry_at.pop(email_id, None)
+
+    def _flusher(self):
+        """Send digests whose cooldown has ended and persist the spool"""
+        while True:
+            time.sleep(self.flush_interval)
+            now = time.time()
+            digests = []
+            with self._lock:
+                for alert_type, state in self._alerts.items():
+                    if state["pending"] and now - state["last_sent"] >= self.cooldown:
+                        digests.append((alert_type, state["pending"]))
+                        state["pending"] = []
+                        state["last_sent"] = now
+                        self._dirty = True
+
+            for alert_type, values in digests:
+                self.send(self.build_alert(alert_type, values))
+
+            self._requeue_due(now)
+            self._save_spool()
+
+    # ---------- spool ----------
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return
+        try:
+            with open(self.spool_path, "r") as f:
+                spool = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Email spool unreadable, starting empty: {e}")
+            return
+
+        self._alerts = spool.get("alerts", {})
+        for email in spool.get("outbox", []):
+            self.send(email)
+        self._dirty = False
+
+    def _save_spool(self):
+        with self._lock:
+            if not self.spool_path or not self._dirty:
+                return
+            spool = {"outbox": list(self._outbox.values()), "alerts": self._alerts}
+            data = json.dumps(spool)
+            self._dirty = False
+
+        folder = os.path.dirname(os.path.abspath(self.spool_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".spool-", suffix=".json", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.spool_path)
+        except OSError as e:
+            print(f"Email spool save failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self.counters,
+                backlog=len(self._outbox),
+                alerts={t: {"last_sent": s["last_sent"], "pending": len(s["pending"])} for t, s in self._alerts.items()},
+            )
@@ -0,0 +1,100 @@
+"""
+Server-Sent Events broadcaster.
+
+Producers publish (event, data) pairs; every subscriber has a small bounded
+queue. Publishing never blocks: a subscriber whose queue is full is dropped
+and its stream ends, so one slow dashboard can't hold up ingestion.
+With max_subscribers, subscribe() refuses new streams once that many are
+open (each holds a server thread for as long as the dashboard is open).
+"""
+import json, queue, threading
+
+HEARTBEAT_SECONDS = 15
+
+
+class Subscriber:
+    def __init__(self, max_queue, topic=None):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.topic = topic  # only receive events for this topic (e.g. device id)
+        self.dropped = False
+
+
+class Broadcaster:
+    def __init__(self, max_queue=32, max_subscribers=None):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.published = 0
+        self.dropped = 0
+        self.refused = 0
+
+    def subscribe(self, topic=None):
+        """New subscriber, or None when max_subscribers are already open"""
+        sub = Subscriber(self.max_queue, topic)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                self.refused += 1
+                return None
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event, data, topic=None):
+        """Queue an event for every matching subscriber; drop the ones that lag"""
+        message = self.format(event, data)
+        with self._lock:
+            self.published += 1
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            if sub.topic is not None and topic is not None and sub.topic != topic:
+                continue
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                self._drop(sub)
+
+    def _drop(self, sub):
+        sub.dropped = True
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.discard(sub)
+                self.dropped += 1
+        # Make room for a final wake-up so the stream generator exits promptly
+        try:
+            sub.queue.get_nowait()
+            sub.queue.put_nowait(None)
+        except (queue.Empty, queue.Full):
+            pass
+
+    def stream(self, sub, initial=()):
+        """Generator of SSE text for a Flask streaming response"""
+        try:
+            for message in initial:
+                yield message
+            while not sub.dropped:
+                try:
+                    message = sub.queue.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(sub)
+
+    @staticmethod
+    def format(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers), "max_subscribers": self.max_subscribers,
+                "published": self.published, "dropped": self.dropped, "refused": self.refused,
+            }
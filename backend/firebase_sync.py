@@ -0,0 +1,241 @@
+"""
+Firebase Realtime Database -> server sync for Cloud Mode.
+
+Instead of every dashboard downloading the whole RTDB root every 5 s, the
+server keeps one mirror of the few paths Cloud Mode needs and feeds it to a
+virtual device, so cloud readings get the same latest state, history, log,
+alerts and SSE push as serial ones.
+
+Two ways to follow the database (REST API):
+
+  stream  one long-lived GET per path with Accept: text/event-stream; the
+          first "put" is the path's current value, later put/patch events
+          carry only what changed. Reconnects with backoff.
+  poll    GET each path every `interval` seconds; only changes are applied.
+
+on_change(tree) is called with the mirrored {path: value} after every
+change. cloud_reading() maps it to a sensor reading, with the same key
+variations the dashboard accepted.
+
+motorControl has a single writer. With IRRIGATION_MODE=auto and a crop for
+the cloud device, that is the server's pump controller (through put()):
+dashboards stop writing it (/api/config PUMP_CONTROL) and app.py restores
+the controller's state if anything else changes it. Otherwise the
+dashboards write it and the server only mirrors it.
+"""
+import json, threading, time
+
+DEFAULT_PATHS = ["soilData", "rainStatus", "motorControl", "waterStatus"]
+RECONNECT_MIN = 1.0   # seconds
+RECONNECT_MAX = 60.0
+STREAM_READ_TIMEOUT = 90  # Firebase sends keep-alive events every ~30 s
+
+
+def _set_path(value, parts, new):
+    """Copy of `value` with the node at `parts` replaced by `new` (None deletes)"""
+    if not parts:
+        return new
+    node = dict(value) if isinstance(value, dict) else {}
+    child = _set_path(node.get(parts[0]), parts[1:], new)
+    if child is None:
+        node.pop(parts[0], None)
+    else:
+        node[parts[0]] = child
+    return node or None
+
+
+def apply_event(value, event, payload):
+    """Apply a put / patch stream event to the mirrored value of one path"""
+    parts = [p for p in payload.get("path", "/").split("/") if p]
+    data = payload.get("data")
+    if event == "put":
+        return _set_path(value, parts, data)
+    if event == "patch":
+        for key, child in (data or {}).items():
+            value = _set_path(value, parts + [p for p in key.split("/") if p], child)
+        return value
+    return value
+
+
+class FirebaseSync:
+    def __init__(self, client, base_url, auth=None, paths=DEFAULT_PATHS, on_change=None,
+                 mode="stream", interval=5.0, on_status=None):
+        if mode not in ("stream", "poll"):
+            raise ValueError(f"Firebase sync mode must be stream or poll, not '{mode}'")
+        self.client = client  # http_clients.OutboundClient
+        self.base_url = base_url.rstrip("/")
+        self.auth = auth
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.on_status = on_status  # on_status(online, error) when all paths connect / one drops
+        self.mode = mode
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.tree = {}
+        self.received = set()  # paths loaded at least once; on_change waits for all of them
+        self.connected = {}  # path -> bool
+        self.events = 0
+        self.changes = 0
+        self.last_change = None
+        self.last_error = None
+
+    # ---------- REST ----------
+    def url(self, path):
+        return f"{self.base_url}/{path.strip('/')}.json"
+
+    def _params(self):
+        return {"auth": self.auth} if self.auth else None
+
+    def get(self, path):
+        response = self.client.get(self.url(path), params=self._params())
+        response.raise_for_status()
+        return response.json()
+
+    def put(self, path, value):
+        """Write a value (e.g. motorControl); True on success"""
+        try:
+            response = self.client.put(self.url(path), params=self._params(), json=value)
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            print(f"Firebase write failed ({path}): {e}")
+            return False
+
+    # ---------- mirror ----------
+    def _update(self, path, value):
+        with self._lock:
+            first = path not in self.received
+            self.received.add(path)
+            if self.tree.get(path) == value and not first:
+                return
+            if value is None:
+                self.tree.pop(path, None)
+            else:
+                self.tree[path] = value
+            self.changes += 1
+            self.last_change = time.time()
+            tree = dict(self.tree)
+            complete = len(self.received) == len(self.paths)
+        if self.on_change and complete:
+            try:
+                self.on_change(tree)
+            except Exception as e:
+                print(f"Firebase sync handler error: {e}")
+
+    # ---------- workers ----------
+    def start(self):
+        if self.mode == "poll":
+            threading.Thread(target=self._poll, name="firebase-poll", daemon=True).start()
+            return
+        for path in self.paths:
+            threading.Thread(target=self._stream, args=(path,), name=f"firebase-{path}", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _poll(self):
+        while not self._stop.is_set():
+            for path in self.paths:
+                try:
+                    value = self.get(path)
+                    self._set_connected(path, True)
+                    self._update(path, value)
+                except Exception as e:
+                    self._failed(path, e)
+            self._stop.wait(self.interval)
+
+    def _stream(self, path):
+        delay = RECONNECT_MIN
+        while not self._stop.is_set():
+            try:
+                response = self.client.get(
+                    self.url(path), params=self._params(), stream=True,
+                    headers={"Accept": "text/event-stream"}, timeout=(10, STREAM_READ_TIMEOUT)
+                )
+                with response:
+                    response.raise_for_status()
+                    delay = RECONNECT_MIN
+                    self._read_events(path, response)
+                raise ConnectionError("stream closed")
+            except Exception as e:
+                self._failed(path, e)
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+
+    def _read_events(self, path, response):
+        event, data = None, []
+        # chunk_size=1: events must be handled as they arrive, and a stream without
+        # chunked encoding would otherwise block until a whole buffer fills
+        for line in response.iter_lines(chunk_size=1, decode_unicode=True):
+            if self._stop.is_set():
+                return
+            if line:
+                field, _, value = line.partition(":")
+                if field == "event":
+                    event = value.strip()
+                elif field == "data":
+                    data.append(value.strip())
+                continue
+            # blank line: end of one event
+            if event in ("put", "patch"):
+                self.events += 1
+                payload = json.loads("\n".join(data))
+                self._set_connected(path, True)
+                self._update(path, apply_event(self.tree.get(path), event, payload))
+            elif event in ("cancel", "auth_revoked"):
+                raise ConnectionError(f"stream {event}")
+            event, data = None, []
+
+    def _failed(self, path, error):
+        if self.connected.get(path, True) or self.last_error != str(error):
+            print(f"Firebase sync error ({path}):", error)
+        self.last_error = str(error)
+        self._set_connected(path, False)
+
+    def _set_connected(self, path, connected):
+        with self._lock:
+            was_online = self.online
+            self.connected[path] = connected
+            online = self.online
+        if online != was_online and self.on_status:
+            try:
+                self.on_status(online, None if online else self.last_error)
+            except Exception as e:
+                print(f"Firebase sync status handler error: {e}")
+
+    # ---------- introspection ----------
+    @property
+    def online(self):
+        return bool(self.connected) and all(self.connected.get(p) for p in self.paths)
+
+    def stats(self):
+        return {
+            "mode": self.mode, "paths": self.paths, "online": self.online, "connected": dict(self.connected),
+            "events": self.events, "changes": self.changes, "last_change": self.last_change,
+            "last_error": self.last_error,
+        }
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def cloud_reading(tree):
+    """Sensor reading (same keys as serial) from the mirrored Cloud Mode paths"""
+    soil = tree.get("soilData") or {}
+    reading = {
+        "N": _number(soil.get("nitrogen", soil.get("Nitrogen", soil.get("N")))),
+        "P": _number(soil.get("phosphorus", soil.get("Phosphorus", soil.get("P")))),
+        "K": _number(soil.get("potassium", soil.get("Potassium", soil.get("K")))),
+        "temperature": _number(soil.get("temperature")),
+        "soil_moisture": _number(soil.get("moisture")),
+        "ph": _number(soil.get("ph")),
+        "motor": 1 if tree.get("motorControl") == "ON" else 0,
+        "rainStatus": tree.get("rainStatus"),
+        "waterStatus": tree.get("waterStatus") or "WATER",
+    }
+    return reading
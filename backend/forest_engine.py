@@ -0,0 +1,154 @@
+"""
+Pure-NumPy inference for the crop RandomForest.
+
+export_forest() flattens a fitted sklearn RandomForestClassifier into packed
+node arrays saved as .npz; PackedForest loads them and runs predict_proba for
+a whole batch by walking every (reading, tree) pair one level per step. The
+server can then predict without importing sklearn or pandas.
+
+The .npz records the sha256 of the pickle it was exported from, so the
+server can tell a forest that no longer matches ml_model.pkl.
+
+Convert an existing pickle (and check it against sklearn):
+    python forest_engine.py ml_model.pkl ml_model.npz
+"""
+import hashlib, sys
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def pack_forest(model):
+    """Packed node arrays of a fitted RandomForestClassifier (the .npz contents)"""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for est in model.estimators_:
+        tree = est.tree_
+        is_leaf = tree.children_left < 0
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+
+        # Per-node class distribution, normalized like DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1
+        values.append(value / totals)
+
+        offset += tree.node_count
+
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values),
+        "roots": np.array(roots, dtype=np.int32),
+        "classes": np.array([str(c) for c in model.classes_]),
+        "n_features": np.int32(model.n_features_in_),
+    }
+
+
+def export_forest(model, path, source_sha256=""):
+    """Flatten a fitted RandomForestClassifier into `path` (.npz); source_sha256 = hash of its pickle"""
+    np.savez(
+        path,
+        format_version=np.int32(FORMAT_VERSION),
+        source_sha256=np.array(source_sha256),
+        **pack_forest(model),
+    )
+
+
+class PackedForest:
+    """Drop-in for the fitted model's predict_proba / classes_"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, n_features, source_sha256=None):
+        self.feature = np.ascontiguousarray(feature)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.left = np.ascontiguousarray(left)
+        self.right = np.ascontiguousarray(right)
+        self.value = np.ascontiguousarray(value)
+        self.roots = np.ascontiguousarray(roots)
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+        self.source_sha256 = source_sha256 or None  # pickle it was exported from (None: unknown)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported forest format {int(data['format_version'])}")
+            return cls(
+                data["feature"], data["threshold"], data["left"], data["right"],
+                data["value"], data["roots"], data["classes"], data["n_features"],
+                str(data["source_sha256"]) if "source_sha256" in data.files else None,
+            )
+
+    def same_as(self, model):
+        """True if this forest has exactly the nodes of the fitted sklearn model"""
+        packed = pack_forest(model)
+        return int(packed["n_features"]) == self.n_features_in_ and all(
+            np.array_equal(packed[name], getattr(self, name))
+            for name in ("feature", "threshold", "left", "right", "value", "roots")
+        ) and np.array_equal(packed["classes"], self.classes_)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Leaf node index reached in every tree: (n_readings x n_trees)"""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features_in_)
+        n_readings, n_features = X.shape
+        flat_x = X.ravel()
+
+        # One slot per (reading, tree); only slots not yet at a leaf are walked
+        nodes = np.tile(self.roots, n_readings)
+        row_base = np.repeat(np.arange(n_readings) * n_features, self.n_trees)
+        active = np.flatnonzero(self.left[nodes] >= 0)
+        while active.size:
+            node = nodes[active]
+            go_left = flat_x[row_base[active] + self.feature[node]] <= self.threshold[node]
+            child = np.where(go_left, self.left[node], self.right[node])
+            nodes[active] = child
+            active = active[self.left[child] >= 0]
+        return nodes.reshape(n_readings, self.n_trees)
+
+    def predict_proba(self, X):
+        """Mean of per-tree leaf class distributions: (n_readings x n_classes)"""
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def verify(model, forest, X, atol=1e-9):
+    """Max abs difference between sklearn and packed predict_proba on X"""
+    diff = np.abs(model.predict_proba(X) - forest.predict_proba(np.asarray(X)))
+    max_diff = float(diff.max()) if diff.size else 0.0
+    if max_diff > atol:
+        raise AssertionError(f"Packed forest differs from sklearn by {max_diff}")
+    return max_diff
+
+
+if __name__ == "__main__":
+    import pickle
+
+    src = sys.argv[1] if len(sys.argv) > 1 else "ml_model.pkl"
+    dst = sys.argv[2] if len(sys.argv) > 2 else "ml_model.npz"
+
+    with open(src, "rb") as f:
+        raw = f.read()
+    model = pickle.loads(raw)
+    export_forest(model, dst, source_sha256=hashlib.sha256(raw).hexdigest())
+    forest = PackedForest.load(dst)
+
+    rng = np.random.default_rng(0)
+    X = rng.uniform([0, 0, 0, 0, 0, 3], [350, 180, 300, 45, 100, 9], size=(2000, forest.n_features_in_))
+    print(f"Exported {forest.n_trees} trees / {len(forest.feature)} nodes to {dst}")
+    print(f"Max |sklearn - packed| on 2000 random readings: {verify(model, forest, X):.2e}")
@@ -0,0 +1,213 @@
+"""
+Serial frame decoders.
+
+A decoder is fed raw bytes as they arrive and returns the complete readings
+it found; malformed frames are counted, not printed. Formats:
+
+  json    one JSON object per line (the original Arduino sketch)
+          {"N":120,"P":45,"K":80,"temperature":25.1,"soil_moisture":41,"ph":6.5,"motor":1}
+
+  csv     N,P,K,temperature,soil_moisture,ph,motor*CS  (one per line)
+          CS = two hex digits, sum of the bytes before '*' modulo 256
+
+  binary  0xAA 0x55 | <6f B little-endian payload (25 bytes) | CS
+          CS = sum of the payload bytes modulo 256; 28 bytes per frame
+          Arduino: Serial.write(0xAA); Serial.write(0x55);
+                   Serial.write((uint8_t*)&frame, 25); Serial.write(cs);
+
+Pump commands sent back to the Arduino use the same format as its readings:
+
+  json    {"pump":1}\n  /  {"pump":0}\n
+  csv     PUMP,1*CS\n   (CS as above)
+  binary  0xAA 0x56 | 1 byte (1 = on, 0 = off) | CS
+"""
+import json, struct, time
+
+FIELDS = ["N", "P", "K", "temperature", "soil_moisture", "ph"]
+MAX_LINE = 1024  # bytes; longer garbage is discarded
+
+
+class FrameDecoder:
+    name = None
+
+    def __init__(self):
+        self.frames = 0
+        self.bad_frames = 0
+        self._buf = bytearray()
+
+    def feed(self, data):
+        """Consume bytes, return a list of decoded readings (dicts)"""
+        raise NotImplementedError
+
+    def stats(self):
+        return {"format": self.name, "frames": self.frames, "bad_frames": self.bad_frames}
+
+
+class LineDecoder(FrameDecoder):
+    """Newline-delimited frames; subclasses implement decode_line()"""
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        readings = []
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buf[start:end]).strip()
+            start = end + 1
+            if not line:
+                continue
+            reading = self.decode_line(line)
+            if reading is None:
+                self.bad_frames += 1
+            else:
+                self.frames += 1
+                readings.append(reading)
+        del buf[:start]
+
+        if len(buf) > MAX_LINE:
+            self.bad_frames += 1
+            buf.clear()
+        return readings
+
+    def decode_line(self, line):
+        raise NotImplementedError
+
+
+class JsonLineDecoder(LineDecoder):
+    name = "json"
+
+    def decode_line(self, line):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+class CsvLineDecoder(LineDecoder):
+    name = "csv"
+
+    def decode_line(self, line):
+        body, star, checksum = line.rpartition(b"*")
+        if not star:
+            return None
+        try:
+            if int(checksum, 16) != sum(body) & 0xFF:
+                return None
+            values = body.split(b",")
+            if len(values) != len(FIELDS) + 1:
+                return None
+            reading = dict(zip(FIELDS, map(float, values[:-1])))
+            reading["motor"] = int(values[-1])
+        except ValueError:
+            return None
+        return reading
+
+
+SYNC = b"\xaa\x55"
+PAYLOAD = struct.Struct("<6fB")  # precompiled: N, P, K, temperature, soil_moisture, ph, motor
+FRAME_LEN = len(SYNC) + PAYLOAD.size + 1
+
+
+class BinaryFrameDecoder(FrameDecoder):
+    name = "binary"
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        readings = []
+        pos = 0
+        while True:
+            start = buf.find(SYNC, pos)
+            if start < 0:
+                # Keep a trailing 0xAA that may begin the next sync
+                pos = len(buf) - 1 if buf.endswith(SYNC[:1]) else len(buf)
+                break
+            if start > pos:
+                self.bad_frames += 1  # skipped noise between frames
+            if len(buf) - start < FRAME_LEN:
+                pos = start
+                break
+
+            payload_at = start + len(SYNC)
+            checksum_at = payload_at + PAYLOAD.size
+            if sum(buf[payload_at:checksum_at]) & 0xFF != buf[checksum_at]:
+                self.bad_frames += 1
+                pos = start + 1  # resync past this false sync
+                continue
+
+            values = PAYLOAD.unpack_from(buf, payload_at)
+            reading = dict(zip(FIELDS, values))  # float32 precision; round for display
+            reading["motor"] = values[-1]
+            readings.append(reading)
+            self.frames += 1
+            pos = start + FRAME_LEN
+
+        del buf[:pos]
+        return readings
+
+
+def encode_csv(reading):
+    """Build a csv frame (used by benchmarks and simulators)"""
+    body = ",".join(str(reading[f]) for f in FIELDS) + f",{int(reading.get('motor', 0))}"
+    body = body.encode()
+    return body + b"*%02X\n" % (sum(body) & 0xFF)
+
+
+def encode_binary(reading):
+    """Build a binary frame (used by benchmarks and simulators)"""
+    payload = PAYLOAD.pack(*(float(reading[f]) for f in FIELDS), int(reading.get("motor", 0)))
+    return SYNC + payload + bytes([sum(payload) & 0xFF])
+
+
+COMMAND_SYNC = b"\xaa\x56"
+
+
+def encode_pump_command(fmt, on):
+    """Pump on/off command frame for a device using frame format `fmt`"""
+    value = 1 if on else 0
+    if fmt == "json":
+        return json.dumps({"pump": value}, separators=(",", ":")).encode() + b"\n"
+    if fmt == "csv":
+        body = b"PUMP,%d" % value
+        return body + b"*%02X\n" % (sum(body) & 0xFF)
+    if fmt == "binary":
+        return COMMAND_SYNC + bytes([value, value])
+    raise ValueError(f"Unknown serial format '{fmt}' (expected one of: {', '.join(DECODERS)})")
+
+
+DECODERS = {
+    "json": JsonLineDecoder,
+    "csv": CsvLineDecoder,
+    "binary": BinaryFrameDecoder,
+}
+
+
+def make_decoder(fmt="json"):
+    try:
+        return DECODERS[fmt]()
+    except KeyError:
+        raise ValueError(f"Unknown serial format '{fmt}' (expected one of: {', '.join(DECODERS)})")
+
+
+class RateLimitedLog:
+    """print() at most once per interval per key, reporting how many were suppressed"""
+
+    def __init__(self, interval=10.0):
+        self.interval = interval
+        self._last = {}  # key -> (last printed at, suppressed count)
+
+    def log(self, key, *args):
+        now = time.monotonic()
+        last, suppressed = self._last.get(key, (0.0, 0))
+        if now - last < self.interval:
+            self._last[key] = (last, suppressed + 1)
+            return
+        self._last[key] = (now, 0)
+        if suppressed:
+            print(*args, f"(+{suppressed} more)")
+        else:
+            print(*args)
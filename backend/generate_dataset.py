@@ -1,5 +1,24 @@
+"""
+Synthetic crop dataset generator.
+
+Each crop has a range per feature (the built-in table below, plus the user
+crops in crops.json with --crops all|user). Rows are drawn uniformly inside
+the ranges with NumPy, a chunk at a time, so memory stays bounded however
+many rows are requested. --overlap widens every range by that fraction of
+its width on each side (classes start to overlap); --noise adds Gaussian
+jitter with that fraction of the range width as standard deviation.
+
+Usage:
+    python generate_dataset.py                         # 2000 rows, 5 built-in crops -> Crop_dataset.csv
+    python generate_dataset.py --rows 5000000 --crops all --noise 0.05 --overlap 0.1 \\
+        --seed 1 --output big.parquet
+"""
+import argparse, json, os, time
+
+import numpy as np
 import pandas as pd
-import random
+
+from rule_engine import compile_crops
 
 crops = {
     "Rice": {
@@ -24,21 +43,131 @@ crops = {
     }
 }
 
-rows = []
+COLUMNS = ["N", "P", "K", "temperature", "soil_moisture", "ph"]
+TABLE_KEYS = ["N", "P", "K", "temp", "moist", "ph"]  # built-in table key per column
+DECIMALS = [0, 0, 0, 1, 1, 2]
+LIMITS = [(0, None), (0, None), (0, None), (None, None), (0, 100), (0, 14)]
+CROPS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crops.json")
+BLOCK_ROWS = 65536  # rows per random stream: seeded output doesn't depend on --chunk-size
+
+
+def crop_ranges(which="builtin", crops_file=CROPS_FILE):
+    """(names, lo, hi) with lo/hi as (n_crops x 6) arrays in COLUMNS order"""
+    names = []
+    lo, hi = [], []
+    if which in ("builtin", "all"):
+        for name, r in crops.items():
+            names.append(name)
+            lo.append([r[k][0] for k in TABLE_KEYS])
+            hi.append([r[k][1] for k in TABLE_KEYS])
+
+    if which in ("user", "all"):
+        with open(crops_file) as f:
+            user = [c for c in json.load(f) if str(c.get("name", "")).strip()]
+        known = {n.lower() for n in names}
+        user = [c for c in user if c["name"].strip().lower() not in known]
+        compiled = compile_crops(user)
+        for crop, mins, maxs in zip(compiled.crops, compiled.mins, compiled.maxs):
+            if not (maxs > mins).any():
+                continue  # placeholder entry with no ranges
+            names.append(crop["name"].strip())
+            lo.append(mins)
+            hi.append(maxs)
+
+    if not names:
+        raise ValueError(f"No crops with ranges found for --crops {which}")
+    return names, np.array(lo, dtype=np.float64), np.array(hi, dtype=np.float64)
+
+
+def generate_chunk(rng, labels, lo, hi, noise=0.0, overlap=0.0):
+    """Feature matrix for the given class labels (one row per label)"""
+    width = hi - lo
+    lo = (lo - overlap * width)[labels]
+    hi = (hi + overlap * width)[labels]
+    width = width[labels]
+
+    X = np.empty((len(labels), len(COLUMNS)), dtype=np.float64)
+    for j, decimals in enumerate(DECIMALS):
+        if decimals == 0:
+            # inclusive integer ranges, like random.randint
+            col = rng.integers(np.floor(lo[:, j]).astype(np.int64), np.floor(hi[:, j]).astype(np.int64) + 1).astype(np.float64)
+        else:
+            col = rng.uniform(lo[:, j], hi[:, j])
+        if noise:
+            col += rng.normal(0.0, 1.0, len(labels)) * noise * width[:, j]
+        low, high = LIMITS[j]
+        if low is not None or high is not None:
+            np.clip(col, low, high, out=col)
+        X[:, j] = np.round(col, decimals)
+    return X
+
+
+def write_dataset(path, rows, names, lo, hi, noise=0.0, overlap=0.0, seed=None, chunk_size=1_000_000):
+    """Stream `rows` rows (equal share per crop, grouped by crop) to CSV or Parquet"""
+    rng = np.random.default_rng(seed)
+    chunk_size = max(BLOCK_ROWS, chunk_size // BLOCK_ROWS * BLOCK_ROWS)
+    parquet = path.endswith(".parquet")
+    writer = None
+    if parquet:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+
+    label_names = np.array(names, dtype=object)
+    written = 0
+    try:
+        for start in range(0, rows, chunk_size):
+            idx = np.arange(start, min(start + chunk_size, rows))
+            labels = idx * len(names) // rows  # crop blocks in table order, as before
+            X = np.concatenate([
+                generate_chunk(
+                    rng if seed is None else np.random.default_rng([seed, (start + b) // BLOCK_ROWS]),
+                    labels[b:b + BLOCK_ROWS], lo, hi, noise, overlap
+                )
+                for b in range(0, len(labels), BLOCK_ROWS)
+            ])
+
+            df = pd.DataFrame(X, columns=COLUMNS)
+            for col, decimals in zip(COLUMNS, DECIMALS):
+                if decimals == 0:
+                    df[col] = df[col].astype(np.int64)
+            df["crop"] = label_names[labels]
+
+            if parquet:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                df.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+            written += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="total rows (split evenly across crops)")
+    parser.add_argument("--crops", choices=["builtin", "user", "all"], default="builtin")
+    parser.add_argument("--noise", type=float, default=0.0, help="Gaussian jitter, fraction of range width")
+    parser.add_argument("--overlap", type=float, default=0.0, help="widen ranges by this fraction per side")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible output")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="rows generated and written at a time")
+    parser.add_argument("--output", default="Crop_dataset.csv", help=".csv or .parquet")
+    args = parser.parse_args()
+
+    names, lo, hi = crop_ranges(args.crops)
+    start = time.perf_counter()
+    written = write_dataset(args.output, args.rows, names, lo, hi, args.noise, args.overlap, args.seed, args.chunk_size)
+    elapsed = time.perf_counter() - start
 
-for crop, r in crops.items():
-    for _ in range(400):  # 400 rows per crop → 2000 rows total
-        rows.append({
-            "N": random.randint(*r["N"]),
-            "P": random.randint(*r["P"]),
-            "K": random.randint(*r["K"]),
-            "temperature": round(random.uniform(*r["temp"]), 1),
-            "soil_moisture": round(random.uniform(*r["moist"]), 1),
-            "ph": round(random.uniform(*r["ph"]), 2),
-            "crop": crop
-        })
+    print("✅", args.output, "created with", f"{written:,}", "rows for", len(names), "crops",
+          f"({written / elapsed:,.0f} rows/s)")
 
-df = pd.DataFrame(rows)
-df.to_csv("Crop_dataset.csv", index=False)
 
-print("✅ Crop_dataset.csv created with", len(df), "rows")
+if __name__ == "__main__":
+    main()
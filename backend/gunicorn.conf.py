@@ -0,0 +1,84 @@
+"""
+Production serving (from the backend folder):
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The master starts one ingestion process (ingest.py) that owns the serial
+ports, waits until it has published the shared state, then forks
+WEB_WORKERS HTTP workers that read that state. If the ingestion process
+exits it is restarted; running workers keep serving from the same files.
+"""
+import multiprocessing, os, subprocess, sys, threading, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+os.environ["PROCESS_ROLE"] = "web"
+os.environ.setdefault("SHARED_STATE_DIR", os.path.join(HERE, "shared_state"))
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "32"))
+# Each open /api/stream (one per dashboard tab) holds a thread for as long as
+# it stays open. Keep API_THREADS per worker for the API: past the limit,
+# /api/stream answers 503 and those dashboards poll instead.
+API_THREADS = 8
+os.environ.setdefault("MAX_STREAMS", str(max(threads - API_THREADS, 1)))
+timeout = 60
+chdir = HERE
+
+INGEST_START_TIMEOUT = 30
+_ingest = {"proc": None, "stopping": False}
+
+
+def _pid_file():
+    return os.path.join(os.environ["SHARED_STATE_DIR"], "ingest.pid")
+
+
+def _start_ingest():
+    if os.path.exists(_pid_file()):
+        os.remove(_pid_file())
+    env = dict(os.environ, PROCESS_ROLE="ingest")
+    return subprocess.Popen([sys.executable, os.path.join(HERE, "ingest.py")], cwd=HERE, env=env)
+
+
+def _wait_ready(proc):
+    deadline = time.time() + INGEST_START_TIMEOUT
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Ingestion process exited with code {proc.returncode}")
+        try:
+            with open(_pid_file()) as f:
+                if f.read().strip() == str(proc.pid):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("Ingestion process did not become ready")
+
+
+def _supervise():
+    while True:
+        code = _ingest["proc"].wait()
+        if _ingest["stopping"]:
+            return
+        print(f"Ingestion process exited ({code}), restarting")
+        time.sleep(1)
+        _ingest["proc"] = _start_ingest()
+
+
+def on_starting(server):
+    _ingest["proc"] = _start_ingest()
+    _wait_ready(_ingest["proc"])
+    threading.Thread(target=_supervise, daemon=True).start()
+
+
+def on_exit(server):
+    _ingest["stopping"] = True
+    proc = _ingest["proc"]
+    if proc and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
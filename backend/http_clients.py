@@ -0,0 +1,98 @@
+"""
+Shared outbound HTTP clients (OpenRouter, Resend, Open-Meteo, Firebase).
+
+Each client keeps a requests.Session with a keep-alive connection pool, fixed
+default headers, bounded retries with exponential backoff, and simple
+per-client latency counters (also exported as metrics, see metrics.py).
+"""
+import threading, time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import registry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+HTTP_SECONDS = registry.histogram(
+    "http_client_request_seconds", "Outbound HTTP call latency, retries included", ["client", "method"]
+)
+HTTP_ERRORS = registry.counter(
+    "http_client_errors_total", "Outbound HTTP calls that failed or returned 4xx/5xx", ["client", "status"]
+)
+
+
+class OutboundClient:
+    def __init__(self, name, headers=None, pool_size=10, retries=2, backoff=0.5, timeout=45):
+        self.name = name
+        self.timeout = timeout
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,  # never resend a request the server may already have processed
+            status=retries,
+            backoff_factor=backoff,
+            # 429/5xx are retried for idempotent methods only (urllib3's default
+            # list); POSTs (emails, AI calls) are retried only on connect errors
+            status_forcelist=RETRY_STATUSES,
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0, "status": {}}
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        """POST through the pooled session; errors propagate like requests.post"""
+        return self._request("POST", url, json=json, timeout=timeout, **kwargs)
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        """GET through the pooled session; errors propagate like requests.get"""
+        return self._request("GET", url, params=params, timeout=timeout, **kwargs)
+
+    def put(self, url, json=None, timeout=None, **kwargs):
+        """PUT through the pooled session; errors propagate like requests.put"""
+        return self._request("PUT", url, json=json, timeout=timeout, **kwargs)
+
+    def _request(self, method, url, timeout=None, **kwargs):
+        start = time.perf_counter()
+        status = None
+        try:
+            response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            self._record(elapsed * 1000, status)
+            HTTP_SECONDS.observe(elapsed, client=self.name, method=method)
+
+    def _record(self, elapsed_ms, status):
+        with self._lock:
+            s = self._stats
+            s["calls"] += 1
+            s["total_ms"] += elapsed_ms
+            s["last_ms"] = elapsed_ms
+            s["max_ms"] = max(s["max_ms"], elapsed_ms)
+            key = str(status) if status is not None else "exception"
+            s["status"][key] = s["status"].get(key, 0) + 1
+            error = status is None or status >= 400
+            if error:
+                s["errors"] += 1
+        if error:
+            HTTP_ERRORS.inc(client=self.name, status=key)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats, status=dict(self._stats["status"]))
+        s["avg_ms"] = round(s["total_ms"] / s["calls"], 2) if s["calls"] else 0.0
+        for key in ("total_ms", "max_ms", "last_ms"):
+            s[key] = round(s[key], 2)
+        return s
@@ -0,0 +1,39 @@
+"""
+Serial ingestion process for production mode.
+
+Owns the serial ports: reads every device, appends to the history ring and
+the sensor log, raises moisture alerts, and publishes each device's latest
+state into SHARED_STATE_DIR for the HTTP workers (see shared_state.py).
+gunicorn.conf.py starts and restarts it; to run it on its own:
+
+    python ingest.py
+"""
+import os, signal, threading
+
+os.environ["PROCESS_ROLE"] = "ingest"
+
+import app as server
+
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    server.create_app(warm_up=False)
+    # Written last: tells gunicorn.conf.py the shared files are ready
+    with open(os.path.join(server.SHARED_STATE_DIR, "ingest.pid"), "w") as f:
+        f.write(str(os.getpid()))
+    print(f"Ingesting {len(server.device_registry.devices)} device(s) into {server.SHARED_STATE_DIR}")
+
+    while not stop.wait(1):
+        pass
+
+    server.device_registry.stop()
+    for device in server.device_registry.devices.values():
+        device.log.flush()
+    print("Ingestion stopped")
+
+
+if __name__ == "__main__":
+    main()
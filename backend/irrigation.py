@@ -0,0 +1,187 @@
+"""
+Closed-loop pump control per field, and a soil model to test it offline.
+
+PumpController is a relay with hysteresis whose burst length is PI-tuned:
+
+  - the pump starts when smoothed moisture falls to the crop's moist_min
+    (and it has been off for at least `min_off` seconds)
+  - it runs for  kp * (error + ki * integral)  seconds, clamped to
+    [min_on, max_on], where error = target - moisture at the start and
+    target = max(moist_max - 10% of moist_max, midpoint)  (as the dashboard)
+  - it stops early at the target or at moist_max, but not before `min_on`
+  - after each burst the peak moisture is compared to the target and the
+    integral is updated, so the next burst is longer when the last one fell
+    short and shorter when it overshot (water that drains away is wasted)
+
+Soil responds to water with a delay, so a plain threshold relay keeps
+pumping until the sensor catches up, then cycles again as soon as the
+reading dips. Learning the burst length gives one right-sized watering
+per dry-down instead.
+
+hold(reason) stops the pump immediately (no water, rain) and keeps it off
+until released; defer(reason) only keeps a new burst from starting (rain
+forecast) and lets a running one finish; cap_target() lowers the target
+while rain is expected.
+
+SoilSimulator is a bucket model: evapotranspiration slows as the soil
+dries, applied water infiltrates with a first-order lag and moisture above
+field capacity drains away. read() adds sensor noise.
+"""
+import math, random
+
+TARGET_MARGIN = 0.10  # stop at moist_max minus this fraction of moist_max
+
+
+class PumpController:
+    def __init__(self, moist_min, moist_max, kp=60.0, ki=0.5, min_on=30.0, min_off=300.0,
+                 max_on=3600.0, tau=20.0, settle=1800.0, settle_tau=120.0):
+        self.kp = kp            # seconds of pumping per % of moisture error
+        self.ki = ki            # weight of the accumulated per-burst error
+        self.min_on = min_on
+        self.min_off = min_off
+        self.max_on = max_on
+        self.tau = tau          # EWMA time constant for the sensor (seconds)
+        self.settle = settle    # how long after a burst to watch for the peak
+        self.settle_tau = settle_tau  # slower EWMA for the peak, so noise doesn't count
+        self.target_cap = None  # lower target while rain is expected
+        self.set_bounds(moist_min, moist_max)
+
+        self.on = False
+        self.moisture = None    # smoothed
+        self.slow = None        # smoothed with settle_tau
+        self.ts = None
+        self.changed_at = None  # last on/off switch
+        self.burst = None       # planned seconds of the current burst
+        self.integral = 0.0
+        self.settling = None    # [stopped at, peak moisture] after a burst
+        self.held = None        # reason the pump is forced off
+        self.deferred = None    # reason no new burst may start
+        self.cycles = 0
+        self.on_seconds = 0.0
+
+    def set_bounds(self, moist_min, moist_max):
+        """Crop range; the learned integral is kept"""
+        self.moist_min = float(moist_min)
+        self.moist_max = float(moist_max)
+        self._set_target()
+
+    def cap_target(self, cap=None):
+        """Water only up to `cap` (e.g. mid-range before forecast rain); None restores the target"""
+        self.target_cap = cap
+        self._set_target()
+
+    def _set_target(self):
+        target = max(self.moist_max * (1 - TARGET_MARGIN), (self.moist_min + self.moist_max) / 2)
+        if self.target_cap is not None:
+            target = max(min(target, self.target_cap), self.moist_min)
+        self.target = target
+
+    def hold(self, reason):
+        self.held = reason
+
+    def defer(self, reason):
+        self.deferred = reason
+
+    def release(self):
+        self.held = None
+        self.deferred = None
+
+    def update(self, ts, moisture):
+        """Feed a reading; returns "ON" / "OFF" when the pump should switch, else None"""
+        if self.moisture is None:
+            self.moisture = self.slow = moisture
+            self.ts, self.changed_at = ts, ts - self.min_off
+            return None
+        dt = ts - self.ts
+        if dt <= 0:
+            return None
+        self.ts = ts
+        self.moisture += (1 - math.exp(-dt / self.tau)) * (moisture - self.moisture)
+        self.slow += (1 - math.exp(-dt / self.settle_tau)) * (moisture - self.slow)
+        m = self.moisture
+        if self.on:
+            self.on_seconds += dt
+
+        if self.settling:
+            stopped_at, peak = self.settling
+            self.settling[1] = max(peak, self.slow)
+            if ts - stopped_at >= self.settle:
+                self._learn(self.settling[1])
+
+        if self.held:
+            return self._switch(False, ts) if self.on else None
+
+        running = ts - self.changed_at
+        if self.on:
+            if running >= self.min_on and (running >= self.burst or m >= self.target or m >= self.moist_max):
+                return self._switch(False, ts)
+            if running >= self.max_on:
+                return self._switch(False, ts)
+        elif m <= self.moist_min and running >= self.min_off and not self.settling and not self.deferred:
+            error = self.target - m
+            self.burst = min(max(self.kp * (error + self.ki * self.integral), self.min_on), self.max_on)
+            return self._switch(True, ts)
+        return None
+
+    def _switch(self, on, ts):
+        self.on = on
+        self.changed_at = ts
+        if on:
+            self.cycles += 1
+        else:
+            self.settling = [ts, self.slow]
+        return "ON" if on else "OFF"
+
+    def _learn(self, peak):
+        limit = (self.moist_max - self.moist_min) / max(self.ki, 1e-9)  # anti-windup
+        self.integral = min(max(self.integral + (self.target - peak), -limit), limit)
+        self.settling = None
+
+    def status(self):
+        return {
+            "pump": "ON" if self.on else "OFF",
+            "moisture": None if self.moisture is None else round(self.moisture, 2),
+            "moist_min": self.moist_min,
+            "moist_max": self.moist_max,
+            "target": round(self.target, 2),
+            "target_cap": self.target_cap,
+            "burst_seconds": None if self.burst is None else round(self.burst, 1),
+            "integral": round(self.integral, 3),
+            "held": self.held,
+            "deferred": self.deferred,
+            "cycles": self.cycles,
+            "on_seconds": round(self.on_seconds, 1),
+        }
+
+
+class SoilSimulator:
+    def __init__(self, moisture=60.0, field_capacity=85.0, et_per_hour=1.5, pump_per_minute=1.0,
+                 infiltration_lag=300.0, drain_per_minute=0.05, noise=1.5, seed=None):
+        self.moisture = moisture
+        self.field_capacity = field_capacity
+        self.et = et_per_hour / 3600
+        self.pump_rate = pump_per_minute / 60  # % of root-zone moisture per second of pumping
+        self.lag = infiltration_lag
+        self.drain = drain_per_minute / 60
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.surface = 0.0  # applied water not yet in the root zone
+        self.water_used = 0.0
+        self.drained = 0.0
+
+    def step(self, dt, pump_on):
+        if pump_on:
+            self.water_used += self.pump_rate * dt
+            self.surface += self.pump_rate * dt
+        infiltrated = self.surface * (1 - math.exp(-dt / self.lag))
+        self.surface -= infiltrated
+        self.moisture += infiltrated
+        self.moisture -= self.et * dt * min(self.moisture / self.field_capacity, 1.0)
+        if self.moisture > self.field_capacity:
+            drained = (self.moisture - self.field_capacity) * (1 - math.exp(-dt * self.drain))
+            self.moisture -= drained
+            self.drained += drained
+        self.moisture = min(max(self.moisture, 0.0), 100.0)
+
+    def read(self):
+        return round(min(max(self.moisture + self.rng.gauss(0, self.noise), 0.0), 100.0), 1)
@@ -0,0 +1,158 @@
+"""
+HTTP load test for the prediction endpoints.
+
+Client processes send requests back to back for a fixed time and report
+throughput and latency percentiles. Readings are random, so the prediction
+cache doesn't hide the model cost. With --spawn, a production server
+(gunicorn.conf.py) is started for each worker count in turn so you can see
+how throughput scales with processes.
+
+Usage:
+    python load_test.py --url http://127.0.0.1:5000            # running server
+    python load_test.py --spawn 1,2,4 --clients 8 --duration 10
+    python load_test.py --endpoint batch --batch-size 50
+"""
+import argparse, json, multiprocessing, os, random, signal, statistics, subprocess, sys, time
+import urllib.error, urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def random_reading(rng):
+    return {
+        "N": rng.randint(1, 140), "P": rng.randint(5, 145), "K": rng.randint(5, 205),
+        "temperature": round(rng.uniform(8, 44), 1),
+        "soil_moisture": round(rng.uniform(10, 100), 1),
+        "ph": round(rng.uniform(3.5, 9.9), 2),
+    }
+
+
+def client(args):
+    """One client process: returns (latencies in s, error count)"""
+    url, endpoint, batch_size, duration, seed = args
+    rng = random.Random(seed)
+    path = "/api/predict" if endpoint == "predict" else "/api/predict/batch"
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        if endpoint == "predict":
+            body = random_reading(rng)
+        else:
+            body = {"readings": [random_reading(rng) for _ in range(batch_size)]}
+        req = urllib.request.Request(
+            url + path, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                resp.read()
+            latencies.append(time.perf_counter() - start)
+        except (urllib.error.URLError, OSError):
+            errors += 1
+    return latencies, errors
+
+
+def run_load(url, clients, duration, endpoint, batch_size):
+    with multiprocessing.Pool(clients) as pool:
+        started = time.perf_counter()
+        results = pool.map(client, [(url, endpoint, batch_size, duration, i) for i in range(clients)])
+        elapsed = time.perf_counter() - started
+    latencies = sorted(l for lats, _ in results for l in lats)
+    errors = sum(e for _, e in results)
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50": pct(50), "p95": pct(95), "p99": pct(99),
+        "mean": statistics.mean(latencies) * 1000,
+    }
+
+
+def spawn_server(workers, port):
+    """Start gunicorn with the production config; returns the process once it answers"""
+    env = dict(
+        os.environ,
+        WEB_WORKERS=str(workers),
+        BIND=f"127.0.0.1:{port}",
+        SERIAL_PORT=os.environ.get("SERIAL_PORT", "loop://"),
+        AI_URL=os.environ.get("AI_URL", "http://127.0.0.1:9/"),  # keep AI top-ups local
+        SENSOR_PRINT_SECONDS="3600",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,  # so stop_server() can take the ingestion process down too
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + "/api/devices", timeout=1).read()
+            return proc, url
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            time.sleep(0.2)
+    stop_server(proc)
+    raise RuntimeError("gunicorn did not start")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(30)
+    except subprocess.TimeoutExpired:
+        pass  # e.g. workers still draining queued AI top-ups
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    proc.wait()
+
+
+def report(label, r):
+    if not r["requests"]:
+        print(f"{label:<10} no successful requests ({r['errors']} errors)")
+        return
+    print(f"{label:<10} {r['requests']:>9,} {r['errors']:>7} {r['rps']:>9.1f} "
+          f"{r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--spawn", help="comma-separated worker counts to start and test, e.g. 1,2,4")
+    parser.add_argument("--port", type=int, default=5055, help="port for --spawn servers")
+    parser.add_argument("--clients", type=int, default=max(2, os.cpu_count() or 1) * 2)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--endpoint", choices=["predict", "batch"], default="predict")
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients x {args.duration:g}s, {args.endpoint}"
+          + (f" ({args.batch_size} readings/request)" if args.endpoint == "batch" else "")
+          + f", {os.cpu_count()} CPUs")
+    print(f"{'target':<10} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    if not args.spawn:
+        report("server", run_load(args.url, args.clients, args.duration, args.endpoint, args.batch_size))
+        return
+
+    for workers in [int(w) for w in args.spawn.split(",")]:
+        proc, url = spawn_server(workers, args.port)
+        try:
+            run_load(url, args.clients, 1, args.endpoint, args.batch_size)  # warm every worker
+            result = run_load(url, args.clients, args.duration, args.endpoint, args.batch_size)
+        finally:
+            stop_server(proc)
+        report(f"{workers} worker" + ("s" if workers > 1 else ""), result)
+
+
+if __name__ == "__main__":
+    main()
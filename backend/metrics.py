@@ -0,0 +1,204 @@
+"""
+In-process metrics, rendered in the Prometheus text format (GET /metrics).
+
+  Counter    a count that only goes up, optionally per label set
+  Histogram  observations (seconds) in cumulative buckets, plus sum and count
+  collector  a callback run at scrape time for numbers other code already
+             keeps (decoder frame counts, cache hits, age of the last reading)
+
+Hot paths are timed with a context manager or a decorator:
+
+    with PREDICT_STAGE_SECONDS.time(stage="ml"):
+        ...
+
+    @CROPS_FILE_SECONDS.time(op="save")
+    def _write(self): ...
+
+registry.enabled = False makes every observation a no-op (one attribute
+check), so instrumentation can stay in place when metrics are off. Each
+process keeps its own registry; under gunicorn every worker reports itself.
+"""
+import bisect, functools, threading, time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # label values tuple -> value
+
+    def _key(self, labels):
+        try:
+            return tuple(labels[name] for name in self.labels)
+        except KeyError as e:
+            raise ValueError(f"Metric {self.name} needs label {e}") from None
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += self._samples(items)
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, items):
+        return [f"{self.name}{_label_text(self.labels, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """Context manager / decorator that observes the elapsed seconds"""
+        return _Timer(self, labels)
+
+    def _samples(self, items):
+        lines = []
+        names = self.labels + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_label_text(names, key + (_number(bound),))} {cumulative}")
+            labels = _label_text(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("metric", "labels", "start")
+
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter() if self.metric.registry.enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self.metric.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, func):
+        metric, labels = self.metric, self.labels
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            if not metric.registry.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start, **labels)
+        return timed
+
+
+class Registry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._metrics = {}     # name -> Counter / Histogram
+        self._collectors = {}  # name -> (help, type, labels, callback)
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labels != metric.labels:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, name, help, labels, buckets))
+
+    def collector(self, name, help, kind, labels, callback):
+        """
+        Scrape-time metric: callback() returns [(label values tuple, value), ...].
+        kind is "counter" or "gauge". Registering a name again replaces it.
+        """
+        with self._lock:
+            self._collectors[name] = (help, kind, tuple(labels), callback)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        for name, (help, kind, labels, callback) in collectors:
+            try:
+                samples = list(callback())
+            except Exception as e:
+                print(f"Metrics collector {name} failed: {e}")
+                continue
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for key, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{_label_text(labels, key)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the server modules
+registry = Registry()
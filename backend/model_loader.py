@@ -0,0 +1,180 @@
+"""
+Deferred, thread-safe loading and hot reloading of the crop model.
+
+Nothing is read from disk at import time: the first get() loads the model
+while concurrent callers wait on the same lock. The packed ml_model.npz is
+used when it was exported from the current ml_model.pkl (it records the
+pickle's sha256); a forest built from another pickle is ignored and the
+pickle is loaded instead, so shipping only a new pickle never serves a
+stale forest. A forest exported before it recorded that hash is compared
+node by node with the pickle instead (re-export it to skip the unpickling).
+warm_up() does that load on a background
+thread so the server can accept requests straight away.
+
+watch() polls the stat signatures of both ml_model.npz and ml_model.pkl;
+when either changes, the model is loaded again on the watcher thread and swapped in with a single reference
+assignment. Requests already holding the old model finish with it. The
+version is "<file>@<sha256 prefix>" of the bytes actually loaded, so a
+touched-but-identical file is not reloaded.
+"""
+import hashlib, io, os, pickle, threading, time
+
+from forest_engine import PackedForest
+
+
+class ModelLoader:
+    def __init__(self, forest_path, pickle_path):
+        self.forest_path = forest_path
+        self.pickle_path = pickle_path
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._active = None     # (model, info) swapped as one reference
+        self._signature = None  # stat signature of the model files last looked at
+        self.reloads = 0
+        self.checked_at = None
+        self.error = None
+
+    # ---------- loading ----------
+    def _stat_signature(self):
+        """Stat of both model files (None for a missing one)"""
+        signature = []
+        for path in (self.forest_path, self.pickle_path):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _load_forest(self):
+        """(model, bytes) of ml_model.npz if it matches ml_model.pkl, else None"""
+        if not os.path.exists(self.forest_path):
+            print("ml_model.npz not found, using the sklearn pickle (run: python forest_engine.py)")
+            return None
+        data = self._read(self.forest_path)
+        forest = PackedForest.load(io.BytesIO(data))
+        if not os.path.exists(self.pickle_path):
+            return forest, data
+        pickled = self._read(self.pickle_path)
+        if forest.source_sha256 is None:
+            # Exported before forests recorded their pickle: compare the trees themselves
+            if forest.same_as(pickle.loads(pickled)):
+                return forest, data
+        elif forest.source_sha256 == hashlib.sha256(pickled).hexdigest():
+            return forest, data
+        print("ml_model.npz was not built from the current ml_model.pkl, using the pickle (run: python forest_engine.py)")
+        return None
+
+    def _load(self):
+        """Read the current model once; returns (model, info, signature)"""
+        start = time.perf_counter()
+        signature = self._stat_signature()
+        packed = self._load_forest()
+        if packed is not None:
+            path = self.forest_path
+            model, data = packed
+        else:
+            path = self.pickle_path
+            data = self._read(path)
+            model = pickle.loads(data)
+
+        sha256 = hashlib.sha256(data).hexdigest()
+        info = {
+            "version": f"{os.path.basename(path)}@{sha256[:12]}",
+            "source": os.path.basename(path),
+            "sha256": sha256,
+            "loaded_at": time.time(),
+            "load_ms": round((time.perf_counter() - start) * 1000, 2),
+            "classes": len(model.classes_),
+        }
+        return model, info, signature
+
+    def get(self):
+        """The active model; loads it on first use"""
+        return self.current()[0]
+
+    def current(self):
+        """(model, version) from the same load, for callers that key on the version"""
+        active = self._active
+        if active is None:
+            with self._lock:
+                if self._active is None:
+                    try:
+                        model, info, signature = self._load()
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                    self._signature = signature
+                    self._active = (model, info)
+                    self.error = None
+                    self._loaded.set()
+                active = self._active
+        return active[0], active[1]["version"]
+
+    def warm_up(self):
+        """Load in the background; errors are kept and raised again by get()"""
+        def run():
+            try:
+                self.get()
+            except Exception as e:
+                print(f"Model warm-up failed: {e}")
+
+        threading.Thread(target=run, name="model-warmup", daemon=True).start()
+
+    def wait(self, timeout=None):
+        """Block until the model is loaded. Returns False on timeout."""
+        return self._loaded.wait(timeout)
+
+    # ---------- hot reload ----------
+    def check(self):
+        """Reload if either model file changed on disk. Returns True if a new model was swapped in."""
+        if self._active is None:
+            return False  # nothing loaded yet; the first get() reads the latest file anyway
+        self.checked_at = time.time()
+        try:
+            if self._stat_signature() == self._signature:
+                return False
+            model, info, signature = self._load()
+        except Exception as e:
+            # Keep serving the old model; retry only once the file changes again
+            self._signature = self._stat_signature()
+            self.error = f"Reload failed: {e}"
+            print(f"Model {self.error}")
+            return False
+
+        with self._lock:
+            self._signature = signature
+            self.error = None
+            if info["sha256"] == self._active[1]["sha256"]:
+                return False  # touched or copied, same bytes
+            self._active = (model, info)
+            self.reloads += 1
+        print(f"Model reloaded: {info['version']} ({info['load_ms']} ms)")
+        return True
+
+    def watch(self, interval=5.0):
+        """Background thread calling check() every `interval` seconds"""
+        def run():
+            while True:
+                time.sleep(interval)
+                self.check()
+
+        threading.Thread(target=run, name="model-watch", daemon=True).start()
+
+    # ---------- introspection ----------
+    @property
+    def loaded(self):
+        return self._active is not None
+
+    @property
+    def version(self):
+        return self._active[1]["version"] if self._active else None
+
+    def stats(self):
+        info = self._active[1] if self._active else {}
+        return dict(info, loaded=self.loaded, reloads=self.reloads, checked_at=self.checked_at, error=self.error)
@@ -0,0 +1,118 @@
+"""
+Vectorized rule engine for user crop range scoring.
+
+User crops are compiled once into contiguous (n_crops x 6) min/max arrays and
+every reading is scored against every crop with a single broadcast, instead
+of calling a Python check() six times per crop.
+
+Scoring per feature (same as the original check() helper):
+    1    if min <= value <= max              (min/max swapped if inverted)
+    0.5  if within a 20% margin of the range (0.5 if the range is empty)
+    0    otherwise
+"""
+import math
+
+import numpy as np
+
+# (min key, default min, max key, default max) in model feature order:
+# N, P, K, temperature, soil_moisture, ph
+RULE_FIELDS = [
+    ("N_min", 0, "N_max", 100),
+    ("P_min", 0, "P_max", 100),
+    ("K_min", 0, "K_max", 100),
+    ("temp_min", 0, "temp_max", 40),
+    ("moist_min", 0, "moist_max", 100),
+    ("ph_min", 0, "ph_max", 14),
+]
+N_CHECKS = len(RULE_FIELDS)
+
+# Upper bound on readings x crops x features booleans held at once
+CHUNK_ELEMENTS = 4_000_000
+
+
+def crop_ranges(crop):
+    """
+    ([6 mins], [6 maxs]) of a crop dict, with the defaults for missing keys.
+    Raises ValueError if a bound isn't a finite number.
+    """
+    lo, hi = [], []
+    for k_min, d_min, k_max, d_max in RULE_FIELDS:
+        for key, default, out in ((k_min, d_min, lo), (k_max, d_max, hi)):
+            value = crop.get(key, default)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be a number, not {value!r}") from None
+            if not math.isfinite(value):
+                raise ValueError(f"{key} must be finite")
+            out.append(value)
+    return lo, hi
+
+
+class CompiledCrops:
+    """
+    User crops packed into contiguous range arrays for broadcasting.
+    Crops with a non-numeric bound are left out (and logged) instead of
+    failing the whole catalog; `crops` lists only the ones compiled.
+    """
+
+    def __init__(self, crops):
+        self.crops = []
+        self.version = None  # catalog version these arrays were built from (set by CropStore)
+
+        lo, hi = [], []
+        for crop in crops:
+            try:
+                c_lo, c_hi = crop_ranges(crop)
+            except ValueError as e:
+                print(f"Skipping crop '{crop.get('name')}' in rule scoring: {e}")
+                continue
+            self.crops.append(crop)
+            lo.append(c_lo)
+            hi.append(c_hi)
+        lo = np.array(lo, dtype=np.float64).reshape(-1, N_CHECKS)
+        hi = np.array(hi, dtype=np.float64).reshape(-1, N_CHECKS)
+
+        # Swap if inverted
+        self.mins = np.ascontiguousarray(np.minimum(lo, hi))
+        self.maxs = np.ascontiguousarray(np.maximum(lo, hi))
+
+        margin = (self.maxs - self.mins) * 0.2
+        margin[margin == 0] = 0.5
+        self.lower = np.ascontiguousarray(self.mins - margin)
+        self.upper = np.ascontiguousarray(self.maxs + margin)
+
+    def __len__(self):
+        return len(self.crops)
+
+
+def compile_crops(crops):
+    """Compile a list of crop dicts (crops.json format) for score_readings()"""
+    return CompiledCrops(crops)
+
+
+def score_readings(X, compiled):
+    """
+    Score every reading against every compiled crop.
+    X is (n_readings x 6) in model feature order; returns (n_readings x n_crops)
+    percentages in 0-100.
+    """
+    X = np.asarray(X, dtype=np.float64).reshape(-1, N_CHECKS)
+    n_readings, n_crops = X.shape[0], len(compiled)
+    scores = np.empty((n_readings, n_crops), dtype=np.float64)
+    if n_readings == 0 or n_crops == 0:
+        return scores
+
+    step = max(1, CHUNK_ELEMENTS // (n_crops * N_CHECKS))
+    for start in range(0, n_readings, step):
+        x = X[start:start + step, None, :]  # (chunk, 1, 6) against (n_crops, 6)
+
+        # in_range implies in_margin (margin is always > 0), so the number of
+        # satisfied bounds is 2 for in range, 1 for margin-only, 0 outside
+        in_range = (compiled.mins <= x) & (x <= compiled.maxs)
+        in_margin = (compiled.lower <= x) & (x <= compiled.upper)
+        half_points = in_range.sum(axis=2) + in_margin.sum(axis=2)
+
+        scores[start:start + step] = half_points * 0.5 / N_CHECKS * 100
+
+    return scores
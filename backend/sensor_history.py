@@ -0,0 +1,148 @@
+"""
+Fixed-memory ring buffer of recent sensor readings.
+
+Each field is a preallocated float array (NaN when a reading lacks it), plus
+a timestamp array. Appends are O(1); window queries slice the ring and use
+vectorized NumPy reductions.
+
+With a path, the arrays live in a memory-mapped file so other processes can
+map the same ring read-only (production mode, see ingest.py).
+"""
+import os, threading, time
+
+import numpy as np
+
+HISTORY_FIELDS = ["N", "P", "K", "temperature", "soil_moisture", "ph"]
+HEADER_SIZE = 64  # shared file: int64 capacity, field count, head, count; then ts, values
+
+
+class SensorHistory:
+    def __init__(self, capacity, fields=HISTORY_FIELDS, path=None, readonly=False):
+        self.capacity = int(capacity)
+        self.fields = list(fields)
+        self._index = {f: i for i, f in enumerate(self.fields)}
+        self._lock = threading.Lock()
+
+        if path is None:
+            self._meta = np.zeros(4, dtype=np.int64)
+            self._ts = np.zeros(self.capacity, dtype=np.float64)
+            self._values = np.full((len(self.fields), self.capacity), np.nan, dtype=np.float32)
+        else:
+            self._map(path, readonly)
+
+    def _map(self, path, readonly):
+        """Back the ring with `path`; a writer starts it empty, readers check its shape"""
+        n_fields = len(self.fields)
+        size = HEADER_SIZE + self.capacity * 8 + n_fields * self.capacity * 4
+        if readonly:
+            mode = "r"
+            meta = np.memmap(path, dtype=np.int64, mode="r", shape=(4,))
+            if tuple(meta[:2]) != (self.capacity, n_fields):
+                raise ValueError(f"{path}: history shape {tuple(meta[:2])} != ({self.capacity}, {n_fields})")
+        else:
+            mode = "r+"
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Resize in place (never shrink-then-grow): readers may still map it
+            with open(path, "ab") as f:
+                f.truncate(size)
+
+        self._meta = np.memmap(path, dtype=np.int64, mode=mode, shape=(4,))
+        self._ts = np.memmap(path, dtype=np.float64, mode=mode, offset=HEADER_SIZE, shape=(self.capacity,))
+        self._values = np.memmap(
+            path, dtype=np.float32, mode=mode, offset=HEADER_SIZE + self.capacity * 8,
+            shape=(n_fields, self.capacity),
+        )
+        if not readonly:
+            self._meta[:] = self.capacity, n_fields, 0, 0
+            self._values[:] = np.nan
+
+    @property
+    def _head(self):
+        return int(self._meta[2])  # next slot to write
+
+    @_head.setter
+    def _head(self, value):
+        self._meta[2] = value
+
+    @property
+    def _count(self):
+        return int(self._meta[3])
+
+    @_count.setter
+    def _count(self, value):
+        self._meta[3] = value
+
+    def __len__(self):
+        return self._count
+
+    def append(self, reading, ts=None):
+        """Store one reading dict (missing/non-numeric fields become NaN)"""
+        row = np.full(len(self.fields), np.nan, dtype=np.float32)
+        for i, field in enumerate(self.fields):
+            try:
+                row[i] = float(reading[field])
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        with self._lock:
+            self._ts[self._head] = time.time() if ts is None else ts
+            self._values[:, self._head] = row
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def window(self, seconds=None, fields=None, now=None):
+        """
+        Readings from the last `seconds` (all if None), oldest first.
+        Returns (timestamps, {field: values}) as copies.
+        """
+        fields = fields or self.fields
+        rows = [self._index[f] for f in fields]
+
+        with self._lock:
+            order = (np.arange(self._count) + self._head - self._count) % self.capacity
+            ts = self._ts[order]
+            values = self._values[rows][:, order]
+
+        if seconds is not None:
+            now = time.time() if now is None else now
+            start = np.searchsorted(ts, now - seconds, side="left")
+            ts, values = ts[start:], values[:, start:]
+
+        return ts, dict(zip(fields, values))
+
+    def stats(self, seconds=None, fields=None):
+        """min / max / mean / count per field over the window (None when empty)"""
+        ts, series = self.window(seconds, fields)
+        out = {}
+        for field, values in series.items():
+            valid = values[~np.isnan(values)]
+            if valid.size == 0:
+                out[field] = {"min": None, "max": None, "mean": None, "count": 0}
+            else:
+                out[field] = {
+                    "min": round(float(valid.min()), 3),
+                    "max": round(float(valid.max()), 3),
+                    "mean": round(float(valid.mean()), 3),
+                    "count": int(valid.size),
+                }
+        return out
+
+    def downsample(self, seconds, points, fields=None, now=None):
+        """
+        Average the window into `points` equal time buckets.
+        Returns (bucket_start_times, {field: means}); empty buckets are NaN.
+        """
+        now = time.time() if now is None else now
+        ts, series = self.window(seconds, fields, now=now)
+        start = now - seconds
+        edges = start + np.arange(points) * (seconds / points)
+
+        bucket = np.clip(((ts - start) / seconds * points).astype(np.int64), 0, points - 1)
+        out = {}
+        for field, values in series.items():
+            valid = ~np.isnan(values)
+            sums = np.bincount(bucket[valid], weights=values[valid], minlength=points)
+            counts = np.bincount(bucket[valid], minlength=points)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[field] = sums / counts
+        return edges, out
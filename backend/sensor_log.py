@@ -0,0 +1,169 @@
+"""
+Append-only on-disk sensor log.
+
+Readings are stored as fixed-width binary records in one segment file per
+UTC day (<folder>/YYYY-MM-DD.bin). The writer buffers records and commits
+them in groups; the reader memory-maps segments and slices time ranges
+without parsing or copying.
+"""
+import os, threading, time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+LOG_FIELDS = ["N", "P", "K", "temperature", "soil_moisture", "ph"]
+
+# 40-byte little-endian record: timestamp, six readings, motor (-1 unknown)
+RECORD = np.dtype(
+    [("ts", "<f8")]
+    + [(f, "<f4") for f in LOG_FIELDS]
+    + [("motor", "i1"), ("_pad", "V7")]
+)
+
+
+def motor_code(motor):
+    """Motor state as stored: 1 on, 0 off, -1 unknown (None or not a number)"""
+    try:
+        value = float(motor)
+    except (TypeError, ValueError):
+        return -1
+    if value != value:
+        return -1
+    return 1 if value else 0
+
+
+def segment_name(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d") + ".bin"
+
+
+class SensorLogWriter:
+    def __init__(self, folder, commit_records=64, commit_interval=5.0, fsync=False):
+        self.folder = folder
+        self.commit_records = commit_records
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+        self.written = 0
+
+        self._buffer = np.zeros(commit_records, dtype=RECORD)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Create the folder and commit partial groups every commit_interval (once)"""
+        if self._started:
+            return
+        self._started = True
+        os.makedirs(self.folder, exist_ok=True)
+        threading.Thread(target=self._flusher, daemon=True).start()
+
+    def append(self, reading, ts=None, motor=None):
+        """Buffer one reading; commits when the group is full"""
+        with self._lock:
+            rec = self._buffer[self._pending]
+            rec["ts"] = time.time() if ts is None else ts
+            for field in LOG_FIELDS:
+                try:
+                    rec[field] = float(reading[field])
+                except (KeyError, TypeError, ValueError):
+                    rec[field] = np.nan
+            rec["motor"] = motor_code(motor)
+            self._pending += 1
+
+            if self._pending >= self.commit_records:
+                self._commit()
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def _flusher(self):
+        """Commit partial groups so quiet periods still reach disk"""
+        while True:
+            time.sleep(self.commit_interval)
+            self.flush()
+
+    def _commit(self):
+        """Write buffered records to their day segments (caller holds the lock)"""
+        if not self._pending:
+            return
+        records = self._buffer[:self._pending]
+
+        # Split on UTC day boundaries (a group rarely spans more than one)
+        names = [segment_name(ts) for ts in records["ts"]]
+        start = 0
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            for i in range(1, len(names) + 1):
+                if i == len(names) or names[i] != names[start]:
+                    with open(os.path.join(self.folder, names[start]), "ab") as f:
+                        f.write(records[start:i].tobytes())
+                        if self.fsync:
+                            f.flush()
+                            os.fsync(f.fileno())
+                    start = i
+        except OSError as e:
+            print(f"Sensor log write failed: {e}")
+
+        self.written += self._pending
+        self._pending = 0
+
+
+class SensorLogReader:
+    def __init__(self, folder):
+        self.folder = folder
+
+    def days(self):
+        """(first, last) UTC date with a segment on disk, or None"""
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return None
+        dates = []
+        for name in names:
+            try:
+                dates.append(datetime.strptime(name, "%Y-%m-%d.bin").date())
+            except ValueError:
+                pass  # not a segment
+        return (min(dates), max(dates)) if dates else None
+
+    def segments(self, start, end):
+        """Memory-mapped record arrays for each day overlapping [start, end]"""
+        # Walk only the days that have segments, whatever range was asked for
+        days = self.days()
+        if days is None:
+            return
+        first = datetime.combine(days[0], datetime.min.time(), timezone.utc).timestamp()
+        last = datetime.combine(days[1], datetime.max.time(), timezone.utc).timestamp()
+        start, end = max(start, first), min(end, last)
+        if start > end:
+            return
+        day = datetime.fromtimestamp(start, timezone.utc).date()
+        last = datetime.fromtimestamp(end, timezone.utc).date()
+        while day <= last:
+            path = os.path.join(self.folder, day.strftime("%Y-%m-%d") + ".bin")
+            day += timedelta(days=1)
+            if not os.path.exists(path):
+                continue
+            count = os.path.getsize(path) // RECORD.itemsize  # ignore a torn tail
+            if count:
+                yield np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+
+    def scan(self, start, end):
+        """Zero-copy views of the records in [start, end], one per segment"""
+        for seg in self.segments(start, end):
+            lo = np.searchsorted(seg["ts"], start, side="left")
+            hi = np.searchsorted(seg["ts"], end, side="right")
+            if hi > lo:
+                yield seg[lo:hi]
+
+    def query(self, start, end, fields=None, step=1):
+        """Selected fields over [start, end] as arrays, keeping every `step`-th record"""
+        fields = fields or LOG_FIELDS
+        parts = [view[::step] for view in self.scan(start, end)]
+        if not parts:
+            return dict({"ts": np.empty(0)}, **{f: np.empty(0, dtype=np.float32) for f in fields})
+        return {name: np.concatenate([p[name] for p in parts]) for name in ["ts"] + list(fields)}
+
+    def count(self, start, end):
+        return sum(len(view) for view in self.scan(start, end))
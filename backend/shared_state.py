@@ -0,0 +1,192 @@
+"""
+Latest device state shared between processes through a memory-mapped file.
+
+In production mode (see ingest.py) one ingestion process owns the serial
+ports and publishes each device's snapshot (latest reading + status) into a
+fixed slot of <SHARED_STATE_DIR>/devices.state; every HTTP worker maps the
+same file read-only. Each slot is guarded by a sequence counter (seqlock):
+the writer makes it odd while writing and even when done, readers retry if
+it changed under them. Readers never block the writer and decode a slot's
+JSON only when its sequence moves.
+
+Slot layout: seq <u8> | length <u4> | pad <u4> | JSON payload
+"""
+import json, mmap, os, struct, threading, time
+
+MAGIC = b"SIRSTATE"
+HEADER = struct.Struct("<8sII")  # magic, slot count, slot size
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QI4x")
+SLOT_SIZE = 16384  # latest reading, status and alert summary as JSON
+READ_RETRIES = 100
+
+
+class SharedState:
+    def __init__(self, path, slots, create=False):
+        """create=True (writer) initializes the file; readers map it read-only"""
+        self.path = path
+        self.slots = slots
+        self._cache = {}  # slot -> (seq, decoded snapshot)
+        size = HEADER_SIZE + slots * SLOT_SIZE
+
+        if create:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                os.ftruncate(fd, size)
+                self._mm = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            HEADER.pack_into(self._mm, 0, MAGIC, slots, SLOT_SIZE)
+            # Start sequences from the clock so a restarted writer never
+            # reuses a sequence a reader has cached
+            first = int(time.time() * 1000) * 2
+            self._seq = [first] * slots
+            for i in range(slots):
+                SLOT_HEADER.pack_into(self._mm, self._offset(i), first, 0)
+        else:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, file_slots, slot_size = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or slot_size != SLOT_SIZE or file_slots < slots:
+                raise ValueError(f"{path}: not a state file for {slots} devices")
+            self._seq = None
+
+    def _offset(self, slot):
+        return HEADER_SIZE + slot * SLOT_SIZE
+
+    # ---------- writer ----------
+    def publish(self, slot, snapshot):
+        """Replace a slot's snapshot (single writer per slot)"""
+        payload = json.dumps(snapshot, separators=(",", ":")).encode()
+        if len(payload) > SLOT_SIZE - SLOT_HEADER.size:
+            raise ValueError(f"Snapshot for slot {slot} is too large ({len(payload)} bytes)")
+
+        offset = self._offset(slot)
+        seq = self._seq[slot] + 1  # odd: write in progress
+        SLOT_HEADER.pack_into(self._mm, offset, seq, 0)
+        start = offset + SLOT_HEADER.size
+        self._mm[start:start + len(payload)] = payload
+        SLOT_HEADER.pack_into(self._mm, offset, seq + 1, len(payload))
+        self._seq[slot] = seq + 1
+
+    # ---------- readers ----------
+    def seq(self, slot):
+        return SLOT_HEADER.unpack_from(self._mm, self._offset(slot))[0]
+
+    def read(self, slot):
+        """Latest snapshot for a slot, or None if nothing was published yet"""
+        offset = self._offset(slot)
+        for _ in range(READ_RETRIES):
+            seq, length = SLOT_HEADER.unpack_from(self._mm, offset)
+            if seq & 1:
+                time.sleep(0)  # writer is mid-update
+                continue
+            cached = self._cache.get(slot)
+            if cached and cached[0] == seq:
+                return cached[1]
+            if length == 0:
+                return None
+
+            start = offset + SLOT_HEADER.size
+            payload = self._mm[start:start + length]
+            if SLOT_HEADER.unpack_from(self._mm, offset)[0] != seq:
+                continue  # overwritten while copying
+            snapshot = json.loads(payload)
+            self._cache[slot] = (seq, snapshot)
+            return snapshot
+        return self._cache.get(slot, (None, None))[1]
+
+    def watch(self, on_change, interval=0.2):
+        """Background thread calling on_change(slot) whenever a slot is republished"""
+        def run():
+            seen = [self.seq(i) for i in range(self.slots)]
+            while True:
+                time.sleep(interval)
+                for i in range(self.slots):
+                    seq = self.seq(i)
+                    if seq != seen[i] and not seq & 1:
+                        seen[i] = seq
+                        try:
+                            on_change(i)
+                        except Exception as e:
+                            print(f"Shared state watcher error (slot {i}): {e}")
+
+        threading.Thread(target=run, name="shared-state-watch", daemon=True).start()
+
+
+def device_snapshot(device):
+    """What the ingestion process publishes for a Device"""
+    return {"latest": device.latest, "updated_at": device.updated_at, "status": device.status(),
+            "alerts": device.alerts, "irrigation": device.irrigation}
+
+
+class SharedDevice:
+    """
+    Read-only stand-in for devices.Device in an HTTP worker; attributes come
+    from the ingestion process's latest snapshot.
+    """
+
+    def __init__(self, device_id, port, state, slot, history_path=None, history_factory=None, log=None):
+        self.id = device_id
+        self.port = port
+        self.state = state
+        self.slot = slot
+        self.log = log
+        self._history_path = history_path
+        self._history_factory = history_factory  # path -> SensorHistory (read-only)
+        self._history = None
+
+    def _snapshot(self):
+        return self.state.read(self.slot) or {}
+
+    @property
+    def latest(self):
+        return self._snapshot().get("latest") or {}
+
+    @property
+    def updated_at(self):
+        return self._snapshot().get("updated_at")
+
+    @property
+    def version(self):
+        return self._status().get("version", 0)
+
+    @property
+    def motor_status(self):
+        return self._status().get("motor", "offline")
+
+    @property
+    def connected(self):
+        return self._status().get("connected", False)
+
+    @property
+    def alerts(self):
+        return self._snapshot().get("alerts") or {}
+
+    @property
+    def irrigation(self):
+        return self._snapshot().get("irrigation") or {}
+
+    def _status(self):
+        return self._snapshot().get("status") or {}
+
+    def status(self):
+        return self._status() or {"id": self.id, "port": self.port, "connected": False, "motor": "offline"}
+
+    @property
+    def history(self):
+        """Ring buffer mapped from the ingestion process (once it has created it)"""
+        if self._history is None and self._history_path and os.path.exists(self._history_path):
+            self._history = self._history_factory(self._history_path)
+        return self._history
+
+
+class LogFolder:
+    """Read side of a device's sensor log in a worker; the writer lives in the ingestion process"""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def flush(self):
+        pass  # the ingestion process commits every SENSOR_LOG_COMMIT_SECONDS
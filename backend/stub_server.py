@@ -0,0 +1,163 @@
+"""
+Local stand-in for OpenRouter, Resend and the Firebase Realtime Database,
+for offline development and tests.
+
+Usage:
+    python stub_server.py 8099
+
+Then start the backend against it:
+    AI_URL=http://127.0.0.1:8099/api/v1/chat/completions \
+    RESEND_URL=http://127.0.0.1:8099/emails \
+    FIREBASE_URL=http://127.0.0.1:8099 python app.py
+
+Firebase: GET / PUT / PATCH <path>.json on an in-memory tree, and streaming
+GETs (Accept: text/event-stream) that receive put / patch events on writes.
+"""
+import json, queue, sys, threading, time, uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from firebase_sync import apply_event
+
+CROP_DATA = {
+    "N_min": 80, "N_max": 140,
+    "P_min": 30, "P_max": 60,
+    "K_min": 60, "K_max": 120,
+    "ph_min": 6.0, "ph_max": 7.0,
+    "temp_min": 18.0, "temp_max": 28.0,
+    "moist_min": 40.0, "moist_max": 70.0,
+    "analysis": "Stub analysis: conditions are broadly suitable."
+}
+
+SUGGESTIONS = ["Millet", "Sorghum", "Barley", "Chickpea", "Lentil", "Mustard",
+               "Groundnut", "Soybean", "Sunflower", "Pigeon Pea", "Sesame",
+               "Oats", "Potato", "Onion", "Garlic", "Carrot", "Spinach",
+               "Cabbage", "Peas", "Okra", "Brinjal", "Chilli", "Turmeric",
+               "Ginger", "Jute"]
+
+DELAY = 0.0  # seconds of artificial latency per request
+
+FIREBASE_DB = {
+    "soilData": {"nitrogen": 120, "phosphorus": 45, "potassium": 80, "temperature": 27.5, "moisture": 48, "ph": 6.6},
+    "rainStatus": "NO",
+    "motorControl": "OFF",
+    "waterStatus": "WATER",
+}
+firebase_lock = threading.Lock()
+firebase_streams = []  # (path parts, queue of (event, payload))
+KEEP_ALIVE = 25.0  # seconds
+
+
+def db_parts(path):
+    return [p for p in path.split("?")[0][:-len(".json")].split("/") if p]
+
+
+def db_node(parts):
+    node = FIREBASE_DB
+    for part in parts:
+        node = node.get(part) if isinstance(node, dict) else None
+    return node
+
+
+def db_write(parts, event, data):
+    """Apply a PUT / PATCH and send the matching event to every affected stream"""
+    global FIREBASE_DB
+    with firebase_lock:
+        FIREBASE_DB = apply_event(FIREBASE_DB, event, {"path": "/" + "/".join(parts), "data": data}) or {}
+        for stream_parts, events in firebase_streams:
+            if parts[:len(stream_parts)] == stream_parts:
+                events.put((event, {"path": "/" + "/".join(parts[len(stream_parts):]), "data": data}))
+            elif stream_parts[:len(parts)] == parts:
+                events.put(("put", {"path": "/", "data": db_node(stream_parts)}))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(DELAY)
+
+        if self.path.endswith("/chat/completions"):
+            self._reply(200, self._chat(body))
+        elif self.path.endswith("/emails"):
+            self._reply(200, {"id": uuid.uuid4().hex})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_GET(self):
+        if not self.path.split("?")[0].endswith(".json"):
+            return self._reply(404, {"error": "not found"})
+        parts = db_parts(self.path)
+        if "text/event-stream" not in self.headers.get("Accept", ""):
+            with firebase_lock:
+                node = db_node(parts)
+            return self._reply(200, node)
+
+        events = queue.Queue()
+        with firebase_lock:
+            events.put(("put", {"path": "/", "data": db_node(parts)}))
+            firebase_streams.append((parts, events))
+        self.close_connection = True  # the stream ends when the connection does
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                try:
+                    event, payload = events.get(timeout=KEEP_ALIVE)
+                except queue.Empty:
+                    event, payload = "keep-alive", None
+                self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode())
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            with firebase_lock:
+                firebase_streams.remove((parts, events))
+
+    def do_PUT(self):
+        self._firebase_write("put")
+
+    def do_PATCH(self):
+        self._firebase_write("patch")
+
+    def _firebase_write(self, event):
+        length = int(self.headers.get("Content-Length", 0))
+        data = json.loads(self.rfile.read(length) or b"null")
+        if not self.path.split("?")[0].endswith(".json"):
+            return self._reply(404, {"error": "not found"})
+        db_write(db_parts(self.path), event, data)
+        self._reply(200, data)
+
+    def _chat(self, body):
+        prompt = body.get("messages", [{}])[0].get("content", "")
+        if "JSON array" in prompt:
+            content = json.dumps([{"crop": c, "confidence": 60, "type": "AI Suggestion"} for c in SUGGESTIONS])
+        else:
+            content = json.dumps(CROP_DATA)
+        return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def make_server(port=0):
+    """Create (but don't start) a stub server; port 0 picks a free port"""
+    return ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8099
+    server = make_server(port)
+    print(f"Stub OpenRouter/Resend/Firebase listening on http://127.0.0.1:{port}")
+    server.serve_forever()
@@ -0,0 +1,4 @@
+"""Run from backend/: python -m pytest tests"""
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
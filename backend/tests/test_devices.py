@@ -0,0 +1,104 @@
+import json, os, queue, threading
+
+import pytest
+import serial
+
+import devices
+from devices import Device, DeviceReader, DeviceRegistry, parse_ports
+from frames import encode_binary, encode_csv
+
+READING = {"N": 120, "P": 45, "K": 80, "temperature": 25.5, "soil_moisture": 41, "ph": 6.5, "motor": 1}
+
+
+def start_reader(device, **kwargs):
+    readings = queue.Queue()
+    reader = DeviceReader(device, on_reading=lambda d, data: readings.put(data), settle_time=0, **kwargs)
+    reader.start()
+    return reader, readings
+
+
+def wait_for(condition, timeout=5.0):
+    done = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        done.wait(0.01)
+    return False
+
+
+@pytest.mark.parametrize("fmt, encode", [
+    ("json", lambda r: json.dumps(r).encode() + b"\n"),
+    ("csv", encode_csv),
+    ("binary", encode_binary),
+])
+def test_loop_url_round_trip(fmt, encode):
+    # loop:// echoes what is written, so the reader decodes its own frames
+    device = Device("field1", "loop://", fmt=fmt)
+    reader, readings = start_reader(device)
+    try:
+        assert wait_for(lambda: device.connected)
+        assert reader.write(encode(READING))
+        data = readings.get(timeout=5)
+    finally:
+        reader.stop()
+
+    assert data == pytest.approx(READING)
+    assert device.latest == data
+    assert device.motor_status == "online"
+    assert device.decoder.frames == 1 and device.decoder.bad_frames == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pseudo-terminal")
+def test_pty_reader_and_pump_command():
+    master, slave = os.openpty()
+    device = Device("field1", os.ttyname(slave))
+    reader, readings = start_reader(device)
+    try:
+        assert wait_for(lambda: device.connected)
+        os.write(master, b'garbage\n' + json.dumps(READING).encode()[:20])
+        os.write(master, json.dumps(READING).encode()[20:] + b"\n")  # frame split across reads
+        assert readings.get(timeout=5) == READING
+        assert device.decoder.bad_frames == 1
+
+        assert reader.write(b'{"pump":0}\n')
+        assert os.read(master, 64) == b'{"pump":0}\n'
+    finally:
+        reader.stop()
+        os.close(master)
+        os.close(slave)
+
+
+def test_reconnects_after_open_failures(monkeypatch):
+    monkeypatch.setattr(devices, "RECONNECT_MIN", 0.01)
+    attempts = []
+
+    def open_port(port, baud):
+        attempts.append(port)
+        if len(attempts) < 3:
+            raise serial.SerialException("port busy")
+        return serial.serial_for_url("loop://", baud, timeout=0.1)
+
+    device = Device("field1", "COM9")
+    statuses = []
+    reader, _ = start_reader(device, open_port=open_port, on_status=lambda d: statuses.append(d.connected))
+    try:
+        assert wait_for(lambda: device.connected)
+    finally:
+        reader.stop()
+
+    assert len(attempts) == 3
+    assert device.reconnects == 2 and device.last_error == "port busy"
+    assert statuses == [False, False, True]
+
+
+def test_registry_defaults_and_send_to_unknown_device():
+    registry = DeviceRegistry()
+    for device_id, port in parse_ports("field1=loop://,field2=loop://", "COM3").items():
+        registry.add(Device(device_id, port))
+
+    assert registry.get().id == "field1"
+    assert registry.get("field2").id == "field2"
+    assert registry.get("nope") is None
+    assert registry.send("nope", b"x") is False
+    assert registry.send("field1", b"x") is False  # not started, so not connected
+    assert parse_ports("", "COM3") == {"default": "COM3"}
@@ -0,0 +1,101 @@
+import copy, queue, threading
+
+import pytest
+
+import stub_server
+from firebase_sync import FirebaseSync, apply_event, cloud_reading
+from http_clients import OutboundClient
+
+
+@pytest.fixture
+def rtdb(monkeypatch):
+    """Stub Realtime Database on a free port, with a fresh tree per test"""
+    monkeypatch.setattr(stub_server, "FIREBASE_DB", copy.deepcopy(stub_server.FIREBASE_DB))
+    server = stub_server.make_server(0)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def start_sync(base_url, mode):
+    changes = queue.Queue()
+    statuses = []
+    sync = FirebaseSync(
+        OutboundClient("firebase-test", retries=0), base_url, mode=mode, interval=0.05,
+        on_change=changes.put, on_status=lambda online, error: statuses.append(online)
+    )
+    sync.start()
+    return sync, changes, statuses
+
+
+def next_change(changes, condition, timeout=5.0):
+    """First on_change tree matching condition (earlier ones are skipped)"""
+    while True:
+        tree = changes.get(timeout=timeout)
+        if condition(tree):
+            return tree
+
+
+def test_apply_event_put_patch_and_delete():
+    value = {"soilData": {"moisture": 40, "ph": 6.5}}
+    assert apply_event(value, "put", {"path": "/soilData/moisture", "data": 55}) == {"soilData": {"moisture": 55, "ph": 6.5}}
+    assert apply_event(value, "patch", {"path": "/soilData", "data": {"ph": 7, "n/deep": 1}}) == {
+        "soilData": {"moisture": 40, "ph": 7, "n": {"deep": 1}}
+    }
+    assert apply_event(value, "put", {"path": "/soilData/ph", "data": None}) == {"soilData": {"moisture": 40}}
+    assert apply_event(value, "put", {"path": "/", "data": None}) is None
+    assert value == {"soilData": {"moisture": 40, "ph": 6.5}}  # never mutated
+
+
+@pytest.mark.parametrize("mode", ["stream", "poll"])
+def test_sync_mirrors_paths_and_follows_changes(rtdb, mode):
+    sync, changes, statuses = start_sync(rtdb, mode)
+    try:
+        tree = next_change(changes, lambda t: True)
+        assert set(tree) == {"soilData", "rainStatus", "motorControl", "waterStatus"}
+        assert tree["soilData"]["moisture"] == 48
+        assert sync.online and statuses == [True]
+
+        # Partial update of one path, written by someone else
+        stub_server.db_write(["soilData", "moisture"], "put", 31)
+        tree = next_change(changes, lambda t: t["soilData"]["moisture"] == 31)
+        assert tree["soilData"]["ph"] == 6.6
+
+        # Writes through the sync's own client come back the same way
+        assert sync.put("motorControl", "ON")
+        tree = next_change(changes, lambda t: t["motorControl"] == "ON")
+        assert cloud_reading(tree)["motor"] == 1
+    finally:
+        sync.stop()
+
+
+def test_unchanged_poll_results_are_not_reported(rtdb):
+    sync, changes, _ = start_sync(rtdb, "poll")
+    try:
+        changes.get(timeout=5)
+        with pytest.raises(queue.Empty):
+            changes.get(timeout=0.3)  # several polls, nothing changed
+    finally:
+        sync.stop()
+
+
+def test_unreachable_database_reports_offline():
+    sync, changes, statuses = start_sync("http://127.0.0.1:9", "poll")
+    try:
+        with pytest.raises(queue.Empty):
+            changes.get(timeout=0.3)
+    finally:
+        sync.stop()
+    assert not sync.online and sync.last_error
+    assert statuses == []  # never came online, so nothing to report as dropped
+
+
+def test_cloud_reading_key_variants():
+    reading = cloud_reading({
+        "soilData": {"Nitrogen": "120", "P": 45, "potassium": 80, "temperature": 25, "moisture": "", "ph": "x"},
+        "motorControl": "OFF",
+    })
+    assert reading["N"] == 120.0 and reading["P"] == 45.0 and reading["K"] == 80.0
+    assert reading["soil_moisture"] is None and reading["ph"] is None
+    assert reading["motor"] == 0 and reading["waterStatus"] == "WATER"
@@ -0,0 +1,82 @@
+import hashlib, os, pickle
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_engine import PackedForest, export_forest
+from model_loader import ModelLoader
+
+LOW = [0, 0, 0, 0, 0, 3]
+HIGH = [350, 180, 300, 45, 100, 9]
+
+
+def make_rows(rng, n):
+    return rng.uniform(LOW, HIGH, size=(n, 6))
+
+
+@pytest.fixture(scope="module")
+def model():
+    rng = np.random.default_rng(1)
+    X = make_rows(rng, 600)
+    y = np.where(X[:, 0] > 175, "rice", np.where(X[:, 5] > 6, "wheat", "maize"))
+    return RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X, y)
+
+
+def write_model(folder, model, with_hash=True):
+    pkl = os.path.join(folder, "ml_model.pkl")
+    npz = os.path.join(folder, "ml_model.npz")
+    raw = pickle.dumps(model)
+    with open(pkl, "wb") as f:
+        f.write(raw)
+    export_forest(model, npz, source_sha256=hashlib.sha256(raw).hexdigest() if with_hash else "")
+    return npz, pkl
+
+
+def test_packed_forest_matches_sklearn(model, tmp_path):
+    npz, _ = write_model(tmp_path, model)
+    forest = PackedForest.load(npz)
+    X = make_rows(np.random.default_rng(2), 2000)
+
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), atol=1e-12)
+    assert (forest.predict(X) == model.predict(X)).all()
+    assert list(forest.classes_) == list(model.classes_)
+
+
+def test_packed_forest_single_row_and_thresholds(model, tmp_path):
+    npz, _ = write_model(tmp_path, model)
+    forest = PackedForest.load(npz)
+    # Rows sitting exactly on split thresholds take the same branch as sklearn
+    tree = model.estimators_[0].tree_
+    split = tree.children_left >= 0
+    X = np.tile(np.array(LOW, dtype=float), (int(split.sum()), 1))
+    X[np.arange(len(X)), tree.feature[split]] = tree.threshold[split]
+
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), atol=1e-12)
+    np.testing.assert_allclose(forest.predict_proba(X[0]), model.predict_proba(X[:1]), atol=1e-12)
+
+
+def test_loader_serves_forest_built_from_current_pickle(model, tmp_path):
+    npz, pkl = write_model(tmp_path, model)
+    loader = ModelLoader(npz, pkl)
+    assert isinstance(loader.get(), PackedForest)
+    assert loader.stats()["source"] == "ml_model.npz"
+
+
+def test_loader_ignores_forest_of_another_pickle(model, tmp_path):
+    npz, pkl = write_model(tmp_path, model)
+    other = RandomForestClassifier(n_estimators=3, random_state=5).fit(make_rows(np.random.default_rng(3), 50), ["a", "b"] * 25)
+    with open(pkl, "wb") as f:
+        pickle.dump(other, f)
+
+    assert not isinstance(ModelLoader(npz, pkl).get(), PackedForest)
+
+
+def test_loader_checks_legacy_forest_against_pickle(model, tmp_path):
+    npz, pkl = write_model(tmp_path, model, with_hash=False)
+    assert isinstance(ModelLoader(npz, pkl).get(), PackedForest)
+
+    other = RandomForestClassifier(n_estimators=3, random_state=5).fit(make_rows(np.random.default_rng(3), 50), ["a", "b"] * 25)
+    with open(pkl, "wb") as f:
+        pickle.dump(other, f)
+    assert not isinstance(ModelLoader(npz, pkl).get(), PackedForest)
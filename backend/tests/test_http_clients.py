@@ -0,0 +1,85 @@
+import json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_clients import OutboundClient
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 to the first server.failures calls of each method, then 200"""
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        with self.server.lock:
+            count = self.server.hits[self.command] = self.server.hits.get(self.command, 0) + 1
+            self.server.clients.add(self.client_address)
+        status = 503 if count <= self.server.failures else 200
+        body = json.dumps({"method": self.command, "hit": count}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = _handle
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    httpd.lock = threading.Lock()
+    httpd.hits = {}
+    httpd.clients = set()  # (host, port) of each connection used
+    httpd.failures = 2
+    threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/x"
+
+
+def test_get_is_retried_on_5xx(server):
+    client = OutboundClient("test", retries=2, backoff=0)
+    response = client.get(url(server))
+    assert response.status_code == 200
+    assert server.hits == {"GET": 3}
+
+
+def test_put_is_retried_on_5xx(server):
+    client = OutboundClient("test", retries=2, backoff=0)
+    assert client.put(url(server), json={"a": 1}).status_code == 200
+    assert server.hits == {"PUT": 3}
+
+
+def test_post_is_not_retried_on_5xx(server):
+    client = OutboundClient("test", retries=2, backoff=0)
+    response = client.post(url(server), json={"to": "someone"})
+    assert response.status_code == 503
+    assert server.hits == {"POST": 1}  # an email or AI call is never sent twice
+
+    stats = client.stats()
+    assert stats["calls"] == 1 and stats["errors"] == 1 and stats["status"] == {"503": 1}
+
+
+def test_retries_give_up_with_the_last_status(server):
+    server.failures = 10
+    client = OutboundClient("test", retries=2, backoff=0)
+    assert client.get(url(server)).status_code == 503
+    assert server.hits == {"GET": 3}
+
+
+def test_keep_alive_pool_reuses_connections(server):
+    server.failures = 0
+    client = OutboundClient("test", pool_size=1, retries=0)
+    for _ in range(5):
+        assert client.get(url(server)).json()["method"] == "GET"
+    assert len(server.clients) == 1
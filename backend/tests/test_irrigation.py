@@ -0,0 +1,79 @@
+from bench_irrigation import BangBangController, simulate
+from irrigation import PumpController, SoilSimulator
+
+STEP = 5  # seconds between readings
+
+
+def run(controller, soil, seconds, start=0):
+    """Drive the controller from the simulated soil; returns [(ts, command)]"""
+    switches = []
+    for ts in range(start, start + seconds, STEP):
+        command = controller.update(ts, soil.read())
+        if command:
+            switches.append((ts, command))
+        soil.step(STEP, controller.on)
+    return switches
+
+
+def test_keeps_moisture_in_crop_range():
+    result = simulate(PumpController(50, 80), days=3, step=STEP, moist_min=50, moist_max=80,
+                      seed=1, noise=1.5, lag=300, field_capacity=85)
+    assert result["in_range"] > 95
+    assert result["below"] < 5
+    assert 1 <= result["cycles"] <= 10
+
+
+def test_learns_fewer_bursts_than_bang_bang_on_slow_soil():
+    args = dict(days=7, step=STEP, moist_min=60, moist_max=85, seed=1, noise=3, lag=900, field_capacity=80)
+    pi = simulate(PumpController(60, 85), **args)
+    bang_bang = simulate(BangBangController(60, 85), **args)
+    assert pi["in_range"] > 95
+    assert pi["cycles"] < bang_bang["cycles"] / 2
+
+
+def test_switching_respects_min_on_min_off_and_max_on():
+    controller = PumpController(50, 80, min_on=60, min_off=600, max_on=900)
+    soil = SoilSimulator(moisture=45, pump_per_minute=0.2, seed=2)  # slow pump: bursts hit max_on
+    switches = run(controller, soil, 2 * 86400)
+
+    assert switches[0][1] == "ON"
+    for (t1, c1), (t2, c2) in zip(switches, switches[1:]):
+        assert c1 != c2
+        gap = t2 - t1
+        if c1 == "ON":
+            assert 60 <= gap <= 900 + STEP
+        else:
+            assert gap >= 600
+
+
+def test_hold_stops_at_once_and_defer_lets_a_burst_finish():
+    soil = SoilSimulator(moisture=40, seed=3)
+    controller = PumpController(50, 80)
+    assert run(controller, soil, 60)[0][1] == "ON"
+
+    controller.defer("rain expected")
+    assert run(controller, soil, 30, start=60) == []  # still watering
+    assert controller.on
+
+    controller.hold("raining")
+    assert run(controller, soil, 10, start=90) == [(90, "OFF")]
+    controller.release()
+    controller.defer("rain expected")
+    soil.moisture = 30
+    assert run(controller, soil, 3600, start=100) == []  # dry, but no new burst while deferred
+    controller.release()
+    assert run(controller, soil, 3600, start=3700)[0][1] == "ON"
+
+
+def test_cap_target_waters_less_and_keeps_the_integral():
+    controller = PumpController(50, 80)
+    controller.integral = 4.0
+    full = controller.target
+    controller.cap_target(60)
+    assert controller.target == 60 < full
+    controller.cap_target(10)
+    assert controller.target == 50  # never below moist_min
+    controller.cap_target(None)
+    assert controller.target == full
+    controller.set_bounds(40, 70)
+    assert controller.integral == 4.0
@@ -0,0 +1,95 @@
+import json, os
+
+import numpy as np
+
+from rule_engine import RULE_FIELDS, compile_crops, score_readings
+
+CROPS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crops.json")
+
+
+def check(val, r_min, r_max):
+    """The per-crop helper predict() used before the rule engine"""
+    if r_min > r_max: r_min, r_max = r_max, r_min  # Swap if inverted
+
+    if r_min <= val <= r_max: return 1
+    margin = (r_max - r_min) * 0.2
+    if margin == 0: margin = 0.5
+
+    if (r_min - margin) <= val <= (r_max + margin): return 0.5
+    return 0
+
+
+def old_score(reading, crop):
+    score = sum(
+        check(value, crop.get(k_min, d_min), crop.get(k_max, d_max))
+        for value, (k_min, d_min, k_max, d_max) in zip(reading, RULE_FIELDS)
+    )
+    return score / len(RULE_FIELDS) * 100
+
+
+def random_crops(rng, n):
+    crops = []
+    for i in range(n):
+        crop = {"name": f"crop{i}"}
+        for k_min, d_min, k_max, d_max in RULE_FIELDS:
+            roll = rng.random()
+            if roll < 0.1:
+                continue  # defaults
+            low, high = sorted(rng.uniform(0, d_max, size=2))
+            if roll < 0.2:
+                low, high = high, low  # inverted
+            elif roll < 0.3:
+                high = low  # empty range
+            crop[k_min], crop[k_max] = round(low, 1), round(high, 1)
+        crops.append(crop)
+    return crops
+
+
+def readings_for(rng, crops, n):
+    X = rng.uniform([0, 0, 0, 0, 0, 0], [120, 120, 120, 45, 100, 14], size=(n, 6))
+    # Plus every bound and margin edge of the first crops, where rounding bites
+    edges = []
+    for crop in crops[:10]:
+        row = []
+        for k_min, d_min, k_max, d_max in RULE_FIELDS:
+            low, high = sorted((crop.get(k_min, d_min), crop.get(k_max, d_max)))
+            margin = (high - low) * 0.2 or 0.5
+            row.append(rng.choice([low, high, low - margin, high + margin]))
+        edges.append(row)
+    return np.vstack([X, edges]) if edges else X
+
+
+def assert_same_scores(crops, X):
+    scores = score_readings(X, compile_crops(crops))
+    expected = np.array([[old_score(row, crop) for crop in crops] for row in X]).reshape(len(X), len(crops))
+    np.testing.assert_allclose(scores, expected, atol=1e-9)
+
+
+def test_scores_match_check_on_crops_fixture():
+    with open(CROPS_FILE) as f:
+        crops = json.load(f)
+    rng = np.random.default_rng(0)
+    assert_same_scores(crops, readings_for(rng, crops, 500))
+
+
+def test_scores_match_check_on_random_crops():
+    rng = np.random.default_rng(1)
+    crops = random_crops(rng, 60)
+    assert_same_scores(crops, readings_for(rng, crops, 1000))
+
+
+def test_chunked_scoring_matches(monkeypatch):
+    import rule_engine
+
+    rng = np.random.default_rng(2)
+    crops = random_crops(rng, 7)
+    X = readings_for(rng, crops, 300)
+    full = score_readings(X, compile_crops(crops))
+    monkeypatch.setattr(rule_engine, "CHUNK_ELEMENTS", 50)
+    np.testing.assert_array_equal(score_readings(X, compile_crops(crops)), full)
+
+
+def test_malformed_crops_are_skipped():
+    compiled = compile_crops([{"name": "bad", "N_min": "abc"}, {"name": "good", "N_min": "10", "N_max": 20}])
+    assert [c["name"] for c in compiled.crops] == ["good"]
+    assert score_readings([[15, 50, 50, 20, 50, 7]], compiled).shape == (1, 1)
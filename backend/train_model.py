@@ -1,36 +1,229 @@
+"""
+Crop model training pipeline.
+
+Cross-validated search over tree count and depth on all cores, then a final
+fit, a held-out report (accuracy, model size, per-sample latency) and a
+versioned artifact in models/:
+
+    models/<version>.pkl   sklearn model
+    models/<version>.npz   packed forest (forest_engine.py)
+    models/<version>.json  metadata: data hash, params, scores, size, latency
+
+The new version is then swapped into ml_model.pkl / ml_model.npz atomically,
+which is what the server loads. Retraining on an unchanged dataset is a no-op
+unless --force; --reuse-params skips the search and refits with the last
+version's parameters (the quick path as the dataset grows).
+
+Usage:
+    python train_model.py
+    python train_model.py --n-estimators 100,200,400 --max-depth none,12,24 --cv 5
+    python train_model.py --reuse-params
+"""
+import argparse, hashlib, json, os, pickle, shutil, tempfile, time
+
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
-import pickle
+from sklearn.model_selection import GridSearchCV, train_test_split
+
+from forest_engine import PackedForest, export_forest, verify
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FEATURES = ["N", "P", "K", "temperature", "soil_moisture", "ph"]  # same order as app.py
+TARGET = "crop"
+DATA_FILE = os.path.join(HERE, "Crop_dataset.csv")
+MODELS_DIR = os.path.join(HERE, "models")
+MODEL_FILE = os.path.join(HERE, "ml_model.pkl")
+FOREST_FILE = os.path.join(HERE, "ml_model.npz")
+
+
+def load_dataset(path=DATA_FILE):
+    df = pd.read_csv(path)
+    return df[FEATURES], df[TARGET]
+
+
+def split(X, y, test_size=0.2):
+    """The held-out split shared with check_accuracy.py"""
+    return train_test_split(X, y, test_size=test_size, random_state=42)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def latest_meta(models_dir=MODELS_DIR):
+    """Metadata of the newest trained version, or None"""
+    if not os.path.isdir(models_dir):
+        return None
+    metas = sorted(name for name in os.listdir(models_dir) if name.endswith(".json"))
+    if not metas:
+        return None
+    with open(os.path.join(models_dir, metas[-1])) as f:
+        return json.load(f)
+
+
+def new_version(models_dir=MODELS_DIR):
+    """
+    "<YYYYmmdd-HHMMSS>-NN", reserved by creating its .pkl exclusively so two
+    runs in the same second never share (and overwrite) a version
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    for n in range(1, 100):
+        version = f"{stamp}-{n:02d}"
+        try:
+            os.close(os.open(os.path.join(models_dir, version + ".pkl"), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return version
+        except FileExistsError:
+            continue
+    raise RuntimeError(f"Too many model versions for {stamp}")
+
+
+def parse_grid(spec, cast):
+    return [None if v.strip().lower() == "none" else cast(v) for v in spec.split(",")]
+
+
+def per_sample_ms(predict, X, repeats=200):
+    """(single-reading ms, ms per reading when predicting all of X at once)"""
+    row = X[:1]
+    predict(row)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict(row)
+    single = (time.perf_counter() - start) / repeats * 1000
+
+    start = time.perf_counter()
+    predict(X)
+    batch = (time.perf_counter() - start) / len(X) * 1000
+    return single, batch
+
+
+def replace_atomically(src, dst):
+    folder = os.path.dirname(os.path.abspath(dst))
+    fd, tmp_path = tempfile.mkstemp(prefix=".model-", suffix=os.path.splitext(dst)[1], dir=folder)
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("--n-estimators", default="100,200,400", help="grid, comma-separated")
+    parser.add_argument("--max-depth", default="none,12,24", help="grid, comma-separated ('none' = unlimited)")
+    parser.add_argument("--cv", type=int, default=5, help="cross-validation folds")
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel jobs (-1 = all cores)")
+    parser.add_argument("--reuse-params", action="store_true", help="skip the search, refit with the last version's params")
+    parser.add_argument("--force", action="store_true", help="retrain even if the dataset is unchanged")
+    parser.add_argument("--no-deploy", action="store_true", help="don't replace ml_model.pkl / ml_model.npz")
+    args = parser.parse_args()
+
+    data_hash = file_sha256(args.data)
+    previous = latest_meta()
+    if previous and previous["data"]["sha256"] == data_hash and not args.force:
+        print(f"Dataset unchanged since {previous['version']} - nothing to do (use --force to retrain)")
+        return
+
+    X, y = load_dataset(args.data)
+    X_train, X_test, y_train, y_test = split(X, y)
+    print(f"{len(X)} rows, {y.nunique()} crops ({len(X_train)} train / {len(X_test)} test)")
+
+    started = time.perf_counter()
+    if args.reuse_params and previous:
+        params = previous["params"]
+        print(f"Reusing params from {previous['version']}: {params}")
+        model = RandomForestClassifier(random_state=42, n_jobs=args.jobs, **params).fit(X_train, y_train)
+        cv_score = None
+    else:
+        grid = {
+            "n_estimators": parse_grid(args.n_estimators, int),
+            "max_depth": parse_grid(args.max_depth, int),
+        }
+        search = GridSearchCV(
+            RandomForestClassifier(random_state=42, n_jobs=1),  # parallelize across candidates instead
+            grid, cv=args.cv, scoring="accuracy", n_jobs=args.jobs, refit=True,
+        )
+        search.fit(X_train, y_train)
+        model, params, cv_score = search.best_estimator_, search.best_params_, float(search.best_score_)
+
+        results = pd.DataFrame(search.cv_results_).sort_values("rank_test_score")
+        print(f"\n{'n_estimators':>12} {'max_depth':>9} {'cv acc':>8} {'+/-':>6} {'fit s':>6}")
+        for _, row in results.head(10).iterrows():
+            print(f"{row['param_n_estimators']:>12} {str(row['param_max_depth']):>9} "
+                  f"{row['mean_test_score'] * 100:>7.2f}% {row['std_test_score'] * 100:>5.2f} {row['mean_fit_time']:>6.2f}")
+    train_seconds = time.perf_counter() - started
 
-# Load dataset
-df = pd.read_csv("Crop_dataset.csv")
+    # Held-out report
+    acc = accuracy_score(y_test, model.predict(X_test))
+    version = new_version()
+    base = os.path.join(MODELS_DIR, version)
 
-X = df.drop("crop", axis=1)
-y = df["crop"]
+    # The .pkl reserved by new_version() (and any file written after it) is
+    # removed if this run fails, so no empty or partial version is left behind
+    try:
+        model.set_params(n_jobs=1)  # the server predicts one reading at a time
+        with open(base + ".pkl", "wb") as f:
+            pickle.dump(model, f)
+        export_forest(model, base + ".npz", source_sha256=file_sha256(base + ".pkl"))
+        forest = PackedForest.load(base + ".npz")
+        X_eval = np.asarray(X_test, dtype=float)
+        max_diff = verify(model, forest, X_test)  # DataFrame: the model was fit with feature names
 
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
+        packed_single, packed_batch = per_sample_ms(forest.predict_proba, X_eval)
+        sk_single, sk_batch = per_sample_ms(lambda rows: model.predict_proba(pd.DataFrame(rows, columns=FEATURES)), X_eval, repeats=20)
 
-# Model
-model = RandomForestClassifier(
-    n_estimators=200,
-    max_depth=None,
-    random_state=42
-)
+        meta = {
+            "version": version,
+            "created": time.time(),
+            "data": {"file": os.path.basename(args.data), "sha256": data_hash, "rows": len(X)},
+            "params": {k: params[k] for k in ("n_estimators", "max_depth")},
+            "cv_accuracy": cv_score,
+            "test_accuracy": acc,
+            "train_seconds": round(train_seconds, 2),
+            "nodes": int(len(forest.feature)),
+            "size_bytes": {"pkl": os.path.getsize(base + ".pkl"), "npz": os.path.getsize(base + ".npz")},
+            "latency_ms": {
+                "packed_single": round(packed_single, 4), "packed_per_sample_batch": round(packed_batch, 4),
+                "sklearn_single": round(sk_single, 4), "sklearn_per_sample_batch": round(sk_batch, 4),
+            },
+            "packed_max_diff": max_diff,
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(meta, f, indent=4)
+    except BaseException:
+        for ext in (".json", ".npz", ".pkl"):
+            if os.path.exists(base + ext):
+                os.remove(base + ext)
+        raise
 
-model.fit(X_train, y_train)
+    print(f"\nModel {version}: {meta['params']}")
+    if cv_score is not None:
+        print(f"  CV accuracy:   {cv_score * 100:.2f}%")
+    print(f"  Test accuracy: {acc * 100:.2f}%  (trained in {train_seconds:.1f}s)")
+    print(f"  Size:          {meta['nodes']:,} nodes, pkl {meta['size_bytes']['pkl'] / 1e6:.1f} MB, "
+          f"npz {meta['size_bytes']['npz'] / 1e6:.1f} MB")
+    print(f"  Latency:       packed {packed_single:.3f} ms/reading ({packed_batch:.4f} ms in batch), "
+          f"sklearn {sk_single:.3f} ms ({sk_batch:.4f} ms in batch)")
 
-# Accuracy
-pred = model.predict(X_test)
-acc = accuracy_score(y_test, pred)
+    if args.no_deploy:
+        print(f"Saved to {base}.* (not deployed)")
+        return
+    # npz first: the server only uses it while it matches ml_model.pkl, so the
+    # new forest takes over once the new pickle lands
+    replace_atomically(base + ".npz", FOREST_FILE)
+    replace_atomically(base + ".pkl", MODEL_FILE)
+    print(f"Deployed {version} to ml_model.npz / ml_model.pkl")
 
-# Save model
-with open("ml_model.pkl", "wb") as f:
-    pickle.dump(model, f)
 
-print("Model trained successfully")
-print("Accuracy:", round(acc * 100, 2), "%")
+if __name__ == "__main__":
+    main()
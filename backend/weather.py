@@ -0,0 +1,234 @@
+"""
+Server-side weather forecast cache and rain-aware irrigation plan.
+
+One process fetches the forecast every `interval` seconds through a
+provider and keeps the summary in memory and in a small JSON file; other
+processes (web workers) read that file instead of calling the API. The
+dashboard asks the server rather than calling Open-Meteo from every browser.
+
+Providers return an Open-Meteo style forecast ({"hourly": {"time": [...],
+"rain": [...], "precipitation": [...], "precipitation_probability": [...]},
+"current": {...}}):
+
+  OpenMeteoProvider  api.open-meteo.com for a latitude / longitude
+  FixtureProvider    a local JSON file in the same shape, for offline use;
+                     its hours are shifted so the first one is the current hour
+
+The summary uses the dashboard's rules: rain now -> "YES", precipitation
+probability at or above the threshold within the look-ahead -> "EXPECTED",
+else "NO". plan_fields() turns it into a per-field action for the pump.
+"""
+import json, os, tempfile, threading, time
+from datetime import datetime, timezone
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+
+class OpenMeteoProvider:
+    name = "open-meteo"
+
+    def __init__(self, client, latitude, longitude, url=OPEN_METEO_URL):
+        self.client = client  # http_clients.OutboundClient
+        self.latitude = latitude
+        self.longitude = longitude
+        self.url = url
+
+    def fetch(self):
+        response = self.client.get(self.url, params={
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "hourly": "rain,precipitation,precipitation_probability",
+            "current": "temperature_2m,relative_humidity_2m,rain,weather_code,wind_speed_10m",
+            "timezone": "GMT",
+            "forecast_days": 2,
+        })
+        response.raise_for_status()
+        return response.json()
+
+
+class FixtureProvider:
+    name = "fixture"
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        hourly = data.get("hourly") or {}
+        times = hourly.get("time") or []
+        if times:
+            offset = data.get("utc_offset_seconds", 0)
+            first = hour_timestamp(times[0], offset)
+            shift = int(time.time() // 3600 * 3600 - first)
+            hourly["time"] = [hour_timestamp(t, offset) + shift for t in times]
+            data["utc_offset_seconds"] = None  # already epoch seconds
+        return data
+
+
+def hour_timestamp(value, utc_offset=0):
+    """Open-Meteo local ISO hour ("2025-01-31T14:00") or epoch seconds -> epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    return parsed.timestamp() - (utc_offset or 0)
+
+
+def summarize(data, now=None, expected_threshold=40, lookahead_hours=6):
+    """Rain status and the numbers behind it, for the hour closest to `now`"""
+    now = time.time() if now is None else now
+    hourly = data.get("hourly") or {}
+    times = [hour_timestamp(t, data.get("utc_offset_seconds")) for t in hourly.get("time") or []]
+    if not times:
+        raise ValueError("Forecast has no hourly data")
+
+    def series(name):
+        values = hourly.get(name) or []
+        return [v or 0 for v in values] + [0] * (len(times) - len(values))
+
+    rain, precipitation, probability = series("rain"), series("precipitation"), series("precipitation_probability")
+    idx = min(range(len(times)), key=lambda i: abs(times[i] - now))
+    ahead = range(idx, min(idx + lookahead_hours, len(times)))
+
+    max_probability = max((probability[i] for i in ahead), default=0)
+    if rain[idx] > 0 or precipitation[idx] > 0.5:
+        status = "YES"
+    elif max_probability >= expected_threshold:
+        status = "EXPECTED"
+    else:
+        status = "NO"
+    next_rain = next((times[i] for i in ahead if probability[i] >= expected_threshold or precipitation[i] > 0.5), None)
+
+    return {
+        "rain_status": status,
+        "rain": rain[idx],
+        "precipitation": precipitation[idx],
+        "probability": probability[idx],
+        "max_probability": max_probability,
+        "precipitation_ahead": round(sum(precipitation[i] for i in ahead), 2),
+        "lookahead_hours": lookahead_hours,
+        "next_rain_at": next_rain,
+        "hour": times[idx],
+        "current": data.get("current"),
+    }
+
+
+def plan_fields(summary, fields, skip_mm=2.0):
+    """
+    Irrigation action per field from a forecast summary.
+    fields: {device id: {"crop", "moist_min", "moist_max"} or None}
+
+      hold    raining now: keep the pump off
+      skip    at least `skip_mm` forecast in the look-ahead: don't start watering
+      reduce  rain likely: water only up to the middle of the crop's range
+      normal  water as usual
+    """
+    plan = {}
+    for device_id, field in fields.items():
+        entry = {"device": device_id, "crop": (field or {}).get("crop"), "target_cap": None}
+        if summary is None:
+            entry.update(action="normal", reason="No forecast available")
+        elif summary["rain_status"] == "YES":
+            entry.update(action="hold", reason="Raining now")
+        elif summary["precipitation_ahead"] >= skip_mm:
+            entry.update(action="skip", reason=f"{summary['precipitation_ahead']} mm forecast in the next {summary['lookahead_hours']} h")
+        elif summary["rain_status"] == "EXPECTED":
+            entry.update(action="reduce", reason=f"{summary['max_probability']}% chance of rain in the next {summary['lookahead_hours']} h")
+            if field:
+                entry["target_cap"] = (field["moist_min"] + field["moist_max"]) / 2
+        else:
+            entry.update(action="normal", reason="No rain forecast")
+        plan[device_id] = entry
+    return plan
+
+
+class WeatherCache:
+    def __init__(self, provider=None, interval=900, path=None, on_refresh=None, **summary_options):
+        """
+        provider=None makes a read-only cache that follows the file another
+        process writes. on_refresh(state) runs after every successful fetch.
+        """
+        self.provider = provider
+        self.on_refresh = on_refresh
+        self.interval = interval
+        self.path = path
+        self.summary_options = summary_options
+        self._lock = threading.Lock()
+        self._state = {"summary": None, "fetched_at": None, "source": None, "error": None}
+        self._file_mtime = None
+        self.fetches = 0
+
+    # ---------- fetching ----------
+    def refresh(self):
+        """Fetch and summarize once; on failure the last forecast is kept"""
+        try:
+            summary = summarize(self.provider.fetch(), **self.summary_options)
+            state = {"summary": summary, "fetched_at": time.time(), "source": self.provider.name, "error": None}
+        except Exception as e:
+            print(f"Weather fetch failed ({self.provider.name}): {e}")
+            state = dict(self._state, error=str(e))
+        with self._lock:
+            self._state = state
+            self.fetches += 1
+        if self.path:
+            self._save(state)
+        if self.on_refresh and state["error"] is None:
+            try:
+                self.on_refresh(state)
+            except Exception as e:
+                print(f"Weather refresh handler error: {e}")
+        return state
+
+    def start(self):
+        """Fetch now and then every `interval` seconds on a background thread"""
+        def run():
+            while True:
+                self.refresh()
+                time.sleep(self.interval)
+
+        threading.Thread(target=run, name="weather", daemon=True).start()
+
+    def _save(self, state):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".weather-", suffix=".json", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Weather cache save failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _follow_file(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._file_mtime:
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return  # retried on the next read
+        with self._lock:
+            self._state, self._file_mtime = state, mtime
+
+    # ---------- reading ----------
+    def current(self):
+        """Latest {"summary", "fetched_at", "source", "error", "stale"}"""
+        if self.provider is None and self.path:
+            self._follow_file()
+        with self._lock:
+            state = dict(self._state)
+        fetched_at = state["fetched_at"]
+        state["stale"] = fetched_at is None or time.time() - fetched_at > 2 * self.interval
+        return state
+
+    @property
+    def version(self):
+        """Changes whenever a new forecast arrives (for ETags and memoizing plans)"""
+        state = self.current()
+        return state["fetched_at"] or 0
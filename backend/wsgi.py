@@ -0,0 +1,19 @@
+"""
+WSGI entry point: builds the app and starts its background services.
+
+Several workers (production, Linux / macOS):
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py runs the workers as PROCESS_ROLE=web and starts one
+ingest.py that owns the serial ports (gunicorn also loads it by itself
+when started from the backend folder). A plain `gunicorn -w N wsgi:app`
+would make every worker a standalone server opening the same ports; the
+second one refuses to start (see claim_serial_ports in app.py). Without
+gunicorn.conf.py, run a single worker:
+
+    gunicorn --chdir backend -w 1 wsgi:app
+"""
+from app import create_app
+
+app = create_app()
@@ -5,12 +5,28 @@ let selectedCrops = [];
 let FIREBASE_AUTH = "";
 async function getFirebaseAuthToken() {
   if (FIREBASE_AUTH) return FIREBASE_AUTH;
+  await loadConfig();
+  return FIREBASE_AUTH;
+}
+
+// Cloud Mode data comes from the backend, which syncs Firebase for all dashboards
+let CLOUD_DEVICE;
+let USB_DEVICE; // USB Mode shows the server's default serial device
+let PUMP_CONTROL = "dashboard"; // "server": the server's pump controller owns motorControl
+async function getCloudDevice() {
+  if (CLOUD_DEVICE === undefined) await loadConfig();
+  return CLOUD_DEVICE;
+}
+
+async function loadConfig() {
   try {
     const r = await fetch("/api/config");
     const d = await r.json();
     FIREBASE_AUTH = d.FIREBASE_AUTH;
+    CLOUD_DEVICE = d.CLOUD_DEVICE;
+    USB_DEVICE = d.USB_DEVICE;
+    PUMP_CONTROL = d.PUMP_CONTROL || "dashboard";
   } catch (e) { console.error("Config fetch error:", e); }
-  return FIREBASE_AUTH;
 }
 
 // ================= THEME & CONNECTION STATUS (NEW) =================
@@ -29,10 +45,9 @@ let currentRainForecast = "NO"; // NO, YES, EXPECTED
 let lastMotorWriteState = null; // Track to avoid redundant Firebase writes
 
 // ================= WEATHER CONFIG =================
-const WEATHER_LAT = 17.7343;  // Visakhapatnam
-const WEATHER_LON = 83.3130;  // Visakhapatnam
-const RAIN_EXPECTED_THRESHOLD = 40; // precipitation probability % to trigger EXPECTED
+// The backend fetches and caches the forecast (WEATHER_LAT / WEATHER_LON in .env)
 let weatherApiData = null; // Store latest weather API data for display
+let irrigationPlans = []; // Backend's rain-aware plan, one entry per device
 
 modeToggle.addEventListener('change', (e) => {
   isCloudMode = e.target.checked;
@@ -164,99 +179,25 @@ async function loadSensor() {
     let d = {};
 
     if (isCloudMode) {
-      // FETCH FROM ROOT to get Rain, Motor, and Soil Data all at once
-      const authCount = await getFirebaseAuthToken();
-      const res = await fetch(`https://smartsoilhealth-bdc49-default-rtdb.asia-southeast1.firebasedatabase.app/.json?auth=${authCount}`);
-      if (!res.ok) throw new Error("Firebase Error");
-
-      const rootData = await res.json();
-      if (!rootData) throw new Error("No Data");
-
-      const sData = rootData.soilData || {};
-
-      d = {
-        temperature: sData.temperature,
-        soil_moisture: sData.moisture,
-        ph: sData.ph,
-        // Check multiple key variations for robustness
-        N: sData.nitrogen ?? sData.Nitrogen ?? sData.N,
-        P: sData.phosphorus ?? sData.Phosphorus ?? sData.P,
-        K: sData.potassium ?? sData.Potassium ?? sData.K,
-        rainStatus: rootData.rainStatus
-      };
-
-      updateConnectionStatus(true);
-
-      // Read water status from Firebase
-      currentWaterStatus = rootData.waterStatus || "WATER";
-
-      // Sync lastMotorWriteState from Firebase on first read
-      if (lastMotorWriteState === null) {
-        lastMotorWriteState = rootData.motorControl === "ON" ? "ON" : "OFF";
-      }
-
-      // Combine hardware rain sensor with weather forecast
-      const hwRain = rootData.rainStatus;
-      const hwIsRaining = typeof hwRain === 'string' &&
-        (hwRain.toUpperCase().includes("YES") || hwRain.toUpperCase() === "RAIN");
-
-      if (hwIsRaining) {
-        currentRainForecast = "YES";
-      }
-      // Otherwise keep currentRainForecast from weather API
+      // The backend mirrors Firebase (soilData, rainStatus, motorControl, waterStatus)
+      const cloudDevice = await getCloudDevice();
+      if (!cloudDevice) throw new Error("Cloud Mode is not configured on the server (FIREBASE_AUTH / FIREBASE_URL)");
+      const res = await fetch(`/api/sensor-data?device=${encodeURIComponent(cloudDevice)}`);
+      if (!res.ok) throw new Error("API Error");
 
-      updateRainStatus(currentRainForecast);
-      updateMotorStatus(rootData.motorControl === "ON" ? "ON" : "OFF");
+      d = await res.json();
+      if (d.soil_moisture === undefined) throw new Error("No Data");
+      updateCloudStatus(d);
 
     } else {
       const res = await fetch("/api/sensor-data");
       if (!res.ok) throw new Error("API Error");
 
       d = await res.json();
-
-      // Check if we have actual sensor data
-      const hasData = d.N !== undefined && d.N !== null;
-      updateConnectionStatus(hasData);
-
-      // Update rain from USB data if available
-      if (d.rainStatus !== undefined) {
-        updateRainStatus(d.rainStatus);
-      } else if (d.rain !== undefined) {
-        updateRainStatus(d.rain); // Fallback if named 'rain'
-      }
+      updateUsbStatus(d);
     }
 
-    updateCard('temp', d.temperature, '°C');
-    updateCard('moisture', d.soil_moisture, '%');
-    updateCard('ph', d.ph, 'pH');
-    updateCard('n', d.N, 'mg/kg');
-    updateCard('p', d.P, 'mg/kg');
-    updateCard('k', d.K, 'mg/kg');
-
-    // Save for prediction usage
-    currentSensorData = d;
-
-    // Evaluate motor decision based on active crop
-    if (isCloudMode && activeCropForMotor) {
-      evaluateMotorDecision(d.soil_moisture);
-    }
-
-    // Update motor tooltip with latest data
-    updateMotorTooltip();
-
-    // Check if sensor data is valid (all zeros = invalid)
-    const hasValidData = (Number(d.N) > 0 || Number(d.P) > 0 || Number(d.K) > 0);
-    const predictBtn = document.querySelector('.predict-btn');
-    if (predictBtn) {
-      predictBtn.disabled = !hasValidData;
-      if (!hasValidData) {
-        predictBtn.title = "Sensor readings are 0. Connect sensors or switch mode.";
-        predictBtn.style.opacity = '0.5';
-      } else {
-        predictBtn.title = "";
-        predictBtn.style.opacity = '1';
-      }
-    }
+    renderSensorData(d);
 
   } catch (e) {
     console.error("Sensor error:", e);
@@ -268,6 +209,126 @@ async function loadSensor() {
   }
 }
 
+function updateCloudStatus(d) {
+  updateConnectionStatus(true);
+
+  // Read water status from Firebase
+  currentWaterStatus = d.waterStatus || "WATER";
+
+  // Sync lastMotorWriteState from Firebase on first read
+  if (lastMotorWriteState === null) {
+    lastMotorWriteState = d.motor === 1 ? "ON" : "OFF";
+  }
+
+  // Combine hardware rain sensor with weather forecast
+  const hwRain = d.rainStatus;
+  const hwIsRaining = typeof hwRain === 'string' &&
+    (hwRain.toUpperCase().includes("YES") || hwRain.toUpperCase() === "RAIN");
+
+  if (hwIsRaining) {
+    currentRainForecast = "YES";
+  }
+  // Otherwise keep currentRainForecast from weather API
+
+  updateRainStatus(currentRainForecast);
+  updateMotorStatus(d.motor === 1 ? "ON" : "OFF");
+}
+
+function updateUsbStatus(d) {
+  // Check if we have actual sensor data
+  const hasData = d.N !== undefined && d.N !== null;
+  updateConnectionStatus(hasData);
+
+  // Update rain from USB data if available
+  if (d.rainStatus !== undefined) {
+    updateRainStatus(d.rainStatus);
+  } else if (d.rain !== undefined) {
+    updateRainStatus(d.rain); // Fallback if named 'rain'
+  }
+}
+
+function renderSensorData(d) {
+  updateCard('temp', d.temperature, '°C');
+  updateCard('moisture', d.soil_moisture, '%');
+  updateCard('ph', d.ph, 'pH');
+  updateCard('n', d.N, 'mg/kg');
+  updateCard('p', d.P, 'mg/kg');
+  updateCard('k', d.K, 'mg/kg');
+
+  // Save for prediction usage
+  currentSensorData = d;
+
+  // Evaluate motor decision based on active crop
+  if (isCloudMode && activeCropForMotor) {
+    evaluateMotorDecision(d.soil_moisture);
+  }
+
+  // Update motor tooltip with latest data
+  updateMotorTooltip();
+
+  // Check if sensor data is valid (all zeros = invalid)
+  const hasValidData = (Number(d.N) > 0 || Number(d.P) > 0 || Number(d.K) > 0);
+  const predictBtn = document.querySelector('.predict-btn');
+  if (predictBtn) {
+    predictBtn.disabled = !hasValidData;
+    if (!hasValidData) {
+      predictBtn.title = "Sensor readings are 0. Connect sensors or switch mode.";
+      predictBtn.style.opacity = '0.5';
+    } else {
+      predictBtn.title = "";
+      predictBtn.style.opacity = '1';
+    }
+  }
+}
+
+// ================= LIVE UPDATES (SERVER-SENT EVENTS) =================
+// USB Mode: the backend pushes changed readings and motor transitions.
+// Polling is only used in Cloud Mode or while the stream is down.
+let liveStream = null;
+let liveStreamOpen = false;
+
+function startLiveStream() {
+  if (!window.EventSource || liveStream) return;
+
+  liveStream = new EventSource("/api/stream");
+  liveStream.onopen = () => { liveStreamOpen = true; };
+  liveStream.onerror = () => {
+    liveStreamOpen = false; // EventSource retries on its own...
+    if (liveStream.readyState === EventSource.CLOSED) {
+      // ...except after an error status (503: server's stream limit): poll, retry later
+      liveStream = null;
+      setTimeout(startLiveStream, 60000);
+    }
+  };
+
+  liveStream.addEventListener("sensor", (e) => {
+    const d = JSON.parse(e.data);
+    if (!isShownDevice(d.device)) return;
+    if (isCloudMode) updateCloudStatus(d); else updateUsbStatus(d);
+    renderSensorData(d);
+  });
+
+  liveStream.addEventListener("motor", (e) => {
+    const d = JSON.parse(e.data);
+    if (isCloudMode || !isShownDevice(d.device)) return; // Cloud Mode reads motorControl from the reading
+    updateMotorStatus(d.status);
+  });
+}
+
+// Cloud Mode shows the server's Firebase device, USB Mode the default serial
+// device (the same one /api/sensor-data returns without ?device=)
+function shownDevice() {
+  return isCloudMode ? CLOUD_DEVICE : USB_DEVICE;
+}
+
+function isShownDevice(deviceId) {
+  return deviceId === shownDevice();
+}
+
+function pollIfNotLive(fn) {
+  return () => { if (!liveStreamOpen) fn(); };
+}
+
 function updateCard(id, value, unit) {
   const el = document.getElementById(id);
   const card = document.getElementById(`card-${id}`);
@@ -716,67 +777,105 @@ async function predict() {
 
     // fallback if recommendations missing (backward compatibility)
     const recommendations = data.recommendations || data.top5 || [];
-    lastPredictionResults = recommendations; // Store for modal
+    renderPredictionResults(recommendations);
+    resultBox.scrollIntoView({ behavior: "smooth", block: "nearest" });
 
-    // Show only top 3 initially
-    const top3 = recommendations.slice(0, 3);
+    // AI suggestions are filled in the background - poll for them
+    if (data.ai_request_id) {
+      pollAiRecommendations(data.ai_request_id);
+    }
 
-    let topHTML = `<span class="result-label">🏆 Top Suitable Crops</span>
-      <div class="top5-list">`;
+  } catch (error) {
+    console.error("Prediction Error:", error);
+    btn.innerText = "🌱 Check Suitable Crops";
+    btn.disabled = false;
+    resultBox.classList.remove('hidden');
+    resultBox.innerHTML = `<span class='result-error'>❌ Prediction failed: ${error.message}. Check if backend server is running.</span>`;
+  }
+}
 
-    top3.forEach((item, index) => {
-      let confColor = 'var(--status-danger)';
-      if (item.confidence > 80) confColor = 'var(--status-good)';
-      else if (item.confidence > 40) confColor = 'var(--status-warning)';
+// ================= AI SUGGESTIONS (BACKGROUND FILL) =================
+let activeAiRequestId = null;
 
-      const medal = index === 0 ? '🥇' : index === 1 ? '🥈' : index === 2 ? '🥉' : `#${index + 1}`;
+async function pollAiRecommendations(requestId, attempt = 0) {
+  activeAiRequestId = requestId;
+  const maxAttempts = 60; // ~3 minutes at 3s intervals
 
-      // Determine badge style
-      let badgeStyle = 'background: #E3F2FD; color: #1565C0; border: 1px solid #90CAF9;';
-      if (item.type === "Favorite") {
-        badgeStyle = 'background: #FCE4EC; color: #C62828; border: 1px solid #F48FB1;';
-      } else if (item.type === "Your Crops") {
-        badgeStyle = 'background: #E8F5E9; color: #2E7D32; border: 1px solid #A5D6A7;';
+  setTimeout(async () => {
+    // A newer prediction replaced this one
+    if (activeAiRequestId !== requestId) return;
+
+    try {
+      const res = await fetch(`/api/predict/ai/${requestId}`);
+      const data = await res.json();
+
+      if (data.ai_status === "done") {
+        renderPredictionResults(data.recommendations || []);
+        return;
       }
-      const badgeIcon = item.type === "Favorite" ? '❤️' : item.type === "Your Crops" ? '🌿' : '🤖';
-      const badgeLabel = item.type || "ML Model";
-
-      topHTML += `
-        <div class="top5-item ${index === 0 ? 'top5-best' : ''}">
-          <div style="display:flex; align-items:center; gap:8px;">
-              <span class="top5-rank">${medal}</span>
-              <div style="display:flex; flex-direction:column;">
-                  <span class="top5-name">${item.crop}</span>
-                  <span style="font-size:0.7rem; padding:2px 6px; border-radius:4px; margin-top:2px; width:fit-content; ${badgeStyle}">
-                      ${badgeIcon} ${badgeLabel}
-                  </span>
-              </div>
-          </div>
-          <span class="top5-conf" style="color:${confColor}">${item.confidence}%</span>
-        </div>`;
-    });
+      if (data.ai_status === "pending" && attempt + 1 < maxAttempts) {
+        pollAiRecommendations(requestId, attempt + 1);
+      }
+    } catch (e) {
+      console.error("AI suggestions poll error:", e);
+    }
+  }, 3000);
+}
+
+function renderPredictionResults(recommendations) {
+  const resultBox = document.getElementById("predictionResult");
+  lastPredictionResults = recommendations; // Store for modal
 
-    topHTML += `</div>`;
+  // Show only top 3 initially
+  const top3 = recommendations.slice(0, 3);
 
-    // Add View All Button if results > 3
-    if (recommendations.length > 3) {
-      topHTML += `
-        <button class="btn-load-more" onclick="openPredictionModal()" style="margin-top:10px; width:100%; padding:10px; border:none; background:#eee; cursor:pointer; border-radius:8px; font-weight:600; color:#555;">
-          📋 View All ${recommendations.length} Recommendations
-        </button>
-      `;
+  let topHTML = `<span class="result-label">🏆 Top Suitable Crops</span>
+    <div class="top5-list">`;
+
+  top3.forEach((item, index) => {
+    let confColor = 'var(--status-danger)';
+    if (item.confidence > 80) confColor = 'var(--status-good)';
+    else if (item.confidence > 40) confColor = 'var(--status-warning)';
+
+    const medal = index === 0 ? '🥇' : index === 1 ? '🥈' : index === 2 ? '🥉' : `#${index + 1}`;
+
+    // Determine badge style
+    let badgeStyle = 'background: #E3F2FD; color: #1565C0; border: 1px solid #90CAF9;';
+    if (item.type === "Favorite") {
+      badgeStyle = 'background: #FCE4EC; color: #C62828; border: 1px solid #F48FB1;';
+    } else if (item.type === "Your Crops") {
+      badgeStyle = 'background: #E8F5E9; color: #2E7D32; border: 1px solid #A5D6A7;';
     }
+    const badgeIcon = item.type === "Favorite" ? '❤️' : item.type === "Your Crops" ? '🌿' : '🤖';
+    const badgeLabel = item.type || "ML Model";
+
+    topHTML += `
+      <div class="top5-item ${index === 0 ? 'top5-best' : ''}">
+        <div style="display:flex; align-items:center; gap:8px;">
+            <span class="top5-rank">${medal}</span>
+            <div style="display:flex; flex-direction:column;">
+                <span class="top5-name">${item.crop}</span>
+                <span style="font-size:0.7rem; padding:2px 6px; border-radius:4px; margin-top:2px; width:fit-content; ${badgeStyle}">
+                    ${badgeIcon} ${badgeLabel}
+                </span>
+            </div>
+        </div>
+        <span class="top5-conf" style="color:${confColor}">${item.confidence}%</span>
+      </div>`;
+  });
 
-    resultBox.innerHTML = topHTML;
-    resultBox.scrollIntoView({ behavior: "smooth", block: "nearest" });
+  topHTML += `</div>`;
 
-  } catch (error) {
-    console.error("Prediction Error:", error);
-    btn.innerText = "🌱 Check Suitable Crops";
-    btn.disabled = false;
-    resultBox.classList.remove('hidden');
-    resultBox.innerHTML = `<span class='result-error'>❌ Prediction failed: ${error.message}. Check if backend server is running.</span>`;
+  // Add View All Button if results > 3
+  if (recommendations.length > 3) {
+    topHTML += `
+      <button class="btn-load-more" onclick="openPredictionModal()" style="margin-top:10px; width:100%; padding:10px; border:none; background:#eee; cursor:pointer; border-radius:8px; font-weight:600; color:#555;">
+        📋 View All ${recommendations.length} Recommendations
+      </button>
+    `;
   }
+
+  resultBox.innerHTML = topHTML;
 }
 
 // ================= PREDICTION MODAL (GRID) =================
@@ -1015,6 +1114,8 @@ function selectCropForMotor(cropName) {
 // ================= MOTOR DECISION LOGIC =================
 function evaluateMotorDecision(moisture) {
   if (!activeCropForMotor || !isCloudMode) return;
+  // IRRIGATION_MODE=auto: the server drives the pump, browsers only show it
+  if (PUMP_CONTROL === "server") return;
 
   const currentMoisture = Number(moisture);
   if (isNaN(currentMoisture)) return;
@@ -1115,6 +1216,10 @@ function updateMotorTooltip() {
             <div class="tooltip-row dim"><span>Select a crop for smart motor control</span></div>`;
   }
 
+  if (PUMP_CONTROL === "server") {
+    html += `<div class="tooltip-row dim"><span>🖥️ Pump driven by the server (auto mode)</span></div>`;
+  }
+
   // Water warning
   if (currentWaterStatus === "NO WATER") {
     html += `<div class="tooltip-row danger"><span>⚠️ No water in the tank</span></div>`;
@@ -1123,87 +1228,41 @@ function updateMotorTooltip() {
   tooltip.innerHTML = html;
 }
 
-// ================= WEATHER FORECAST (Open-Meteo) =================
+// ================= WEATHER FORECAST (server cache) =================
 async function fetchWeatherForecast() {
   try {
-    const url = `https://api.open-meteo.com/v1/forecast?latitude=${WEATHER_LAT}&longitude=${WEATHER_LON}&hourly=rain,precipitation,precipitation_probability&current=temperature_2m,relative_humidity_2m,rain,weather_code,wind_speed_10m&timezone=auto&forecast_days=1`;
-    const res = await fetch(url);
-    if (!res.ok) throw new Error("Weather API error");
-    const data = await res.json();
-
-    const now = new Date();
-    const hourly = data.hourly;
-    if (!hourly || !hourly.time) return;
-
-    // Find closest hour index
-    let currentIdx = 0;
-    let minDiff = Infinity;
-    for (let i = 0; i < hourly.time.length; i++) {
-      const t = new Date(hourly.time[i]);
-      const diff = Math.abs(now - t);
-      if (diff < minDiff) {
-        minDiff = diff;
-        currentIdx = i;
-      }
-    }
-
-    // Check current rain (from API)
-    const currentRain = hourly.rain[currentIdx] || 0;
-    const currentPrecip = hourly.precipitation[currentIdx] || 0;
-    const currentProb = hourly.precipitation_probability[currentIdx] || 0;
-
-    // Compute max probability in next 6 hours
-    let maxProb = 0;
-    const lookAhead = Math.min(currentIdx + 6, hourly.precipitation_probability.length);
-    for (let i = currentIdx; i < lookAhead; i++) {
-      maxProb = Math.max(maxProb, hourly.precipitation_probability[i] || 0);
-    }
-
-    if (currentRain > 0 || currentPrecip > 0.5) {
-      currentRainForecast = "YES";
-    } else if (maxProb >= RAIN_EXPECTED_THRESHOLD) {
-      currentRainForecast = "EXPECTED";
-    } else {
-      currentRainForecast = "NO";
+    const [weatherRes, planRes] = await Promise.all([fetch("/api/weather"), fetch("/api/irrigation-plan")]);
+    if (!weatherRes.ok) throw new Error("Weather API error");
+    const data = await weatherRes.json();
+    const forecast = data.summary;
+    if (!forecast) return; // server hasn't fetched a forecast yet
+
+    currentRainForecast = forecast.rain_status;
+    if (planRes.ok) {
+      const plan = await planRes.json();
+      irrigationPlans = plan.fields || [];
     }
 
     // Store weather data for dashboard display
     weatherApiData = {
-      rain: currentRain,
-      precipitation: currentPrecip,
-      probability: currentProb,
-      maxProbability6h: maxProb,
-      current: data.current || null
+      rain: forecast.rain,
+      precipitation: forecast.precipitation,
+      probability: forecast.probability,
+      maxProbability6h: forecast.max_probability,
+      current: forecast.current || null,
+      stale: data.stale
     };
 
     updateRainStatus(currentRainForecast);
     updateWeatherDisplay();
-    console.log(`🌤️ Weather forecast: Rain = ${currentRainForecast}, Prob = ${currentProb}%, Max6h = ${maxProb}%`);
-
-    // Send rain status to Firebase
-    await writeRainToFirebase(currentRainForecast);
+    console.log(`🌤️ Weather forecast: Rain = ${currentRainForecast}, Prob = ${forecast.probability}%, Max6h = ${forecast.max_probability}%`);
+    // Cloud Mode hardware reads rainStatus from Firebase; the server writes it
 
   } catch (e) {
     console.error("Weather forecast error:", e);
   }
 }
 
-// Write rain status to Firebase
-async function writeRainToFirebase(status) {
-  try {
-    const authCount = await getFirebaseAuthToken();
-    const url = `https://smartsoilhealth-bdc49-default-rtdb.asia-southeast1.firebasedatabase.app/rainStatus.json?auth=${authCount}`;
-    await fetch(url, {
-      method: "PUT",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(status)
-    });
-    console.log(`🌧️ Rain status '${status}' written to Firebase`);
-  } catch (e) {
-    console.error("Failed to write rain status to Firebase:", e);
-  }
-}
-
 // Update weather info display on dashboard
 function updateWeatherDisplay() {
   const weatherInfo = document.getElementById('weatherInfo');
@@ -1221,16 +1280,24 @@ function updateWeatherDisplay() {
   html += `<div class="weather-row"><span>🌧️ Rain Now</span><span>${weatherApiData.rain?.toFixed(1) ?? '0'} mm</span></div>`;
   html += `<div class="weather-row"><span>📊 Chance (now)</span><span>${weatherApiData.probability ?? 0}%</span></div>`;
   html += `<div class="weather-row"><span>📈 Max 6h</span><span>${weatherApiData.maxProbability6h ?? 0}%</span></div>`;
+  const irrigationPlan = irrigationPlans.find(p => p.device === shownDevice());
+  if (irrigationPlan) {
+    html += `<div class="weather-row" title="${irrigationPlan.reason}"><span>🚿 Irrigation</span><span>${irrigationPlan.action}</span></div>`;
+  }
+  if (weatherApiData.stale) {
+    html += `<div class="weather-row dim"><span>Forecast is out of date</span></div>`;
+  }
 
   weatherInfo.innerHTML = html;
 }
 
 // ================= AUTO =================
-setInterval(loadSensor, 5000);
-setInterval(loadMotorStatus, 5000);
-setInterval(fetchWeatherForecast, 15 * 60 * 1000); // Every 15 minutes
+setInterval(pollIfNotLive(loadSensor), 5000);
+setInterval(pollIfNotLive(loadMotorStatus), 5000);
+setInterval(fetchWeatherForecast, 5 * 60 * 1000); // Server cache, revalidated with ETag
 loadSensor();
 loadMotorStatus();
 loadCrops();
+loadConfig().then(startLiveStream); // needs CLOUD_DEVICE / USB_DEVICE to pick the shown device's events
 fetchWeatherForecast(); // Initial weather fetch
 updateMotorTooltip(); // Initial tooltip render